@@ -7,4 +7,5 @@ class GameConfig(AppConfig):
 
 
     def ready(self):
+        import game.runtime
         import game.signals.handlers
@@ -0,0 +1,166 @@
+from datetime import datetime, timedelta, timezone
+from django.db import transaction
+from itertools import groupby
+
+from .models import ArchivedGame, Game, Round
+from .serializers import RoundSerializer, values_mapper
+import logging
+logger = logging.getLogger(__name__)
+
+"""
+Archive - finished games keep their rounds in one ArchivedGame row instead of up to 10 Round rows
+Each round is packed into a few bytes: id and timestamp as deltas from the previous round,
+correct_numbers and correct_positions in one byte, and the guess as 4-bit digits.
+Decoded rows have the same columns as Round.values(), so archived rounds serialize exactly as before.
+Only finished games are archived, their rounds can no longer change.
+"""
+
+FORMAT_VERSION = 1
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+MICROSECOND = timedelta(microseconds=1)
+# Guess header flag - the guess is stored as UTF-8 instead of packed digits
+RAW_GUESS = 0x80
+
+
+def write_varint(out, value):
+    """
+    Signed integer as a zigzag varint, small deltas take one or two bytes
+    """
+    value = (value << 1) ^ (value >> 63)
+    while value > 0x7f:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def read_varint(data, position):
+    value = shift = 0
+    while True:
+        byte = data[position]
+        position += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return (value >> 1) ^ -(value & 1), position
+        shift += 7
+
+
+def encode_rounds(rows):
+    """
+    Packs Round.values() rows, in play order, into bytes
+    """
+    out = bytearray([FORMAT_VERSION])
+    write_varint(out, len(rows))
+    previous_id = previous_time = 0
+    for row in rows:
+        timestamp = (row['timestamp'] - EPOCH) // MICROSECOND
+        write_varint(out, row['id'] - previous_id)
+        write_varint(out, timestamp - previous_time)
+        previous_id, previous_time = row['id'], timestamp
+
+        out.append(row['correct_numbers'] << 4 | row['correct_positions'])
+        guess = row['guess']
+        if guess.isascii() and guess.isdigit():
+            out.append(len(guess))
+            padded = guess + '0' * (len(guess) % 2)
+            out.extend(int(padded[i]) << 4 | int(padded[i + 1]) for i in range(0, len(padded), 2))
+        else:
+            raw = guess.encode()
+            out.append(RAW_GUESS | len(raw))
+            out.extend(raw)
+    return bytes(out)
+
+
+def decode_rounds(game_id, data):
+    """
+    Unpacks encode_rounds output into Round.values() rows of the given game
+    """
+    data = bytes(data)
+    if data[0] != FORMAT_VERSION:
+        raise ValueError(f'Unknown archive format {data[0]} for game {game_id}')
+    count, position = read_varint(data, 1)
+    rows = []
+    round_id = timestamp = 0
+    for _ in range(count):
+        id_delta, position = read_varint(data, position)
+        time_delta, position = read_varint(data, position)
+        round_id += id_delta
+        timestamp += time_delta
+
+        feedback, header = data[position], data[position + 1]
+        position += 2
+        if header & RAW_GUESS:
+            length = header & ~RAW_GUESS
+            guess = data[position:position + length].decode()
+        else:
+            length = (header + 1) // 2
+            guess = ''.join(f'{byte >> 4}{byte & 0x0f}' for byte in data[position:position + length])[:header]
+        position += length
+
+        rows.append({
+            'id': round_id,
+            'game_id': game_id,
+            'guess': guess,
+            'correct_numbers': feedback >> 4,
+            'correct_positions': feedback & 0x0f,
+            'timestamp': EPOCH + timestamp * MICROSECOND,
+        })
+    return rows
+
+
+def live_rounds(game_id):
+    rounds = Round.objects.filter(game_id=game_id).order_by('timestamp', 'id')
+    return values_mapper(RoundSerializer).values(rounds)
+
+
+def round_rows(game):
+    """
+    Round.values() rows of a game in play order, from Round or from its archive
+    The archive is only looked up for finished games without Round rows
+    """
+    rows = list(live_rounds(game.id))
+    if rows or game.result is None:
+        return rows
+    data = ArchivedGame.objects.filter(game_id=game.id).values_list('rounds', flat=True).first()
+    return [] if data is None else decode_rounds(game.id, data)
+
+
+async def around_rows(game):
+    rows = [row async for row in live_rounds(game.id)]
+    if rows or game.result is None:
+        return rows
+    data = await ArchivedGame.objects.filter(game_id=game.id).values_list('rounds', flat=True).afirst()
+    return [] if data is None else decode_rounds(game.id, data)
+
+
+def archivable_games(finished_before):
+    """
+    Finished games started before the given time that have not been archived
+    """
+    return Game.objects.filter(
+        result__isnull=False, start_time__lt=finished_before, archive__isnull=True)
+
+
+def archive_games(game_ids):
+    """
+    Archives a batch of finished games in one transaction, then deletes their Round rows
+    Games that were archived meanwhile or are not finished are skipped
+    Returns (games archived, rounds archived, archive bytes)
+    """
+    with transaction.atomic():
+        game_ids = list(Game.objects.filter(
+            id__in=game_ids, result__isnull=False, archive__isnull=True).values_list('id', flat=True))
+        rows = Round.objects.filter(game_id__in=game_ids).order_by('game_id', 'timestamp', 'id').values(
+            *values_mapper(RoundSerializer).columns)
+        rounds_by_game = {game_id: list(game_rows) for game_id, game_rows in
+                          groupby(rows, key=lambda row: row['game_id'])}
+
+        archives = []
+        for game_id in game_ids:
+            game_rows = rounds_by_game.get(game_id, [])
+            archives.append(ArchivedGame(
+                game_id=game_id, round_count=len(game_rows), rounds=encode_rounds(game_rows)))
+        ArchivedGame.objects.bulk_create(archives)
+        deleted, _ = Round.objects.filter(game_id__in=game_ids).delete()
+
+    logger.debug('Archived %s games, %s rounds', len(archives), deleted)
+    return len(archives), deleted, sum(len(archive.rounds) for archive in archives)
@@ -0,0 +1,315 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, StreamingHttpResponse
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+import asyncio
+import io
+
+from rest_framework.exceptions import APIException, AuthenticationFailed, NotAuthenticated, ParseError
+from rest_framework.settings import api_settings
+from rest_framework import status
+
+from .authentication import CookieJWTAuthentication
+from .mixins import GameVersionMixin, PlayerDataMixin, RoundPlayMixin
+from .renderers import ORJSONParser, ORJSONRenderer
+from .secret_sources import get_secret_pool
+from . import archive, daily, events
+from .models import Game, PlayerStats
+from .serializers import RoundSerializer, values_mapper
+from .views import GameStateView
+import logging
+logger = logging.getLogger(__name__)
+
+"""
+Async variants of the gameplay endpoints, served natively when running under ASGI
+BaseURL for all endpoints: http://localhost:8000/game/async/
+Reads use Django's async ORM, so one worker can keep many requests in flight while it waits on the database.
+Work that needs a transaction (recording a round) runs in a worker thread via sync_to_async.
+Responses are rendered with the same renderer as the sync views, so both return identical bodies.
+"""
+
+
+class AsyncAPIView(View):
+    """
+    Minimal async counterpart of DRF's APIView - DRF views are sync only
+    Authenticates with REST_FRAMEWORK's authentication classes and requires an authenticated user
+    """
+    authentication_classes = api_settings.DEFAULT_AUTHENTICATION_CLASSES
+    renderer = ORJSONRenderer()
+    parser = ORJSONParser()
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            request.user = await sync_to_async(self.authenticate)(request)
+        except APIException as exc:
+            return self.error_response(request, exc)
+        return await super().dispatch(request, *args, **kwargs)
+
+    def get_authenticators(self):
+        return [auth() for auth in self.authentication_classes]
+
+    def authenticate(self, request):
+        """
+        Returns the authenticated user, raises NotAuthenticated if no credentials were sent
+        """
+        for authenticator in self.get_authenticators():
+            user_auth_tuple = authenticator.authenticate(request)
+            if user_auth_tuple is not None:
+                return user_auth_tuple[0]
+        raise NotAuthenticated()
+
+    def parse_data(self, request):
+        if not request.body:
+            return {}
+        data = self.parser.parse(io.BytesIO(request.body))
+        if not isinstance(data, dict):
+            raise ParseError('Expected a JSON object')
+        return data
+
+    def render(self, data, status_code, headers=None):
+        content = b'' if data is None else self.renderer.render(data)
+        return HttpResponse(
+            content, status=status_code, headers=headers, content_type=self.renderer.media_type)
+
+    def error_response(self, request, exc):
+        """
+        Same status codes and headers as APIView.handle_exception
+        """
+        headers = {}
+        if isinstance(exc, (NotAuthenticated, AuthenticationFailed)):
+            authenticators = self.get_authenticators()
+            if authenticators:
+                headers['WWW-Authenticate'] = authenticators[0].authenticate_header(request)
+            else:
+                exc.status_code = status.HTTP_403_FORBIDDEN
+        return self.render({'detail': exc.detail}, exc.status_code, headers)
+
+
+class AsyncGameVersionMixin(GameVersionMixin):
+    """
+    GameVersionMixin for AsyncAPIView - the 304 is a plain HttpResponse
+    """
+    def not_modified_response(self, etag):
+        return self.render(None, status.HTTP_304_NOT_MODIFIED, self.etag_headers(etag))
+
+
+class AsyncDifficultyConfigView(PlayerDataMixin, AsyncAPIView):
+    """
+    Endpoint: async/difficulty/
+    Handles GET request - retrieves Player's difficulty setting
+    """
+
+    async def get(self, request):
+        player_data = await self.aget_player_data(request)
+
+        return self.render(player_data.get('difficulty'), status.HTTP_200_OK)
+
+
+class AsyncNewGameView(PlayerDataMixin, AsyncAPIView):
+    """
+    Endpoint: async/newgame/
+    Handles POST request - creates Game entry with a secret from the pre-generated pool
+    With {"daily": true} the Game plays today's DailyChallenge for Player's difficulty, once per Player
+    Updates Player's current_game id
+    """
+
+    async def post(self, request):
+        player = await self.aget_player_profile(request)
+        difficulty = int(player.difficulty)
+
+        try:
+            data = self.parse_data(request)
+        except ParseError as exc:
+            return self.error_response(request, exc)
+
+        if data.get('daily') is True:
+            # Creating the challenge and the Game needs a transaction
+            game = await sync_to_async(daily.new_game)(player.player_id, difficulty)
+            if game is None:
+                return self.render({'error': 'Daily challenge already played'}, status.HTTP_400_BAD_REQUEST)
+        else:
+            # The pool never waits on the network, remote refills run in a background thread
+            game = await Game.objects.acreate(
+                player_id=player.player_id,
+                secret_number=get_secret_pool().get(difficulty),
+                game_round=0)
+        logger.debug('New game created with difficulty: %s', difficulty)
+
+        player.current_game = game
+        await player.asave()
+        logger.debug('current_game updated to %s for: %s', str(game), player.player_id)
+        events.publish(player.player_id, events.EVENT_NEW_GAME, events.game_data(game, difficulty))
+
+        return self.render({}, status.HTTP_201_CREATED, self.access_token_headers(request, player))
+
+
+class AsyncRoundsView(AsyncGameVersionMixin, PlayerDataMixin, RoundPlayMixin, AsyncAPIView):
+    """
+    Endpoint: async/gamerounds/
+    Handles GET request - retrieves Player's round-data from current game, supports If-None-Match
+    Handles POST request - creates Round entry using Player's guess
+    """
+    player_profile_related = ('current_game',)
+
+    async def get(self, request):
+        player = await self.aget_player_profile(request)
+
+        if player.current_game_id is None:
+            return self.render({'error': 'Game not found'}, status.HTTP_404_NOT_FOUND)
+
+        etag = self.get_game_etag(player)
+        if self.is_not_modified(request, etag):
+            return self.not_modified_response(etag)
+
+        round_data = values_mapper(RoundSerializer).rows(await archive.around_rows(player.current_game))
+
+        return self.render(round_data, status.HTTP_200_OK, self.etag_headers(etag))
+
+    async def post(self, request):
+        """
+        Same rules as the sync gamerounds/ POST, the transaction runs in a worker thread
+        """
+        player_data = await self.aget_player_data(request)
+        game = (await self.aget_player_profile(request)).current_game
+
+        if game is None:
+            return self.render({'error': 'Game not found'}, status.HTTP_404_NOT_FOUND)
+
+        try:
+            data = self.parse_data(request)
+        except ParseError as exc:
+            return self.error_response(request, exc)
+
+        response_data, response_status = await sync_to_async(self.play_round)(
+            game, player_data, data.get('guess'))
+        return self.render(response_data, response_status)
+
+
+class AsyncLeaderboardTotalsView(AsyncGameVersionMixin, PlayerDataMixin, AsyncAPIView):
+    """
+    Endpoint: async/leaderboard/
+    Handles GET request - retrieves Player's win and fastest time stats, supports If-None-Match
+    """
+    player_profile_related = ('current_game',)
+
+    async def get(self, request):
+        player = await self.aget_player_profile(request)
+
+        if player.current_game_id is None:
+            return self.render({'error': 'Game not found'}, status.HTTP_404_NOT_FOUND)
+
+        etag = self.get_game_etag(player)
+        if self.is_not_modified(request, etag):
+            return self.not_modified_response(etag)
+
+        stats = await PlayerStats.objects.filter(
+            player_id=player.player_id, difficulty=player.difficulty).afirst()
+
+        rankings = {
+            "wins": stats.wins if stats else 0,
+            "fastest_time": stats.fastest_time if stats else None,
+            "current_game_time": player.current_game.total_time,
+        }
+        return self.render(rankings, status.HTTP_200_OK, self.etag_headers(etag))
+
+
+class AsyncStartTimeView(AsyncGameVersionMixin, PlayerDataMixin, AsyncAPIView):
+    """
+    Endpoint: async/starttime/
+    Handles GET request - Retrieves the time Player started the current Game, supports If-None-Match
+    """
+    player_profile_related = ('current_game',)
+
+    async def get(self, request):
+        player = await self.aget_player_profile(request)
+
+        if player.current_game_id is None:
+            return self.render({'error': 'Game not found'}, status.HTTP_404_NOT_FOUND)
+
+        etag = self.get_game_etag(player)
+        if self.is_not_modified(request, etag):
+            return self.not_modified_response(etag)
+
+        return self.render(
+            {'start_time': player.current_game.start_time}, status.HTTP_200_OK, self.etag_headers(etag))
+
+
+class AsyncGameStateView(AsyncGameVersionMixin, PlayerDataMixin, AsyncAPIView):
+    """
+    Endpoint: async/state/
+    Handles GET request - everything the game page needs in one response, see state/
+    """
+    player_profile_related = ('current_game',)
+
+    async def get(self, request):
+        player = await self.aget_player_profile(request)
+        game = player.current_game
+
+        headers = {}
+        if game is not None:
+            etag = self.get_game_etag(player)
+            if self.is_not_modified(request, etag):
+                return self.not_modified_response(etag)
+            headers = self.etag_headers(etag)
+
+        stats = await PlayerStats.objects.filter(
+            player_id=player.player_id, difficulty=player.difficulty).afirst()
+
+        rounds = []
+        if game is not None:
+            rounds = values_mapper(RoundSerializer).rows(await archive.around_rows(game))
+
+        return self.render(GameStateView.game_state(player, stats, rounds), status.HTTP_200_OK, headers)
+
+
+class GameEventsView(PlayerDataMixin, AsyncAPIView):
+    """
+    Endpoint: events/
+    Handles GET request - Server-Sent Events stream of Player's game events:
+    round, game_over, new_game, and clock (server time, plus start_time when it changes)
+    A clock event is sent on connect and whenever the stream is idle for GAME_EVENTS['KEEPALIVE'] seconds
+    EventSource can't set headers, so the token may also come from the AccessToken cookie
+    204 when GAME_EVENTS['ENABLED'] is off, or when not served over ASGI: a WSGI server would read the
+    endless stream into memory and never send a byte. EventSource stops reconnecting on 204
+    and the game page polls state/ instead.
+    """
+    authentication_classes = [CookieJWTAuthentication]
+    player_profile_related = ('current_game',)
+    retry_milliseconds = 3000
+
+    async def get(self, request):
+        if not events.enabled() or not isinstance(request, ASGIRequest):
+            return self.render(None, status.HTTP_204_NO_CONTENT)
+
+        player = await self.aget_player_profile(request)
+
+        response = StreamingHttpResponse(
+            self.stream(player.player_id, player.current_game), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    async def stream(self, player_id, game):
+        keepalive = settings.GAME_EVENTS.get('KEEPALIVE', 15)
+        subscription = events.get_channel_layer().subscribe(events.player_group(player_id))
+        try:
+            yield f'retry: {self.retry_milliseconds}\n' + self.format_event(
+                events.EVENT_CLOCK, events.clock_data(game))
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscription.get(), keepalive)
+                except asyncio.TimeoutError:
+                    yield self.format_event(events.EVENT_CLOCK, events.clock_data())
+                    continue
+                yield self.format_event(event['event'], event['data'])
+        finally:
+            subscription.close()
+
+    def format_event(self, event_type, data):
+        return f'event: {event_type}\ndata: {self.renderer.render(data).decode()}\n\n'
@@ -0,0 +1,136 @@
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from . import model_cache
+from .models import PlayerProfile
+
+"""
+Player claims - tokens carry the player's id, difficulty and current game
+so read endpoints can authenticate and find the player without the database.
+Views that change the difficulty or current game send a fresh access token in X-Access-Token.
+Older tokens are detected with the claims marker kept in the model cache, and fall back to the database.
+A marker missing from the cache is read from PlayerProfile, claims are never trusted unchecked.
+"""
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+def player_claims(profile):
+    return {
+        'player': profile.player_id,
+        'difficulty': profile.difficulty,
+        'current_game': profile.current_game_id,
+    }
+
+
+class PlayerClaimsMixin:
+    """
+    Adds player claims to a token, from the given profile or read through the model cache
+    Users without a PlayerProfile get a plain token
+    """
+
+    @classmethod
+    def for_user(cls, user, profile=None):
+        token = super().for_user(user)
+        if profile is None:
+            try:
+                profile = model_cache.get_profile(user.id)
+            except PlayerProfile.DoesNotExist:
+                return token
+        token.add_player_claims(profile)
+        return token
+
+    def add_player_claims(self, profile):
+        for claim, value in player_claims(profile).items():
+            self[claim] = value
+
+
+class PlayerAccessToken(PlayerClaimsMixin, AccessToken):
+    pass
+
+
+class PlayerRefreshToken(PlayerClaimsMixin, RefreshToken):
+    """
+    Access tokens made from it get the player's current claims, not the ones from login
+    """
+    access_token_class = PlayerAccessToken
+
+    @property
+    def access_token(self):
+        access = super().access_token
+        try:
+            access.add_player_claims(model_cache.get_profile(self[api_settings.USER_ID_CLAIM]))
+        except PlayerProfile.DoesNotExist:
+            pass
+        return access
+
+
+class PlayerTokenUser(TokenUser):
+    """
+    Stateless user backed by a token with fresh player claims
+    """
+
+    @property
+    def id(self):
+        return int(self.token[api_settings.USER_ID_CLAIM])
+
+    @property
+    def pk(self):
+        return self.id
+
+    @property
+    def player_claims(self):
+        return {claim: self.token[claim] for claim in ('player', 'difficulty', 'current_game')}
+
+
+class CookieJWTAuthentication(JWTAuthentication):
+    """
+    JWT from the Authorization header, or else from the AccessToken cookie set by the frontend
+    For GET endpoints the browser opens itself, such as the EventSource stream, which can't send headers
+    """
+    cookie_name = 'AccessToken'
+
+    def authenticate(self, request):
+        header = self.get_header(request)
+        if header is not None:
+            raw_token = self.get_raw_token(header)
+        else:
+            raw_token = request.COOKIES.get(self.cookie_name)
+        if raw_token is None:
+            return None
+
+        validated_token = self.get_validated_token(raw_token)
+        return self.get_user(validated_token), validated_token
+
+
+class PlayerClaimsAuthentication(JWTAuthentication):
+    """
+    JWT from the Authorization header, trusting the player claims for reads
+    GET requests with fresh claims get a PlayerTokenUser without any query. Writes, tokens
+    without claims and tokens issued before the last difficulty or current game change load the User
+    """
+
+    def authenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        validated_token = self.get_validated_token(raw_token)
+        if request.method in SAFE_METHODS and self.claims_are_fresh(validated_token):
+            return PlayerTokenUser(validated_token), validated_token
+        return self.get_user(validated_token), validated_token
+
+    def claims_are_fresh(self, validated_token):
+        """
+        Compares the token's claims with the marker, read from the database when the cache has none
+        """
+        if 'player' not in validated_token or not model_cache.claims_checkable():
+            return False
+        user_id = validated_token[api_settings.USER_ID_CLAIM]
+        marker = model_cache.get_claims_marker(user_id) or model_cache.load_claims_marker(user_id)
+        return marker is not None and all(validated_token[claim] == value for claim, value in marker.items())
@@ -0,0 +1,127 @@
+from django.core.cache import cache
+import numpy as np
+import logging
+
+from . import archive, scoring, solver
+logger = logging.getLogger(__name__)
+
+"""
+Candidate set tracking - the secret numbers still consistent with a game's rounds
+Stored in the cache as a bitset over every code of the game's length (32KB at difficulty 6)
+together with the number of rounds it reflects. Each new round narrows the previous set,
+and a missing or out-of-date entry is rebuilt from the game's rounds.
+"""
+
+CACHE_TIMEOUT = 60 * 60
+
+
+def cache_key(game_id):
+    return f'game:{game_id}:candidates'
+
+
+def to_bitset(candidates, length):
+    mask = np.zeros(scoring.BASE ** length, dtype=bool)
+    mask[candidates] = True
+    return np.packbits(mask).tobytes()
+
+
+def from_bitset(bits, length):
+    mask = np.unpackbits(np.frombuffer(bits, dtype=np.uint8), count=scoring.BASE ** length)
+    return np.flatnonzero(mask).astype(np.int32)
+
+
+def store(game_id, length, round_count, candidates):
+    cache.set(cache_key(game_id), {
+        'length': length,
+        'rounds': round_count,
+        'bits': to_bitset(candidates, length),
+    }, CACHE_TIMEOUT)
+
+
+def load(game_id, length, round_count):
+    """
+    Returns the cached candidates if they reflect exactly `round_count` rounds, else None
+    """
+    state = cache.get(cache_key(game_id))
+    if state is None or state['length'] != length or state['rounds'] != round_count:
+        return None
+    return from_bitset(state['bits'], length)
+
+
+def rebuild(game, round_count):
+    """
+    Recomputes the candidates from the game's first `round_count` rounds and caches them
+    Rounds are read through archive.round_rows, so archived games rebuild like live ones
+    """
+    length = len(game.secret_number)
+    rounds = [(row['guess'], row['correct_numbers'], row['correct_positions'])
+              for row in archive.round_rows(game)[:round_count]]
+    candidates = solver.candidates_for_rounds(length, rounds)
+    store(game.id, length, round_count, candidates)
+    logger.debug('Candidate set rebuilt for game %s: %s remaining', game.id, len(candidates))
+    return candidates
+
+
+def get_candidates(game):
+    """
+    Returns the packed codes still consistent with every round of `game`
+    """
+    length = len(game.secret_number)
+    if game.game_round == 0:
+        return np.arange(scoring.BASE ** length, dtype=np.int32)
+    candidates = load(game.id, length, game.game_round)
+    if candidates is None:
+        candidates = rebuild(game, game.game_round)
+    return candidates
+
+
+def record_round(game, previous_round_count, guess, correct_numbers, correct_positions):
+    """
+    Narrows the game's candidate set by one new round
+    previous_round_count - rounds played before this guess
+    Returns the number of possibilities remaining
+    """
+    length = len(game.secret_number)
+    # Before the first round every code is possible, None lets the solver score the whole table
+    candidates = None
+    if previous_round_count > 0:
+        candidates = load(game.id, length, previous_round_count)
+        if candidates is None:
+            return len(rebuild(game, previous_round_count + 1))
+
+    candidates = narrow(candidates, length, guess, correct_numbers, correct_positions)
+    store(game.id, length, previous_round_count + 1, candidates)
+    return len(candidates)
+
+
+def record_rounds(game, previous_round_count, rounds):
+    """
+    record_round for several new rounds at once, rounds - (guess, correct_numbers, correct_positions) in play order
+    Returns the number of possibilities remaining after each round
+    """
+    length = len(game.secret_number)
+    candidates = None
+    if previous_round_count > 0:
+        candidates = load(game.id, length, previous_round_count)
+        if candidates is None:
+            candidates = rebuild(game, previous_round_count)
+
+    remaining = []
+    for guess, correct_numbers, correct_positions in rounds:
+        candidates = narrow(candidates, length, guess, correct_numbers, correct_positions)
+        remaining.append(len(candidates))
+    store(game.id, length, previous_round_count + len(rounds), candidates)
+    return remaining
+
+
+def narrow(candidates, length, guess, correct_numbers, correct_positions):
+    """
+    Keeps the candidates consistent with one round, None stands for every code
+    """
+    if scoring.is_code(guess, length):
+        tables = scoring.get_tables(length)
+        return solver.consistent(
+            tables, candidates, scoring.encode(guess), correct_numbers, correct_positions)
+    if candidates is None:
+        return np.arange(scoring.BASE ** length, dtype=np.int32)
+    return candidates
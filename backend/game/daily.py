@@ -0,0 +1,161 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.db import IntegrityError, models, transaction
+from django.utils import timezone as django_timezone
+import time
+
+from . import metrics
+from .models import DailyChallenge, Game, Leaderboard
+from .secret_sources import get_secret_pool
+import logging
+logger = logging.getLogger(__name__)
+
+"""
+Daily challenge - one secret number per difficulty per day, the same for every player
+Challenges are created ahead of time by manage.py create_daily_challenges, or by the first
+daily game of the day. Each player gets one game per challenge.
+Every player reads the same daily leaderboard, so it is built at most once per SNAPSHOT_SECONDS
+and served from the DAILY_CHALLENGE cache. One request rebuilds an expired snapshot under a lock
+while the others keep serving the previous one, so expiry doesn't send every reader to the database.
+"""
+
+SNAPSHOT_KEY = 'daily:leaderboard:{date}:{difficulty}'
+LOCK_KEY = SNAPSHOT_KEY + ':lock'
+# Seconds a cold request waits for a rebuild running elsewhere before building its own
+COLD_WAIT = 2
+COLD_POLL = 0.05
+
+
+def get_setting(name):
+    defaults = {'CACHE': 'default', 'SNAPSHOT_SECONDS': 60, 'LOCK_SECONDS': 30, 'SIZE': 100}
+    return getattr(settings, 'DAILY_CHALLENGE', {}).get(name, defaults[name])
+
+
+def get_cache():
+    return caches[get_setting('CACHE')]
+
+
+def today():
+    return django_timezone.localdate()
+
+
+def get_challenge(date, difficulty):
+    """
+    The DailyChallenge for a date and difficulty, created with a secret from the pool on first use
+    """
+    challenge = DailyChallenge.objects.filter(date=date, difficulty=difficulty).first()
+    if challenge is not None:
+        return challenge
+    try:
+        with transaction.atomic():
+            challenge = DailyChallenge.objects.create(
+                date=date, difficulty=difficulty, secret_number=get_secret_pool().get(difficulty))
+    except IntegrityError:
+        # Created by a concurrent request, every player must get the same secret
+        return DailyChallenge.objects.get(date=date, difficulty=difficulty)
+    logger.info('Created %s', challenge)
+    return challenge
+
+
+def new_game(player_id, difficulty):
+    """
+    Creates Player's Game of today's challenge, used by the sync and async newgame/
+    Returns None if Player already has one
+    """
+    challenge = get_challenge(today(), difficulty)
+    try:
+        with transaction.atomic():
+            return Game.objects.create(
+                player_id=player_id, secret_number=challenge.secret_number, game_round=0, challenge=challenge)
+    except IntegrityError:
+        # unique_player_challenge
+        return None
+
+
+def build_leaderboard(date, difficulty):
+    """
+    Fastest wins of the day's challenge, plus how many players finished it and how many won
+    """
+    results = Leaderboard.objects.filter(game__challenge__date=date, game__challenge__difficulty=difficulty)
+    entries = results.filter(result=Leaderboard.RESULT_WIN).order_by('total_time', 'id').values(
+        'total_time', 'created_at', 'player_id', 'player__player__username', 'game__game_round')
+    totals = results.aggregate(
+        players=models.Count('id'), wins=models.Count('id', filter=models.Q(result=Leaderboard.RESULT_WIN)))
+
+    rows = [{
+        'rank': rank,
+        'player': entry['player_id'],
+        'username': entry['player__player__username'],
+        'rounds': entry['game__game_round'],
+        'total_time': entry['total_time'],
+        'created_at': entry['created_at'],
+    } for rank, entry in enumerate(entries[:get_setting('SIZE')], start=1)]
+
+    return {
+        'date': date,
+        'difficulty': difficulty,
+        'players': totals['players'],
+        'wins': totals['wins'],
+        'results': rows,
+        'generated_at': django_timezone.now(),
+    }
+
+
+def leaderboard(date, difficulty):
+    """
+    The day's leaderboard snapshot, rebuilt when older than SNAPSHOT_SECONDS
+    * The cache entry outlives its expiry, so while one request holds the lock and rebuilds,
+      the others serve the expired snapshot instead of all querying Leaderboard at once
+    * With nothing cached yet, requests that miss the lock wait briefly for the first build
+    """
+    cache = get_cache()
+    key = SNAPSHOT_KEY.format(date=date, difficulty=difficulty)
+    entry = cache.get(key)
+    if entry is not None and entry['expires'] > time.time():
+        metrics.snapshot_requests.inc('daily_leaderboard', 'fresh')
+        return entry['data']
+
+    lock_key = LOCK_KEY.format(date=date, difficulty=difficulty)
+    if cache.add(lock_key, True, get_setting('LOCK_SECONDS')):
+        try:
+            data = build_leaderboard(date, difficulty)
+            snapshot_seconds = get_setting('SNAPSHOT_SECONDS')
+            cache.set(key, {'data': data, 'expires': time.time() + snapshot_seconds},
+                      timeout=snapshot_seconds + get_setting('LOCK_SECONDS'))
+        finally:
+            cache.delete(lock_key)
+        metrics.snapshot_requests.inc('daily_leaderboard', 'rebuilt')
+        return data
+
+    if entry is not None:
+        metrics.snapshot_requests.inc('daily_leaderboard', 'stale')
+        return entry['data']
+
+    deadline = time.monotonic() + COLD_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(COLD_POLL)
+        entry = cache.get(key)
+        if entry is not None:
+            metrics.snapshot_requests.inc('daily_leaderboard', 'waited')
+            return entry['data']
+    logger.warning('Daily leaderboard %s (%s) still building after %ss', date, difficulty, COLD_WAIT)
+    metrics.snapshot_requests.inc('daily_leaderboard', 'uncached')
+    return build_leaderboard(date, difficulty)
+
+
+def player_result(date, difficulty, player_id, snapshot):
+    """
+    Player's own result for the challenge, ranked when it is in the snapshot
+    """
+    result = Leaderboard.objects.filter(
+        player_id=player_id, game__challenge__date=date, game__challenge__difficulty=difficulty).values(
+        'result', 'total_time', 'game__game_round').first()
+    if result is None:
+        return None
+    rank = next((row['rank'] for row in snapshot['results'] if row['player'] == player_id), None)
+    return {
+        'result': result['result'],
+        'rounds': result['game__game_round'],
+        'total_time': result['total_time'],
+        'rank': rank,
+    }
@@ -0,0 +1,236 @@
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils import timezone as django_timezone
+from django.utils.module_loading import import_string
+import asyncio
+import json
+import os
+import threading
+import time
+try:
+    import redis
+except ImportError:
+    redis = None
+
+from .renderers import ORJSONRenderer
+import logging
+logger = logging.getLogger(__name__)
+
+"""
+Game events - pushed to a Player's open events/ streams as they happen
+Views publish round results, game completion, new games and clock changes to the Player's group,
+and each open stream holds one subscription to that group.
+The channel layer is configured with settings.GAME_EVENTS. InMemoryChannelLayer delivers within
+one process, RedisChannelLayer reaches the streams of every worker and server.
+With GAME_EVENTS['ENABLED'] off nothing is published and events/ answers 204, the game page polls instead.
+"""
+
+EVENT_ROUND = 'round'
+EVENT_GAME_OVER = 'game_over'
+EVENT_NEW_GAME = 'new_game'
+EVENT_CLOCK = 'clock'
+
+
+def player_group(player_id):
+    return f'player:{player_id}'
+
+
+class ChannelLayer:
+    """
+    Base class for channel layers - delivers events to every subscriber of a group
+    publish may be called from any thread, subscribe is called from the event loop of the stream
+    """
+
+    def publish(self, group, event):
+        raise NotImplementedError
+
+    def subscribe(self, group):
+        raise NotImplementedError
+
+
+class Subscription:
+    """
+    One stream's queue of events for a group
+    Events published while the queue is full are dropped, the client resyncs from state/
+    """
+
+    def __init__(self, layer, group, capacity):
+        self.layer = layer
+        self.group = group
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=capacity)
+        self.dropped = 0
+
+    async def get(self):
+        return await self.queue.get()
+
+    def put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            logger.warning('Events queue full for %s, event dropped', self.group)
+
+    def close(self):
+        self.layer.unsubscribe(self)
+
+
+class InMemoryChannelLayer(ChannelLayer):
+    """
+    Process-local channel layer, used in development and tests
+    """
+
+    def __init__(self, capacity=100):
+        self.capacity = capacity
+        self._groups = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, group):
+        subscription = Subscription(self, group, self.capacity)
+        with self._lock:
+            self._groups.setdefault(group, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._groups.get(subscription.group, set())
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                self._groups.pop(subscription.group, None)
+
+    def publish(self, group, event):
+        return self.deliver(group, event)
+
+    def deliver(self, group, event):
+        """
+        Hands the event to this process's subscribers of the group
+        """
+        with self._lock:
+            subscriptions = list(self._groups.get(group, ()))
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.put, event)
+            except RuntimeError:
+                # The stream's event loop has closed, it unsubscribes when its generator is cleaned up
+                self.unsubscribe(subscription)
+        return len(subscriptions)
+
+    def subscriber_count(self, group):
+        with self._lock:
+            return len(self._groups.get(group, ()))
+
+
+class RedisChannelLayer(InMemoryChannelLayer):
+    """
+    Channel layer shared through Redis pub/sub, so events published by any worker reach every stream
+    publish sends the event to Redis. A listener thread in each process that serves streams
+    pattern-subscribes to every group and delivers the events of its own subscribers.
+    Events are JSON in Redis, so datetimes reach the stream as the strings the renderer writes.
+    """
+
+    def __init__(self, url, prefix='mastermind:events', capacity=100, timeout=1, reconnect_seconds=1):
+        if redis is None:
+            raise ImproperlyConfigured('RedisChannelLayer needs the redis package')
+        super().__init__(capacity)
+        self.url = url
+        self.prefix = prefix
+        self.timeout = timeout
+        self.reconnect_seconds = reconnect_seconds
+        self.client = redis.Redis.from_url(url, socket_connect_timeout=timeout, socket_timeout=timeout)
+        self.renderer = ORJSONRenderer()
+        self._listener_pid = None
+
+    def channel(self, group):
+        return f'{self.prefix}:{group}'
+
+    def publish(self, group, event):
+        """
+        Returns the number of processes listening, not streams
+        """
+        return self.client.publish(self.channel(group), self.renderer.render(event))
+
+    def subscribe(self, group):
+        self.start_listener()
+        return super().subscribe(group)
+
+    def start_listener(self):
+        """
+        Starts this process's listener thread, once per process since gunicorn forks after loading the app
+        """
+        with self._lock:
+            if self._listener_pid == os.getpid():
+                return
+            self._listener_pid = os.getpid()
+        threading.Thread(target=self.listen, name='game-events-listener', daemon=True).start()
+
+    def listen(self):
+        # No socket_timeout, the listener waits on Redis for as long as the process runs
+        client = redis.Redis.from_url(self.url, socket_connect_timeout=self.timeout, health_check_interval=30)
+        while True:
+            pubsub = client.pubsub(ignore_subscribe_messages=True)
+            try:
+                pubsub.psubscribe(self.channel('*'))
+                for message in pubsub.listen():
+                    self.handle_message(message)
+            except redis.RedisError:
+                logger.warning('Game events listener lost Redis, reconnecting in %ss',
+                               self.reconnect_seconds, exc_info=True)
+                time.sleep(self.reconnect_seconds)
+            finally:
+                pubsub.close()
+
+    def handle_message(self, message):
+        if message['type'] != 'pmessage':
+            return
+        group = message['channel'].decode()[len(self.prefix) + 1:]
+        self.deliver(group, json.loads(message['data']))
+
+
+_layer = None
+_layer_lock = threading.Lock()
+
+
+def get_channel_layer():
+    """
+    Returns the process-wide channel layer built from settings.GAME_EVENTS
+    """
+    global _layer
+    if _layer is None:
+        with _layer_lock:
+            if _layer is None:
+                config = settings.GAME_EVENTS
+                layer_class = import_string(config['BACKEND'])
+                _layer = layer_class(**config.get('OPTIONS', {}))
+    return _layer
+
+
+def enabled():
+    return settings.GAME_EVENTS.get('ENABLED', True)
+
+
+def publish(player_id, event_type, data):
+    """
+    Sends one event to every open stream of a Player
+    Publishing never fails the request that caused it
+    """
+    if not enabled():
+        return
+    try:
+        get_channel_layer().publish(player_group(player_id), {'event': event_type, 'data': data})
+    except Exception:
+        logger.exception('Unable to publish %s event for player id: %s', event_type, player_id)
+
+
+def clock_data(game=None):
+    """
+    Server time for the client to measure its clock offset, with the game's start time if known
+    """
+    data = {'server_time': django_timezone.now()}
+    if game is not None:
+        data['game'] = game.id
+        data['start_time'] = game.start_time
+    return data
+
+
+def game_data(game, difficulty):
+    return {'game': game.id, 'difficulty': difficulty, 'start_time': game.start_time}
@@ -0,0 +1,44 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone as django_timezone
+
+from game import archive
+
+
+class Command(BaseCommand):
+    """
+    Usage: python manage.py archive_games [--older-than DAYS] [--batch-size N] [--limit N]
+    Packs the rounds of finished games into ArchivedGame rows and deletes their Round rows
+    Games are walked in id order, one transaction per batch, so the command can be stopped
+    at any point and run again: archived games are skipped and the rest picked up where it stopped.
+    """
+    help = 'Archives the rounds of finished games'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than', type=int, default=30, help='Only games started this many days ago')
+        parser.add_argument('--batch-size', type=int, default=500, help='Games per transaction')
+        parser.add_argument('--limit', type=int, help='Stop after this many games')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+
+        finished_before = django_timezone.now() - timedelta(days=options['older_than'])
+        games = archive.archivable_games(finished_before).order_by('id').values_list('id', flat=True)
+        limit = options['limit']
+
+        last_id = 0
+        total_games = total_rounds = total_bytes = 0
+        while limit is None or total_games < limit:
+            batch_size = options['batch_size'] if limit is None else min(options['batch_size'], limit - total_games)
+            game_ids = list(games.filter(id__gt=last_id)[:batch_size])
+            if not game_ids:
+                break
+            archived, rounds, size = archive.archive_games(game_ids)
+            last_id = game_ids[-1]
+            total_games += archived
+            total_rounds += rounds
+            total_bytes += size
+            self.stdout.write(f'Archived {archived} games ({rounds} rounds) up to game {last_id}')
+
+        self.stdout.write(f'Archived {total_games} games, {total_rounds} rounds in {total_bytes} bytes')
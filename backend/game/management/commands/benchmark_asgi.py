@@ -0,0 +1,115 @@
+from asgiref.sync import async_to_sync
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.test import AsyncClient, Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import AccessToken
+import asyncio
+import statistics
+import time
+
+from game.models import Game, PlayerProfile, Round
+
+User = get_user_model()
+
+ENDPOINTS = ('game-state', 'game-rounds', 'leaderboard', 'start-time')
+
+
+class Command(BaseCommand):
+    """
+    Usage: python manage.py benchmark_asgi [--requests N] [--concurrency C] [--endpoint NAME]
+    Runs the same GET load through the sync views on the WSGI handler (one thread per
+    concurrent client, like a threaded WSGI worker) and through the async views on the
+    ASGI handler (one event loop, like a single ASGI worker), and reports throughput and latency
+    Requests go through Django's in-process test clients, so no server needs to be running.
+    Benchmark players are created in the configured database and deleted afterwards.
+    """
+    help = 'Compares sync WSGI and async ASGI throughput for the game read endpoints'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--concurrency', type=int, default=64)
+        parser.add_argument('--players', type=int, default=16)
+        parser.add_argument('--endpoint', choices=ENDPOINTS, default='game-state')
+
+    def handle(self, *args, **options):
+        sync_url = reverse(options['endpoint'])
+        async_url = reverse(f'async-{options["endpoint"]}')
+        requests = options['requests']
+        concurrency = options['concurrency']
+
+        tokens = self.create_players(options['players'])
+        # The test clients send Host: testserver
+        try:
+            with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+                # Warm up both paths once so imports and first queries are not timed
+                self.run_wsgi(sync_url, tokens, len(tokens), 1)
+                async_to_sync(self.run_asgi)(async_url, tokens, len(tokens), 1)
+
+                self.report('wsgi sync ', *self.run_wsgi(sync_url, tokens, requests, concurrency))
+                self.report('asgi async', *async_to_sync(self.run_asgi)(async_url, tokens, requests, concurrency))
+        finally:
+            User.objects.filter(username__startswith='benchmark-asgi-').delete()
+
+    def create_players(self, count):
+        tokens = []
+        for index in range(count):
+            user, _created = User.objects.get_or_create(username=f'benchmark-asgi-{index}')
+            player = PlayerProfile.objects.get(player=user)
+            game = Game.objects.create(player=player, secret_number='0123', game_round=3)
+            Round.objects.bulk_create([
+                Round(game=game, guess=guess, correct_numbers=correct_numbers, correct_positions=0)
+                for guess, correct_numbers in (('4567', 0), ('1230', 4), ('3012', 4))])
+            player.current_game = game
+            player.save()
+            tokens.append(f'JWT {AccessToken.for_user(user)}')
+        return tokens
+
+    def run_wsgi(self, url, tokens, requests, concurrency):
+        def client_loop(client_index):
+            client = Client()
+            latencies = []
+            try:
+                for index in range(client_index, requests, concurrency):
+                    start = time.perf_counter()
+                    response = client.get(url, headers={'Authorization': tokens[index % len(tokens)]})
+                    latencies.append(time.perf_counter() - start)
+                    assert response.status_code == 200, response.status_code
+            finally:
+                close_old_connections()
+            return latencies
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(client_loop, range(concurrency)))
+        return time.perf_counter() - start, [latency for result in results for latency in result]
+
+    async def run_asgi(self, url, tokens, requests, concurrency):
+        async def client_loop(client_index):
+            client = AsyncClient()
+            latencies = []
+            for index in range(client_index, requests, concurrency):
+                start = time.perf_counter()
+                response = await client.get(url, headers={'Authorization': tokens[index % len(tokens)]})
+                latencies.append(time.perf_counter() - start)
+                assert response.status_code == 200, response.status_code
+            return latencies
+
+        start = time.perf_counter()
+        results = await asyncio.gather(*(client_loop(index) for index in range(concurrency)))
+        return time.perf_counter() - start, [latency for result in results for latency in result]
+
+    def report(self, label, elapsed, latencies):
+        latencies_ms = sorted(latency * 1000 for latency in latencies)
+
+        def percentile(fraction):
+            return latencies_ms[min(len(latencies_ms) - 1, int(len(latencies_ms) * fraction))]
+
+        self.stdout.write(
+            f'{label}: {len(latencies_ms)} requests in {elapsed:.2f}s, '
+            f'{len(latencies_ms) / elapsed:.0f} req/s, mean {statistics.mean(latencies_ms):.2f}ms, '
+            f'p50 {percentile(0.5):.2f}ms, p95 {percentile(0.95):.2f}ms, p99 {percentile(0.99):.2f}ms')
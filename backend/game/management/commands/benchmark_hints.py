@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand
+import random
+import statistics
+import time
+
+from game import scoring, solver
+
+
+class Command(BaseCommand):
+    """
+    Usage: python manage.py benchmark_hints [--games N] [--strategy entropy|minimax]
+    Plays games with the solver at every difficulty and reports hint latency
+    """
+    help = 'Reports hint latency per difficulty'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--games', type=int, default=20)
+        parser.add_argument('--strategy', choices=solver.STRATEGIES, default=solver.STRATEGY_ENTROPY)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        strategy = options['strategy']
+
+        for difficulty in range(scoring.MIN_LENGTH, scoring.MAX_LENGTH + 1):
+            start = time.perf_counter()
+            scoring.get_tables(difficulty)
+            solver.first_guess(difficulty, strategy)
+            warmup = time.perf_counter() - start
+
+            latencies = []
+            rounds_to_win = []
+            for _ in range(options['games']):
+                secret_number = ''.join(rng.choice('01234567') for _ in range(difficulty))
+                rounds = []
+                while True:
+                    start = time.perf_counter()
+                    guess, _remaining = solver.suggest(difficulty, rounds, strategy)
+                    latencies.append(time.perf_counter() - start)
+                    correct_numbers, correct_positions = scoring.score_codes(secret_number, guess)
+                    rounds.append((guess, correct_numbers, correct_positions))
+                    if correct_positions == difficulty:
+                        break
+                rounds_to_win.append(len(rounds))
+
+            latencies_ms = sorted(latency * 1000 for latency in latencies)
+            p95 = latencies_ms[min(len(latencies_ms) - 1, int(len(latencies_ms) * 0.95))]
+            self.stdout.write(
+                f'difficulty {difficulty}: warmup {warmup * 1000:.1f}ms, '
+                f'{len(latencies_ms)} hints, mean {statistics.mean(latencies_ms):.2f}ms, '
+                f'p50 {statistics.median(latencies_ms):.2f}ms, p95 {p95:.2f}ms, '
+                f'max {latencies_ms[-1]:.2f}ms, mean rounds {statistics.mean(rounds_to_win):.2f}')
@@ -0,0 +1,34 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+
+from game import daily, scoring
+from game.models import DailyChallenge
+
+
+class Command(BaseCommand):
+    """
+    Usage: python manage.py create_daily_challenges [--days N]
+    Creates the DailyChallenge of every difficulty for today and the next N - 1 days
+    Existing challenges are kept, so the command can run from cron every day. Without it,
+    the first daily game of the day creates that day's challenge.
+    """
+    help = 'Creates the daily challenges ahead of time'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=7, help='Days to create, starting today')
+
+    def handle(self, *args, **options):
+        if options['days'] < 1:
+            raise CommandError('--days must be at least 1')
+
+        start = daily.today()
+        created = 0
+        for offset in range(options['days']):
+            date = start + timedelta(days=offset)
+            existing = set(DailyChallenge.objects.filter(date=date).values_list('difficulty', flat=True))
+            for difficulty in range(scoring.MIN_LENGTH, scoring.MAX_LENGTH + 1):
+                if difficulty not in existing:
+                    daily.get_challenge(date, difficulty)
+                    created += 1
+
+        self.stdout.write(f'Created {created} daily challenges up to {start + timedelta(days=options["days"] - 1)}')
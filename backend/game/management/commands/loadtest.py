@@ -0,0 +1,197 @@
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.testcases import LiveServerThread, _StaticFilesHandler
+from django.test.utils import override_settings
+from django.utils import timezone as django_timezone
+from pathlib import Path
+import json
+import statistics
+import threading
+import time
+import uuid
+import requests
+
+User = get_user_model()
+
+QUERY_COUNT_MIDDLEWARE = 'game.middleware.QueryCountMiddleware'
+PASSWORD = 'load-test-Password-123'
+SERVER_HOST = '127.0.0.1'
+
+
+class Command(BaseCommand):
+    """
+    Usage: python manage.py loadtest --settings=mastermind.settings_loadtest
+                                     [--players N] [--concurrency C] [--guesses G]
+                                     [--url URL] [--output FILE] [--baseline FILE [--max-regression 0.2]]
+    Plays full games over HTTP: register, log in, newgame, state, up to G guesses
+    (each one taken from hint/), then leaderboard and global leaderboard
+    Without --url the database is migrated and the API is served by an in-process threaded server,
+    which also reports SQL queries per request. Load-test players are deleted afterwards.
+    Reports requests per second and p50/p95/p99 latency per endpoint, --output saves them as JSON
+    and --baseline compares this run's p95 latencies against a saved run.
+    """
+    help = 'Drives full games against the API and reports latency percentiles per endpoint'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--players', type=int, default=20)
+        parser.add_argument('--concurrency', type=int, default=10)
+        parser.add_argument('--guesses', type=int, default=10, help='Most guesses per game')
+        parser.add_argument('--url', help='Base URL of a running server, e.g. http://localhost:8000')
+        parser.add_argument('--output', help='Save results as JSON')
+        parser.add_argument('--baseline', help='Compare with results saved by an earlier run')
+        parser.add_argument('--max-regression', type=float,
+                            help='Fail if any endpoint p95 is slower than the baseline by this fraction')
+
+    def handle(self, *args, **options):
+        if options['max_regression'] is not None and not options['baseline']:
+            raise CommandError('--max-regression needs --baseline')
+
+        prefix = f'loadtest-{uuid.uuid4().hex[:8]}'
+        if options['url']:
+            results = self.run(options['url'].rstrip('/'), prefix, options)
+        else:
+            call_command('migrate', verbosity=0)
+            try:
+                with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, SERVER_HOST],
+                                       MIDDLEWARE=[QUERY_COUNT_MIDDLEWARE, *settings.MIDDLEWARE]):
+                    server = self.start_server()
+                    try:
+                        results = self.run(f'http://{server.host}:{server.port}', prefix, options)
+                    finally:
+                        server.terminate()
+            finally:
+                User.objects.filter(username__startswith=prefix).delete()
+
+        self.report(results)
+        if options['output']:
+            Path(options['output']).write_text(json.dumps(results, indent=2))
+            self.stdout.write(f'Results saved to {options["output"]}')
+        if options['baseline']:
+            self.compare(results, json.loads(Path(options['baseline']).read_text()), options['max_regression'])
+
+    def start_server(self):
+        server = LiveServerThread(SERVER_HOST, _StaticFilesHandler)
+        server.daemon = True
+        server.start()
+        server.is_ready.wait()
+        if server.error:
+            raise server.error
+        return server
+
+    def run(self, base_url, prefix, options):
+        samples = []
+        samples_lock = threading.Lock()
+
+        def record(method, path, response, elapsed):
+            query_count = response.headers.get('X-Query-Count')
+            with samples_lock:
+                samples.append({
+                    'endpoint': f'{method} {path}',
+                    'elapsed': elapsed,
+                    'ok': response.status_code < 400,
+                    'queries': int(query_count) if query_count is not None else None,
+                })
+
+        def play(player_index):
+            # A new connection per request, keep-alive on the development server adds ~40ms of delayed ACKs
+            headers = {}
+
+            def call(method, path, **kwargs):
+                start = time.perf_counter()
+                response = requests.request(
+                    method, f'{base_url}/{path}', headers=headers, timeout=60, **kwargs)
+                record(method, path, response, time.perf_counter() - start)
+                return response
+
+            username = f'{prefix}-{player_index}'
+            call('POST', 'auth/users/', json={'username': username, 'password': PASSWORD})
+            token = call('POST', 'auth/jwt/create/', json={'username': username, 'password': PASSWORD})
+            headers['Authorization'] = f'JWT {token.json()["access"]}'
+
+            call('POST', 'game/newgame/', json={})
+            difficulty = call('GET', 'game/state/').json()['difficulty']
+            for _ in range(options['guesses']):
+                guess = call('GET', 'game/hint/').json()['guess']
+                played = call('POST', 'game/gamerounds/', json={'guess': guess})
+                if played.status_code != 201 or played.json()['correct_positions'] == difficulty:
+                    break
+            call('GET', 'game/leaderboard/')
+            call('GET', 'game/leaderboard/global/')
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+            list(executor.map(play, range(options['players'])))
+        wall_time = time.perf_counter() - start
+
+        return {
+            'meta': {
+                'created': django_timezone.now().isoformat(),
+                'url': base_url if options['url'] else None,
+                'database': connection.vendor,
+                'players': options['players'],
+                'concurrency': options['concurrency'],
+                'guesses': options['guesses'],
+                'requests': len(samples),
+                'wall_time': round(wall_time, 3),
+                'requests_per_second': round(len(samples) / wall_time, 1),
+            },
+            'endpoints': self.summarize(samples, wall_time),
+        }
+
+    def summarize(self, samples, wall_time):
+        endpoints = {}
+        for endpoint in dict.fromkeys(sample['endpoint'] for sample in samples):
+            endpoint_samples = [sample for sample in samples if sample['endpoint'] == endpoint]
+            latencies_ms = sorted(sample['elapsed'] * 1000 for sample in endpoint_samples)
+            query_counts = [sample['queries'] for sample in endpoint_samples if sample['queries'] is not None]
+
+            def percentile(fraction):
+                return round(latencies_ms[min(len(latencies_ms) - 1, int(len(latencies_ms) * fraction))], 2)
+
+            endpoints[endpoint] = {
+                'count': len(endpoint_samples),
+                'errors': sum(1 for sample in endpoint_samples if not sample['ok']),
+                'requests_per_second': round(len(endpoint_samples) / wall_time, 1),
+                'mean_ms': round(statistics.mean(latencies_ms), 2),
+                'p50_ms': percentile(0.5),
+                'p95_ms': percentile(0.95),
+                'p99_ms': percentile(0.99),
+                'queries_per_request': round(statistics.mean(query_counts), 2) if query_counts else None,
+            }
+        return endpoints
+
+    def report(self, results):
+        meta = results['meta']
+        self.stdout.write(
+            f'{meta["players"]} players, concurrency {meta["concurrency"]}, {meta["requests"]} requests '
+            f'in {meta["wall_time"]:.2f}s ({meta["requests_per_second"]} req/s) on {meta["database"]}')
+        self.stdout.write(
+            f'{"endpoint":<32}{"count":>7}{"errors":>8}{"req/s":>8}{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}{"queries":>9}')
+        for endpoint, row in results['endpoints'].items():
+            queries = '-' if row['queries_per_request'] is None else f'{row["queries_per_request"]:.1f}'
+            self.stdout.write(
+                f'{endpoint:<32}{row["count"]:>7}{row["errors"]:>8}{row["requests_per_second"]:>8}'
+                f'{row["p50_ms"]:>9.2f}{row["p95_ms"]:>9.2f}{row["p99_ms"]:>9.2f}{queries:>9}')
+
+    def compare(self, results, baseline, max_regression):
+        """
+        Prints the p95 change per endpoint, raises CommandError past max_regression
+        """
+        self.stdout.write(f'Compared with baseline from {baseline["meta"]["created"]}:')
+        regressions = []
+        for endpoint, row in results['endpoints'].items():
+            before = baseline['endpoints'].get(endpoint)
+            if before is None or not before['p95_ms']:
+                self.stdout.write(f'{endpoint:<32} new')
+                continue
+            change = row['p95_ms'] / before['p95_ms'] - 1
+            self.stdout.write(
+                f'{endpoint:<32} p95 {before["p95_ms"]:.2f}ms -> {row["p95_ms"]:.2f}ms ({change:+.0%})')
+            if max_regression is not None and change > max_regression:
+                regressions.append(endpoint)
+        if regressions:
+            raise CommandError(f'p95 regressed by more than {max_regression:.0%}: {", ".join(regressions)}')
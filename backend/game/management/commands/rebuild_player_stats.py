@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from game.models import Leaderboard, PlayerStats
+
+
+class Command(BaseCommand):
+    """
+    Usage: python manage.py rebuild_player_stats
+    Recomputes every PlayerStats row from the full Leaderboard history
+    """
+    help = 'Rebuilds PlayerStats from Leaderboard'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            PlayerStats.objects.all().delete()
+            created = PlayerStats.objects.bulk_create(
+                PlayerStats(**row) for row in PlayerStats.totals(Leaderboard.objects.all()))
+        self.stdout.write(f'Rebuilt stats for {len(created)} player/difficulty pairs')
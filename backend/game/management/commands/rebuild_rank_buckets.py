@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from collections import Counter
+
+from game import rankings
+from game.models import Leaderboard, RankBucket
+
+
+class Command(BaseCommand):
+    """
+    Usage: python manage.py rebuild_rank_buckets
+    Recomputes the global leaderboard rank buckets from every win in Leaderboard
+    """
+    help = 'Rebuilds RankBucket from Leaderboard'
+
+    def handle(self, *args, **options):
+        counts = Counter()
+        wins = Leaderboard.objects.filter(result=Leaderboard.RESULT_WIN).values_list(
+            'difficulty', 'total_time')
+        for difficulty, total_time in wins.iterator(chunk_size=5000):
+            counts[(difficulty, rankings.bucket_for(total_time))] += 1
+
+        with transaction.atomic():
+            RankBucket.objects.all().delete()
+            RankBucket.objects.bulk_create(
+                RankBucket(difficulty=difficulty, bucket=bucket, wins=wins)
+                for (difficulty, bucket), wins in counts.items())
+        self.stdout.write(f'Rebuilt {len(counts)} rank buckets')
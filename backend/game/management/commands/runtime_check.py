@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from game import runtime
+
+
+class Command(BaseCommand):
+    """
+    Usage: python manage.py runtime_check [--settings=mastermind.settings_production] [--strict]
+    Prints the effective runtime configuration and any setting that slows down production requests
+    --strict fails if there are any, e.g. before a deploy
+    """
+    help = 'Reports the effective runtime configuration'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int)
+        parser.add_argument('--threads', type=int)
+        parser.add_argument('--strict', action='store_true', help='Fail on any warning')
+
+    def handle(self, *args, **options):
+        config = runtime.runtime_config(options['workers'], options['threads'])
+        for key, value in config.items():
+            if key == 'middleware':
+                value = ''.join(f'\n    {middleware}' for middleware in value)
+            self.stdout.write(f'{key}: {value}')
+
+        found = runtime.problems(config)
+        for check_id, message in found:
+            self.stdout.write(self.style.WARNING(f'{check_id}: {message}'))
+        if found and options['strict']:
+            raise CommandError(f'{len(found)} runtime warning(s)')
+        if not found:
+            self.stdout.write(self.style.SUCCESS('No runtime warnings'))
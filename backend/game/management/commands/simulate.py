@@ -0,0 +1,148 @@
+from concurrent.futures import ProcessPoolExecutor
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from pathlib import Path
+import datetime
+import json
+import multiprocessing
+import os
+import time
+
+from game import scoring, simulation
+from game.models import Game, Leaderboard, PlayerProfile, Round
+from game.secret_sources import SeededRandomSource, SystemRandomSource
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    """
+    Usage: python manage.py simulate [--games N] [--difficulty 4 [5 6]] [--strategy entropy [random ...]]
+                                     [--workers W] [--chunk-size C] [--seed S] [--output FILE]
+                                     [--persist USERNAME]
+    Plays N games per strategy and difficulty across a pool of W processes, scored exactly like gamerounds/
+    Reports games per second, win rate and the distribution of rounds to win for each run.
+    Strategies are entropy, minimax, random, or a dotted path to a callable (length, rounds, rng) -> guess.
+    With --seed the secrets and random choices are reproducible, --output saves the report as JSON.
+    --persist saves every game through Game, Round and Leaderboard for that player (created if needed),
+    which updates their stats and the global leaderboard: use a dedicated account.
+    """
+    help = 'Plays games server-side with a guessing strategy and reports statistics'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--games', type=int, default=1000, help='Games per strategy and difficulty')
+        parser.add_argument('--difficulty', type=int, nargs='+', default=[4],
+                            choices=range(scoring.MIN_LENGTH, scoring.MAX_LENGTH + 1))
+        parser.add_argument('--strategy', nargs='+', default=['entropy'])
+        parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                            help='Processes in the pool, 0 plays in this process')
+        parser.add_argument('--chunk-size', type=int, default=50, help='Games per task sent to a worker')
+        parser.add_argument('--max-rounds', type=int, default=simulation.MAX_ROUNDS)
+        parser.add_argument('--seed', type=int)
+        parser.add_argument('--output', help='Save the report as JSON')
+        parser.add_argument('--persist', metavar='USERNAME', help='Save the games for this player')
+
+    def handle(self, *args, **options):
+        if options['games'] < 1 or options['chunk_size'] < 1:
+            raise CommandError('--games and --chunk-size must be at least 1')
+        for name in options['strategy']:
+            try:
+                simulation.get_strategy(name)
+            except ImportError as exc:
+                raise CommandError(f'Unknown strategy {name}: {exc}')
+
+        source = SystemRandomSource() if options['seed'] is None else SeededRandomSource(options['seed'])
+        player = self.get_player(options['persist']) if options['persist'] else None
+
+        runs = []
+        with self.executor(options['workers']) as executor:
+            for difficulty in options['difficulty']:
+                secret_numbers = source.fetch(difficulty, options['games'])
+                for name in options['strategy']:
+                    start = time.perf_counter()
+                    games = self.play(executor, name, secret_numbers, options)
+                    wall_time = time.perf_counter() - start
+
+                    run = {'strategy': name, 'difficulty': difficulty,
+                           **simulation.summarize(games, wall_time)}
+                    runs.append(run)
+                    self.report(run)
+                    if player is not None:
+                        self.persist(player, difficulty, games)
+
+        if options['output']:
+            Path(options['output']).write_text(json.dumps(
+                {'workers': options['workers'], 'seed': options['seed'], 'runs': runs}, indent=2))
+            self.stdout.write(f'Results saved to {options["output"]}')
+
+    def executor(self, workers):
+        """
+        Spawned rather than forked, so workers don't inherit the server's threads and connections
+        """
+        if workers < 1:
+            return InlineExecutor()
+        return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+
+    def play(self, executor, strategy, secret_numbers, options):
+        chunk_size = options['chunk_size']
+        tasks = [
+            (strategy, secret_numbers[start:start + chunk_size],
+             None if options['seed'] is None else f'{options["seed"]}:{start}',
+             options['max_rounds'])
+            for start in range(0, len(secret_numbers), chunk_size)
+        ]
+        games = []
+        for chunk in executor.map(simulation.play_games, tasks):
+            games.extend(chunk)
+        return games
+
+    def report(self, run):
+        distribution = ' '.join(f'{rounds}:{count}' for rounds, count in run['rounds_to_win'].items())
+        mean_rounds = '-' if run['mean_rounds_to_win'] is None else f'{run["mean_rounds_to_win"]:.2f}'
+        self.stdout.write(
+            f'{run["strategy"]} difficulty {run["difficulty"]}: {run["games"]} games, '
+            f'{run["games_per_second"]} games/s, {run["mean_ms_per_game"]:.2f}ms per game, '
+            f'win rate {run["win_rate"]:.1%}, mean rounds to win {mean_rounds}, '
+            f'max {run["max_rounds_to_win"]}, rounds to win [{distribution}]')
+
+    def get_player(self, username):
+        user = User.objects.filter(username=username).first()
+        if user is None:
+            user = User.objects.create_user(username=username)
+            self.stdout.write(f'Created player {username}')
+        return PlayerProfile.objects.get(player=user)
+
+    def persist(self, player, difficulty, games):
+        """
+        Saves each game as gamerounds/ would leave it: the Game, its Rounds and a Leaderboard result
+        Leaderboard rows are created one by one so the PlayerStats and rank bucket signals run
+        """
+        with transaction.atomic():
+            for secret_number, rounds, result, elapsed in games:
+                total_time = datetime.timedelta(seconds=elapsed)
+                game = Game.objects.create(
+                    player=player, secret_number=secret_number, game_round=len(rounds),
+                    total_time=total_time, version=len(rounds), result=result)
+                Round.objects.bulk_create(
+                    Round(game=game, guess=guess, correct_numbers=correct_numbers,
+                          correct_positions=correct_positions)
+                    for guess, correct_numbers, correct_positions in rounds)
+                Leaderboard.objects.create(
+                    result=result, total_time=total_time, difficulty=difficulty, player=player, game=game)
+        self.stdout.write(f'Saved {len(games)} games for {player}')
+
+
+class InlineExecutor:
+    """
+    Executor stand-in that runs tasks in this process, for --workers 0
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def map(self, func, tasks):
+        return map(func, tasks)
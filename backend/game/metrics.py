@@ -0,0 +1,156 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from django.http import Http404, HttpResponse
+import prometheus_client
+from prometheus_client import multiprocess
+import os
+import time
+
+"""
+Metrics - request latency, SQL and outbound HTTP timings, recorded with prometheus_client
+Exposed in the Prometheus text format on /metrics/. The gunicorn entry point sets PROMETHEUS_MULTIPROC_DIR:
+each worker then writes its values to files in that directory and /metrics/ adds up all of them,
+so whichever worker answers a scrape reports the totals of every worker, including exited ones.
+Without it, as under runserver and the tests, values are kept in process memory.
+Counter and Histogram take label values positionally, e.g. http_requests.inc(view, method, status).
+"""
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 4, 5, 6, 8, 10, 15, 20, 50)
+SIZE_BUCKETS = (100, 500, 1000, 5000, 10000, 50000, 100000, 500000)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# [query count, query seconds] for the request being handled, shared with sync_to_async threads
+request_queries = ContextVar('request_queries', default=None)
+
+# Only the _total, _bucket, _sum and _count series, as multiprocess mode reports
+prometheus_client.disable_created_metrics()
+
+
+class Metric:
+    """
+    Base class - wraps a prometheus_client metric, one child per combination of label values
+    """
+    metric_class = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=prometheus_client.REGISTRY, **kwargs):
+        self.name = name
+        self.labelnames = tuple(labelnames)
+        self.registry = registry
+        self.metric = self.metric_class(name, documentation, self.labelnames, registry=registry, **kwargs)
+
+    def child(self, labels):
+        return self.metric.labels(*labels) if self.labelnames else self.metric
+
+    def sample(self, suffix, labels):
+        """
+        Current value of one series in this process, 0 if it was never recorded
+        """
+        value = self.registry.get_sample_value(self.name + suffix, dict(zip(self.labelnames, map(str, labels))))
+        return value or 0
+
+
+class Counter(Metric):
+    metric_class = prometheus_client.Counter
+
+    def inc(self, *labels, amount=1):
+        self.child(labels).inc(amount)
+
+    def value(self, *labels):
+        return self.sample('_total', labels)
+
+
+class Histogram(Metric):
+    """
+    Counts observations per bucket, buckets are upper bounds and +Inf is added
+    """
+    metric_class = prometheus_client.Histogram
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS, **kwargs):
+        super().__init__(name, documentation, labelnames, buckets=buckets, **kwargs)
+
+    def observe(self, value, *labels):
+        self.child(labels).observe(value)
+
+    def count(self, *labels):
+        """
+        Returns (observations, sum of observed values)
+        """
+        return self.sample('_count', labels), self.sample('_sum', labels)
+
+
+http_requests = Counter(
+    'http_requests', 'HTTP requests by view, method and status code', ('view', 'method', 'status'))
+http_request_duration = Histogram(
+    'http_request_duration_seconds', 'Time until the response is returned', ('view', 'method'))
+http_response_size = Histogram(
+    'http_response_size_bytes', 'Response body size, streaming responses excluded', ('view',), SIZE_BUCKETS)
+db_queries_per_request = Histogram(
+    'db_queries_per_request', 'SQL queries run by one request', ('view',), QUERY_COUNT_BUCKETS)
+db_request_query_duration = Histogram(
+    'db_request_query_duration_seconds', 'Total SQL time of one request', ('view',))
+db_query_duration = Histogram(
+    'db_query_duration_seconds', 'Time of each SQL query, including those outside requests')
+outbound_http_duration = Histogram(
+    'outbound_http_duration_seconds', 'Calls to external services by target and outcome', ('target', 'outcome'))
+model_cache_requests = Counter(
+    'model_cache_requests', 'PlayerProfile and Game cache lookups by model and hit or miss', ('model', 'result'))
+snapshot_requests = Counter(
+    'snapshot_requests', 'Cached snapshot reads by snapshot and outcome', ('snapshot', 'outcome'))
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    Database execute wrapper, installed on every connection when it is created
+    """
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - start
+        db_query_duration.observe(elapsed)
+        queries = request_queries.get()
+        if queries is not None:
+            queries[0] += 1
+            queries[1] += elapsed
+
+
+@contextmanager
+def outbound_http(target):
+    """
+    Times a call to an external service, e.g. with outbound_http('random.org'): requests.get(...)
+    """
+    start = time.perf_counter()
+    outcome = 'error'
+    try:
+        yield
+        outcome = 'ok'
+    finally:
+        outbound_http_duration.observe(time.perf_counter() - start, target, outcome)
+
+
+def collecting_registry():
+    """
+    The registry /metrics/ reads: every worker's files in multiprocess mode, else this process
+    """
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = prometheus_client.CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return prometheus_client.REGISTRY
+
+
+def render():
+    return prometheus_client.generate_latest(collecting_registry())
+
+
+def metrics_view(request):
+    """
+    Endpoint: metrics/
+    Prometheus text format, only served to the addresses in settings.METRICS_ALLOWED_IPS
+    """
+    allowed_ips = getattr(settings, 'METRICS_ALLOWED_IPS', None)
+    if allowed_ips is not None and request.META.get('REMOTE_ADDR') not in allowed_ips:
+        raise Http404
+    return HttpResponse(render(), content_type=CONTENT_TYPE)
@@ -0,0 +1,83 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.db import connection
+import time
+
+from . import metrics
+
+"""
+Custom middleware
+"""
+
+
+class MetricsMiddleware:
+    """
+    Records latency, status, response size and SQL queries of every request, labelled by view name
+    Queries are counted by metrics.record_query through a context variable, so queries the async views
+    run in sync_to_async threads are included. Works with sync and async views, keep it first in MIDDLEWARE.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        queries, token, start = self.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.request_queries.reset(token)
+        self.record(request, response, queries, start)
+        return response
+
+    async def __acall__(self, request):
+        queries, token, start = self.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.request_queries.reset(token)
+        self.record(request, response, queries, start)
+        return response
+
+    def start(self):
+        queries = [0, 0.0]
+        return queries, metrics.request_queries.set(queries), time.perf_counter()
+
+    def record(self, request, response, queries, start):
+        elapsed = time.perf_counter() - start
+        match = request.resolver_match
+        view = match.view_name if match is not None else 'unmatched'
+
+        metrics.http_requests.inc(view, request.method, str(response.status_code))
+        metrics.http_request_duration.observe(elapsed, view, request.method)
+        if not response.streaming:
+            metrics.http_response_size.observe(len(response.content), view)
+        metrics.db_queries_per_request.observe(queries[0], view)
+        metrics.db_request_query_duration.observe(queries[1], view)
+
+
+class QueryCountMiddleware:
+    """
+    Adds an X-Query-Count header with the number of SQL queries the request ran
+    Used by manage.py loadtest on its in-process server, not part of MIDDLEWARE
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        query_count = 0
+
+        def count_query(execute, sql, params, many, context):
+            nonlocal query_count
+            query_count += 1
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count_query):
+            response = self.get_response(request)
+        response['X-Query-Count'] = str(query_count)
+        return response
@@ -0,0 +1,40 @@
+# Generated by Django 5.1.15 on 2026-10-18 11:01
+
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def populate_player_stats(apps, schema_editor):
+    Leaderboard = apps.get_model('game', 'Leaderboard')
+    PlayerStats = apps.get_model('game', 'PlayerStats')
+    totals = Leaderboard.objects.values('player_id', 'difficulty').annotate(
+        wins=models.Count('id', filter=models.Q(result='W')),
+        losses=models.Count('id', filter=models.Q(result='L')),
+        fastest_time=models.Min('total_time', filter=models.Q(result='W')))
+    PlayerStats.objects.bulk_create(PlayerStats(**row) for row in totals)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0002_remove_game_created_at_game_start_time'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlayerStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('difficulty', models.IntegerField(validators=[django.core.validators.MinValueValidator(4), django.core.validators.MaxValueValidator(6)])),
+                ('wins', models.IntegerField(default=0)),
+                ('losses', models.IntegerField(default=0)),
+                ('fastest_time', models.DurationField(blank=True, null=True)),
+                ('player', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stats', to='game.playerprofile')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('player', 'difficulty'), name='unique_player_difficulty')],
+            },
+        ),
+        migrations.RunPython(populate_player_stats, migrations.RunPython.noop),
+    ]
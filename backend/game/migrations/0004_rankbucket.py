@@ -0,0 +1,40 @@
+# Generated by Django 5.1.15 on 2026-10-18 11:02
+
+import django.core.validators
+from collections import Counter
+from django.db import migrations, models
+
+
+def populate_rank_buckets(apps, schema_editor):
+    Leaderboard = apps.get_model('game', 'Leaderboard')
+    RankBucket = apps.get_model('game', 'RankBucket')
+    counts = Counter()
+    wins = Leaderboard.objects.filter(result='W').values_list('difficulty', 'total_time')
+    for difficulty, total_time in wins.iterator(chunk_size=5000):
+        counts[(difficulty, min(int(total_time.total_seconds()), 6 * 60 * 60))] += 1
+    RankBucket.objects.bulk_create(
+        RankBucket(difficulty=difficulty, bucket=bucket, wins=wins)
+        for (difficulty, bucket), wins in counts.items())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0003_playerstats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RankBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('difficulty', models.IntegerField(validators=[django.core.validators.MinValueValidator(4), django.core.validators.MaxValueValidator(6)])),
+                ('bucket', models.IntegerField()),
+                ('wins', models.IntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('difficulty', 'bucket'), name='unique_difficulty_bucket')],
+            },
+        ),
+        migrations.RunPython(populate_rank_buckets, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.1.15 on 2026-10-18 11:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0004_rankbucket'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='leaderboard',
+            index=models.Index(fields=['player', 'result', 'difficulty', 'total_time'], name='leaderboard_player_time'),
+        ),
+        migrations.AddIndex(
+            model_name='leaderboard',
+            index=models.Index(fields=['difficulty', 'result', 'total_time', 'id'], name='leaderboard_difficulty_time'),
+        ),
+        migrations.AddIndex(
+            model_name='round',
+            index=models.Index(fields=['game', 'timestamp'], name='round_game_timestamp'),
+        ),
+    ]
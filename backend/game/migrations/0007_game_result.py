@@ -0,0 +1,28 @@
+# Generated by Django 5.1.15 on 2026-10-18 11:11
+
+from django.db import migrations, models
+
+
+def populate_game_result(apps, schema_editor):
+    Game = apps.get_model('game', 'Game')
+    Leaderboard = apps.get_model('game', 'Leaderboard')
+    for result in ('W', 'L'):
+        Game.objects.filter(
+            id__in=Leaderboard.objects.filter(result=result).values('game_id')
+        ).update(result=result)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0006_game_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='game',
+            name='result',
+            field=models.CharField(blank=True, choices=[('W', 'Win'), ('L', 'Loss')], max_length=1, null=True),
+        ),
+        migrations.RunPython(populate_game_result, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.1.15 on 2026-10-18 12:18
+
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0008_archivedgame'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyChallenge',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('difficulty', models.IntegerField(validators=[django.core.validators.MinValueValidator(4), django.core.validators.MaxValueValidator(6)])),
+                ('secret_number', models.CharField(max_length=6)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('date', 'difficulty'), name='unique_daily_challenge')],
+            },
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='challenge',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='games', to='game.dailychallenge'),
+        ),
+        migrations.AddConstraint(
+            model_name='game',
+            constraint=models.UniqueConstraint(fields=('player', 'challenge'), name='unique_player_challenge'),
+        ),
+    ]
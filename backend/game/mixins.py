@@ -1,18 +1,424 @@
-import requests
-from django.conf import settings
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone as django_timezone
+
+from django.http import StreamingHttpResponse
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from rest_framework import status
+
+from . import candidate_sets, events, model_cache, scoring
+from .authentication import PlayerAccessToken, PlayerClaimsAuthentication, PlayerTokenUser, player_claims
+from .models import Game, Leaderboard, Round
+from .renderers import CSVRenderer, NDJSONRenderer
+from .serializers import RoundSerializer, values_mapper
+import logging
+logger = logging.getLogger(__name__)
 
 class PlayerDataMixin:
     """
-    Custom mixin - returns player data by using Access Token in cookies
+    Custom mixin - returns player data for the authenticated user
+    Reads authenticated with fresh token claims take the player data from the token, otherwise
+    the PlayerProfile comes from the model cache once per request and is reused by later calls
+    player_profile_related - ('current_game',) also attaches the current Game, from the model cache
     """
+    player_profile_related = ()
+    authentication_classes = [PlayerClaimsAuthentication]
+
+    def get_player_profile(self, request):
+        profile = getattr(request, '_player_profile', None)
+        if profile is None:
+            profile = model_cache.get_profile(
+                request.user.id, with_game='current_game' in self.player_profile_related)
+            if not isinstance(request.user, PlayerTokenUser):
+                profile.player = request.user
+            request._player_profile = profile
+        return profile
+
+    async def aget_player_profile(self, request):
+        profile = getattr(request, '_player_profile', None)
+        if profile is None:
+            profile = await model_cache.aget_profile(
+                request.user.id, with_game='current_game' in self.player_profile_related)
+            if not isinstance(request.user, PlayerTokenUser):
+                profile.player = request.user
+            request._player_profile = profile
+        return profile
+
     def get_player_data(self, request):
-            if not settings.TESTING:   
-                token = request.COOKIES.get('AccessToken')
-                response = requests.get(f'{settings.BASE_URL}/game/playerprofiles/me/', headers={
-                    "Authorization": f'JWT {token}'
-                })
-                if response.status_code != 200:
-                    response.raise_for_status()
-                return response.json()
-            else:
-                 return {'player': request.user.id, 'difficulty': 4, 'current_game': 1}
\ No newline at end of file
+        if isinstance(request.user, PlayerTokenUser):
+            return request.user.player_claims
+        return self.player_data(self.get_player_profile(request))
+
+    async def aget_player_data(self, request):
+        if isinstance(request.user, PlayerTokenUser):
+            return request.user.player_claims
+        return self.player_data(await self.aget_player_profile(request))
+
+    def player_data(self, profile):
+        return player_claims(profile)
+
+    def access_token_headers(self, request, profile):
+        """
+        Fresh access token for the client after the difficulty or current game changed
+        """
+        return {'X-Access-Token': str(PlayerAccessToken.for_user(request.user, profile))}
+
+
+class ValuesListMixin:
+    """
+    Custom mixin - lists a ModelViewSet through the serializer's values() fast path
+    Same response as ListModelMixin.list, including filtering and pagination, without model instances
+    """
+
+    def list(self, request, *args, **kwargs):
+        mapper = values_mapper(self.get_serializer_class())
+        queryset = mapper.values(self.filter_queryset(self.get_queryset()))
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(mapper.rows(page))
+        return Response(mapper.rows(queryset))
+
+
+class ExportMixin:
+    """
+    Custom mixin - adds an export/ action streaming every row of a ModelViewSet
+    As NDJSON by default, or CSV with ?format=csv (or Accept: text/csv)
+    Rows are read export_chunk_size at a time by primary key range and mapped through the values() path,
+    so memory use stays the same whatever the table size
+    Under ASGI the content is an async iterator, Django would read a sync one into memory before sending it
+    """
+    export_chunk_size = 2000
+
+    @action(detail=False, methods=['get'], renderer_classes=[NDJSONRenderer, CSVRenderer])
+    def export(self, request, *args, **kwargs):
+        mapper = values_mapper(self.get_serializer_class())
+        renderer = request.accepted_renderer
+        fieldnames = [name for name, _, _ in mapper.fields]
+        queryset = self.filter_queryset(self.get_queryset())
+
+        if isinstance(request._request, ASGIRequest):
+            content = renderer.astream(fieldnames, self.aexport_rows(queryset, mapper))
+        else:
+            content = renderer.stream(fieldnames, mapper.iter_rows(self.export_rows(queryset)))
+
+        response = StreamingHttpResponse(
+            content, content_type=f'{renderer.media_type}; charset={renderer.charset}')
+        response['Content-Disposition'] = f'attachment; filename="{self.basename}.{renderer.format}"'
+        return response
+
+    def export_rows(self, queryset):
+        """
+        Helper function - yields values() rows in primary key order, one query per chunk
+        Keyset chunks rather than .iterator(), which the MySQL driver would read into memory in full
+        """
+        queryset = self.export_queryset(queryset)
+        last_pk = None
+        while True:
+            rows = self.export_chunk(queryset, last_pk)
+            yield from rows
+            if len(rows) < self.export_chunk_size:
+                return
+            last_pk = rows[-1][queryset.model._meta.pk.attname]
+
+    async def aexport_rows(self, queryset, mapper):
+        """
+        Helper function - export_rows for ASGI, mapped rows with each chunk's query run in a worker thread
+        """
+        queryset = self.export_queryset(queryset)
+        last_pk = None
+        while True:
+            rows = await sync_to_async(self.export_chunk)(queryset, last_pk)
+            for row in mapper.iter_rows(rows):
+                yield row
+            if len(rows) < self.export_chunk_size:
+                return
+            last_pk = rows[-1][queryset.model._meta.pk.attname]
+
+    def export_queryset(self, queryset):
+        pk = queryset.model._meta.pk.attname
+        columns = list(dict.fromkeys([*values_mapper(self.get_serializer_class()).columns, pk]))
+        return queryset.order_by(pk).values(*columns)
+
+    def export_chunk(self, queryset, last_pk):
+        """
+        Helper function - the export_chunk_size rows after last_pk
+        """
+        pk = queryset.model._meta.pk.attname
+        chunk = queryset if last_pk is None else queryset.filter(**{f'{pk}__gt': last_pk})
+        return list(chunk[:self.export_chunk_size])
+
+
+class GameVersionMixin:
+    """
+    Custom mixin - conditional GET for views that read the current game
+    The ETag comes from the game's version counter, so a matching If-None-Match
+    is answered with 304 before any rounds are loaded or serialized
+    Use with player_profile_related = ('current_game',) so the version arrives with the profile
+    """
+    def get_game_etag(self, player):
+        game = player.current_game
+        return f'"{game.id}.{game.version}.{player.difficulty}"'
+
+    def is_not_modified(self, request, etag):
+        if_none_match = request.headers.get('If-None-Match', '')
+        return etag in [tag.strip() for tag in if_none_match.split(',')]
+
+    def etag_headers(self, etag):
+        """
+        Browsers keep the response but revalidate it on every request
+        """
+        return {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+
+    def not_modified_response(self, etag):
+        return Response(status=status.HTTP_304_NOT_MODIFIED, headers=self.etag_headers(etag))
+
+
+class RoundPlayMixin:
+    """
+    Custom mixin - records a Player's guesses in their current game
+    Shared by the sync and async gamerounds/ views and gamerounds/batch/, everything here is blocking ORM work
+    * Game is advanced with a conditional UPDATE on its round counter, so of two
+      concurrent guesses for the same round only one is recorded
+    """
+    max_rounds = 10
+    max_attempts = 3
+
+    def guess_error(self, guess, length):
+        """
+        Helper function - why a guess can't be played against a secret number of the given length, or None
+        """
+        if not isinstance(guess, str):
+            return 'Wrong data type'
+        if not guess:
+            return 'Guess may not be blank'
+        if len(guess) != length:
+            return f'Guess must be {length} digits long'
+        if not scoring.is_code(guess, length):
+            return 'Guess digits must be between 0 and 7'
+        return None
+
+    def round_result(self, game, game_round, correct_positions):
+        """
+        Helper function - Leaderboard result of a round, None while the game goes on
+        """
+        if correct_positions == len(game.secret_number):
+            return Leaderboard.RESULT_WIN
+        if game_round >= self.max_rounds:
+            return Leaderboard.RESULT_LOSS
+        return None
+
+    def play_round(self, game, player_data, guess):
+        """
+        Validates and scores the guess, then records it
+        Returns (response data, status code)
+        """
+        logger.debug('Guess made: %s', guess)
+
+        error = self.guess_error(guess, len(game.secret_number))
+        if error is not None:
+            return {'error': error}, status.HTTP_400_BAD_REQUEST
+
+        correct_numbers, correct_positions = self.evaluate_guesses(
+            secret_number=game.secret_number, guess=guess)
+
+        for attempt in range(self.max_attempts):
+            if attempt:
+                game.refresh_from_db(fields=['game_round', 'result', 'start_time', 'version'])
+            if game.result is not None or game.game_round >= self.max_rounds:
+                return {'error': 'Game is over'}, status.HTTP_400_BAD_REQUEST
+            try:
+                new_round = self.submit_round(
+                    game, player_data, guess, correct_numbers, correct_positions)
+            except IntegrityError:
+                return {'error': 'Duplicate guess'}, status.HTTP_400_BAD_REQUEST
+            if new_round is not None:
+                break
+            logger.debug('Round %s of %s already taken, retrying', game.game_round + 1, str(game))
+        else:
+            return {'error': 'Game was updated, please retry'}, status.HTTP_409_CONFLICT
+
+        possibilities_remaining = candidate_sets.record_round(
+            game, game.game_round - 1, guess, correct_numbers, correct_positions)
+
+        response_data = {
+            **RoundSerializer(new_round).data,
+            'possibilities_remaining': possibilities_remaining
+        }
+        self.publish_round(game, player_data.get('player'), response_data)
+        return response_data, status.HTTP_201_CREATED
+
+    def publish_round(self, game, player, round_data):
+        """
+        Helper function - pushes the round, and the result if the game ended, to Player's open streams
+        """
+        events.publish(player, events.EVENT_ROUND, round_data)
+        if game.result is not None:
+            events.publish(player, events.EVENT_GAME_OVER, {
+                'game': game.id,
+                'result': game.result,
+                'total_time': game.total_time,
+            })
+
+    def submit_round(self, game, player_data, guess, correct_numbers, correct_positions):
+        """
+        Helper function - records one round in a single transaction
+        Returns the new Round, or None if another request advanced the game first
+        Raises IntegrityError if the guess was already made in this game
+        """
+        total_time = django_timezone.now() - game.start_time
+        game_round = game.game_round + 1
+        result = self.round_result(game, game_round, correct_positions)
+
+        with transaction.atomic():
+            advanced = Game.objects.filter(
+                pk=game.id, game_round=game.game_round, result__isnull=True
+            ).update(
+                game_round=game_round,
+                total_time=total_time,
+                result=result,
+                version=F('version') + 1
+            )
+            if not advanced:
+                return None
+            # A queryset update sends no post_save
+            model_cache.invalidate_game(game.id)
+
+            new_round = Round.objects.create(
+                game_id=game.id, guess=guess,
+                correct_numbers=correct_numbers, correct_positions=correct_positions)
+
+            game.game_round = game_round
+            game.total_time = total_time
+            game.result = result
+            game.version += 1
+
+            if result is not None:
+                self.update_leaderboard(
+                    game=game, result=result, player=player_data.get('player'),
+                    difficulty=player_data.get('difficulty'))
+        return new_round
+
+    def play_rounds(self, game, player_data, guesses):
+        """
+        Validates an ordered list of guesses, then scores and records them in one transaction
+        Stops at a win or the last round, the remaining guesses are not played
+        Returns (response data, status code)
+        """
+        if not isinstance(guesses, list) or not guesses:
+            return {'error': 'guesses must be a non-empty list'}, status.HTTP_400_BAD_REQUEST
+        if len(guesses) > self.max_rounds:
+            return {'error': f'At most {self.max_rounds} guesses'}, status.HTTP_400_BAD_REQUEST
+        for index, guess in enumerate(guesses):
+            error = self.guess_error(guess, len(game.secret_number))
+            if error is None and guess in guesses[:index]:
+                error = 'Duplicate guess'
+            if error is not None:
+                return {'error': error, 'index': index}, status.HTTP_400_BAD_REQUEST
+
+        for attempt in range(self.max_attempts):
+            if attempt:
+                game.refresh_from_db(fields=['game_round', 'result', 'start_time', 'version'])
+            if game.result is not None or game.game_round >= self.max_rounds:
+                return {'error': 'Game is over'}, status.HTTP_400_BAD_REQUEST
+            try:
+                new_rounds = self.submit_rounds(game, player_data, guesses)
+            except IntegrityError:
+                return {'error': 'Duplicate guess'}, status.HTTP_400_BAD_REQUEST
+            if new_rounds is not None:
+                break
+            logger.debug('Rounds of %s already taken, retrying', str(game))
+        else:
+            return {'error': 'Game was updated, please retry'}, status.HTTP_409_CONFLICT
+
+        possibilities_remaining = candidate_sets.record_rounds(
+            game, game.game_round - len(new_rounds),
+            [(new_round.guess, new_round.correct_numbers, new_round.correct_positions) for new_round in new_rounds])
+
+        rounds_data = [
+            {**round_data, 'possibilities_remaining': remaining}
+            for round_data, remaining in zip(RoundSerializer(new_rounds, many=True).data, possibilities_remaining)
+        ]
+        player = player_data.get('player')
+        for round_data in rounds_data[:-1]:
+            events.publish(player, events.EVENT_ROUND, round_data)
+        self.publish_round(game, player, rounds_data[-1])
+        return {
+            'rounds': rounds_data,
+            'result': game.result,
+            'unplayed': len(guesses) - len(new_rounds),
+        }, status.HTTP_201_CREATED
+
+    def submit_rounds(self, game, player_data, guesses):
+        """
+        Helper function - scores guesses from the game's next round on and records them with one bulk_create
+        Returns the new Rounds, or None if another request advanced the game first
+        Raises IntegrityError if a guess was already made in this game
+        """
+        new_rounds = []
+        result = None
+        for guess in guesses[:self.max_rounds - game.game_round]:
+            correct_numbers, correct_positions = self.evaluate_guesses(
+                secret_number=game.secret_number, guess=guess)
+            new_rounds.append(Round(
+                game_id=game.id, guess=guess,
+                correct_numbers=correct_numbers, correct_positions=correct_positions))
+            result = self.round_result(game, game.game_round + len(new_rounds), correct_positions)
+            if result is not None:
+                break
+
+        total_time = django_timezone.now() - game.start_time
+        game_round = game.game_round + len(new_rounds)
+
+        with transaction.atomic():
+            advanced = Game.objects.filter(
+                pk=game.id, game_round=game.game_round, result__isnull=True
+            ).update(
+                game_round=game_round,
+                total_time=total_time,
+                result=result,
+                version=F('version') + 1
+            )
+            if not advanced:
+                return None
+            model_cache.invalidate_game(game.id)
+
+            Round.objects.bulk_create(new_rounds)
+            if new_rounds[0].pk is None:
+                # MySQL doesn't return the ids of bulk inserted rows, a guess is unique within its game
+                ids = dict(Round.objects.filter(
+                    game_id=game.id, guess__in=[new_round.guess for new_round in new_rounds]
+                ).values_list('guess', 'id'))
+                for new_round in new_rounds:
+                    new_round.pk = ids[new_round.guess]
+
+            game.game_round = game_round
+            game.total_time = total_time
+            game.result = result
+            game.version += 1
+
+            if result is not None:
+                self.update_leaderboard(
+                    game=game, result=result, player=player_data.get('player'),
+                    difficulty=player_data.get('difficulty'))
+        return new_rounds
+
+    def evaluate_guesses(self, secret_number, guess):
+        """
+        Helper function - compares Player's guess with secret_number
+        * Well-formed guesses are scored by the packed-integer engine in scoring.py
+        """
+        return scoring.evaluate(secret_number, guess)
+
+    def update_leaderboard(self, game, result, player, difficulty):
+        """
+        Helper function - Creates new Leaderboard entry when the game ends
+        Runs inside submit_round's transaction, together with the post_save PlayerStats update
+        """
+        Leaderboard.objects.create(
+            result=result, total_time=game.total_time, difficulty=difficulty,
+            player_id=player, game_id=game.id)
+        logger.debug('Leaderboard result %s added for player id: %s', result, player)
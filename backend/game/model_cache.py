@@ -0,0 +1,159 @@
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.db import transaction
+from rest_framework_simplejwt.settings import api_settings
+import logging
+
+from . import metrics
+from .models import Game, PlayerProfile
+logger = logging.getLogger(__name__)
+
+"""
+Model cache - read-through cache of PlayerProfile rows by user id and Game rows by id
+Nearly every request reads the player's profile and current game, so steady-state requests
+get both from the cache instead of the database. Entries are deleted by the post_save/post_delete
+handlers in signals/handlers.py, and by submit_round, which advances the game with a queryset update.
+Uses the 'models' alias of settings.CACHES: locmem by default, which is only invalidated within
+its own process, so deployments with several workers need a shared backend.
+"""
+
+CACHE_ALIAS = 'models'
+
+
+def get_cache():
+    return caches[CACHE_ALIAS]
+
+
+def profile_key(user_id):
+    return f'player:{user_id}:profile'
+
+
+def game_key(game_id):
+    return f'game:{game_id}'
+
+
+def claims_key(user_id):
+    return f'player:{user_id}:claims'
+
+
+def record(model, hit):
+    metrics.model_cache_requests.inc(model, 'hit' if hit else 'miss')
+
+
+def profile_entries(profile, with_game):
+    """
+    Cache entries for a profile read from the database, each row under its own key
+    """
+    game = profile.current_game if with_game else None
+    profile._state.fields_cache.pop('current_game', None)
+    entries = {profile_key(profile.player_id): profile}
+    if game is not None:
+        entries[game_key(game.id)] = game
+        profile.current_game = game
+    return entries
+
+
+def get_profile(user_id, with_game=False):
+    """
+    Returns the PlayerProfile of a user, raises PlayerProfile.DoesNotExist like a query would
+    with_game - also attaches the current Game, a miss on both is a single query
+    """
+    cache = get_cache()
+    profile = cache.get(profile_key(user_id))
+    record('player_profile', profile is not None)
+    if profile is None:
+        queryset = PlayerProfile.objects.select_related('current_game') if with_game else PlayerProfile.objects
+        profile = queryset.get(player_id=user_id)
+        cache.set_many(profile_entries(profile, with_game))
+    elif with_game and profile.current_game_id is not None:
+        profile.current_game = get_game(profile.current_game_id)
+    return profile
+
+
+async def aget_profile(user_id, with_game=False):
+    cache = get_cache()
+    profile = await cache.aget(profile_key(user_id))
+    record('player_profile', profile is not None)
+    if profile is None:
+        queryset = PlayerProfile.objects.select_related('current_game') if with_game else PlayerProfile.objects
+        profile = await queryset.aget(player_id=user_id)
+        await cache.aset_many(profile_entries(profile, with_game))
+    elif with_game and profile.current_game_id is not None:
+        profile.current_game = await aget_game(profile.current_game_id)
+    return profile
+
+
+def get_game(game_id):
+    cache = get_cache()
+    game = cache.get(game_key(game_id))
+    record('game', game is not None)
+    if game is None:
+        game = Game.objects.get(pk=game_id)
+        cache.set(game_key(game_id), game)
+    return game
+
+
+async def aget_game(game_id):
+    cache = get_cache()
+    game = await cache.aget(game_key(game_id))
+    record('game', game is not None)
+    if game is None:
+        game = await Game.objects.aget(pk=game_id)
+        await cache.aset(game_key(game_id), game)
+    return game
+
+
+def invalidate(key):
+    """
+    Deletes now and again once the transaction commits, so a request that read the old row
+    before the commit can't leave it behind in the cache
+    """
+    cache = get_cache()
+    cache.delete(key)
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+def invalidate_profile(user_id):
+    invalidate(profile_key(user_id))
+
+
+def invalidate_game(game_id):
+    invalidate(game_key(game_id))
+
+
+def set_claims_marker(profile):
+    """
+    Records the difficulty and current game tokens must carry from now on, see authentication.py
+    Kept for the access token lifetime, so older tokens stay detectable until they expire
+    """
+    cache = get_cache()
+    key = claims_key(profile.player_id)
+    marker = {'difficulty': profile.difficulty, 'current_game': profile.current_game_id}
+    timeout = api_settings.ACCESS_TOKEN_LIFETIME.total_seconds()
+    cache.set(key, marker, timeout)
+    transaction.on_commit(lambda: cache.set(key, marker, timeout))
+
+
+def get_claims_marker(user_id):
+    return get_cache().get(claims_key(user_id))
+
+
+def load_claims_marker(user_id):
+    """
+    Claims marker read from the database, for when the cache has lost it (eviction, restart, flush)
+    Only added if still missing, so it can't replace a marker a concurrent save has just set
+    Returns None if the user has no PlayerProfile
+    """
+    row = PlayerProfile.objects.filter(player_id=user_id).values_list('difficulty', 'current_game_id').first()
+    if row is None:
+        return None
+    marker = {'difficulty': row[0], 'current_game': row[1]}
+    get_cache().add(claims_key(user_id), marker, api_settings.ACCESS_TOKEN_LIFETIME.total_seconds())
+    return marker
+
+
+def claims_checkable():
+    """
+    Without a real cache stale claims can't be detected, so they are never trusted
+    """
+    return not isinstance(get_cache(), DummyCache)
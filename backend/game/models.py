@@ -23,10 +23,33 @@ class PlayerProfile(models.Model):
         return f'{self.player.username}'
 
 
+class DailyChallenge(models.Model):
+    """
+    One secret number per difficulty per day, shared by every player
+    Created ahead of time by manage.py create_daily_challenges, or by the day's first daily game
+    """
+    date = models.DateField()
+    difficulty = models.IntegerField(
+        validators=[MinValueValidator(4), MaxValueValidator(6)])
+    secret_number = models.CharField(max_length=6)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['date', 'difficulty'], name='unique_daily_challenge')
+        ]
+
+    def __str__(self):
+        return f'Daily challenge {self.date} ({self.difficulty})'
+
+
 class Game(models.Model):
     """
     Represents the game config
     player - id of who the game belongs to
+    version - change counter used for ETags on the game read endpoints
+    result - set once when the game is won or lost, no more rounds are accepted after that
+    challenge - the DailyChallenge this game plays, each Player gets one game per challenge
     """
     player = models.ForeignKey(
         PlayerProfile, on_delete=models.CASCADE, related_name='active_player_games')
@@ -35,6 +58,17 @@ class Game(models.Model):
         validators=[MinValueValidator(0), MaxValueValidator(10)], default=0)
     start_time = models.DateTimeField(default=timezone.now)
     total_time = models.DurationField(blank=True, null=True)
+    # Incremented whenever a round, resume or completion changes what the game endpoints return
+    version = models.PositiveIntegerField(default=0)
+    result = models.CharField(max_length=1, choices=[('W', 'Win'), ('L', 'Loss')], blank=True, null=True)
+    challenge = models.ForeignKey(
+        DailyChallenge, on_delete=models.CASCADE, related_name='games', blank=True, null=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['player', 'challenge'], name='unique_player_challenge')
+        ]
 
     def __str__(self):
         return f'Game ID: {self.id}'
@@ -59,6 +93,22 @@ class Round(models.Model):
             models.UniqueConstraint(
                 fields=['game', 'guess'], name='unique_guess')
         ]
+        indexes = [
+            # Rounds of a game in the order they were played
+            models.Index(fields=['game', 'timestamp'], name='round_game_timestamp')
+        ]
+
+
+class ArchivedGame(models.Model):
+    """
+    Rounds of a finished game packed into one row, its Round rows are deleted once archived
+    rounds - guesses, feedback, ids and timestamps encoded by archive.encode_rounds
+    Created by: manage.py archive_games, read back through archive.round_rows
+    """
+    game = models.OneToOneField(Game, on_delete=models.CASCADE, primary_key=True, related_name='archive')
+    round_count = models.PositiveSmallIntegerField()
+    rounds = models.BinaryField()
+    archived_at = models.DateTimeField(auto_now_add=True)
 
 
 class Leaderboard(models.Model):
@@ -84,3 +134,88 @@ class Leaderboard(models.Model):
             models.UniqueConstraint(
                 fields=['player', 'game'], name='unique_player_game')
         ]
+        indexes = [
+            # A player's results for a difficulty, fastest first
+            models.Index(fields=['player', 'result', 'difficulty', 'total_time'],
+                         name='leaderboard_player_time'),
+            # Every result for a difficulty, fastest first, for the global leaderboard and ranks
+            models.Index(fields=['difficulty', 'result', 'total_time', 'id'],
+                         name='leaderboard_difficulty_time')
+        ]
+
+
+class PlayerStats(models.Model):
+    """
+    Running totals of a player's Leaderboard results for one difficulty
+    Kept in step with Leaderboard by signal handlers, rebuilt with: manage.py rebuild_player_stats
+    """
+    player = models.ForeignKey(PlayerProfile, on_delete=models.CASCADE, related_name='stats')
+    difficulty = models.IntegerField(
+        validators=[MinValueValidator(4), MaxValueValidator(6)])
+    wins = models.IntegerField(default=0)
+    losses = models.IntegerField(default=0)
+    fastest_time = models.DurationField(blank=True, null=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['player', 'difficulty'], name='unique_player_difficulty')
+        ]
+
+    @classmethod
+    def record_result(cls, player_id, difficulty, result, total_time):
+        """
+        Adds one Leaderboard result to the totals with a single UPDATE, so concurrent results are not lost
+        """
+        cls.objects.get_or_create(player_id=player_id, difficulty=difficulty)
+        stats = cls.objects.filter(player_id=player_id, difficulty=difficulty)
+        if result == Leaderboard.RESULT_WIN:
+            stats.update(
+                wins=models.F('wins') + 1,
+                fastest_time=models.Case(
+                    models.When(fastest_time__isnull=True, then=models.Value(total_time)),
+                    models.When(fastest_time__gt=total_time, then=models.Value(total_time)),
+                    default=models.F('fastest_time')))
+        else:
+            stats.update(losses=models.F('losses') + 1)
+
+    @classmethod
+    def totals(cls, leaderboard):
+        """
+        Aggregates a Leaderboard queryset into wins, losses and fastest_time per (player, difficulty)
+        """
+        return leaderboard.values('player_id', 'difficulty').annotate(
+            wins=models.Count('id', filter=models.Q(result=Leaderboard.RESULT_WIN)),
+            losses=models.Count('id', filter=models.Q(result=Leaderboard.RESULT_LOSS)),
+            fastest_time=models.Min('total_time', filter=models.Q(result=Leaderboard.RESULT_WIN)))
+
+    @classmethod
+    def refresh(cls, player_id, difficulty):
+        """
+        Recomputes one player's totals for a difficulty from Leaderboard
+        """
+        rows = list(cls.totals(Leaderboard.objects.filter(player_id=player_id, difficulty=difficulty)))
+        if not rows:
+            cls.objects.filter(player_id=player_id, difficulty=difficulty).delete()
+            return
+        row = rows[0]
+        cls.objects.update_or_create(
+            player_id=player_id, difficulty=difficulty,
+            defaults={'wins': row['wins'], 'losses': row['losses'], 'fastest_time': row['fastest_time']})
+
+
+class RankBucket(models.Model):
+    """
+    Number of wins per difficulty whose total_time falls in one bucket (whole seconds)
+    Used to find a result's global rank without counting every faster row
+    """
+    difficulty = models.IntegerField(
+        validators=[MinValueValidator(4), MaxValueValidator(6)])
+    bucket = models.IntegerField()
+    wins = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['difficulty', 'bucket'], name='unique_difficulty_bucket')
+        ]
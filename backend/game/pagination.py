@@ -0,0 +1,16 @@
+from rest_framework.pagination import CursorPagination
+
+"""
+Pagination for the admin ViewSets
+"""
+
+
+class IdCursorPagination(CursorPagination):
+    """
+    Pages in id order, query params: cursor, limit (up to max_page_size)
+    Each page is one indexed range query, however deep it is
+    """
+    ordering = 'id'
+    page_size = 100
+    page_size_query_param = 'limit'
+    max_page_size = 1000
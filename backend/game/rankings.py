@@ -0,0 +1,115 @@
+from django.db import models
+from datetime import timedelta
+import base64
+import binascii
+
+from .models import Leaderboard, RankBucket
+
+"""
+Global leaderboard - every win for a difficulty ordered by (total_time, id)
+Pages use keyset cursors on (total_time, id) so deep pages cost the same as the first.
+Ranks come from RankBucket: wins in faster buckets are summed from that small table,
+and only wins inside the same bucket are counted from Leaderboard.
+"""
+
+BUCKET_SECONDS = 1
+# Everything slower than this shares the last bucket
+MAX_BUCKET = 6 * 60 * 60
+
+
+def bucket_for(total_time):
+    return min(int(total_time.total_seconds()) // BUCKET_SECONDS, MAX_BUCKET)
+
+
+def bucket_range(bucket):
+    start = timedelta(seconds=bucket * BUCKET_SECONDS)
+    end = None if bucket >= MAX_BUCKET else timedelta(seconds=(bucket + 1) * BUCKET_SECONDS)
+    return start, end
+
+
+def wins(difficulty):
+    return Leaderboard.objects.filter(result=Leaderboard.RESULT_WIN, difficulty=difficulty)
+
+
+def add_win(difficulty, total_time, count=1):
+    """
+    Adds (or with a negative count, removes) wins from the bucket for total_time
+    """
+    bucket = bucket_for(total_time)
+    RankBucket.objects.get_or_create(difficulty=difficulty, bucket=bucket)
+    RankBucket.objects.filter(difficulty=difficulty, bucket=bucket).update(
+        wins=models.F('wins') + count)
+
+
+def rank_of(difficulty, total_time, entry_id):
+    """
+    1-based position of the win (total_time, entry_id) among all wins for the difficulty
+    """
+    bucket = bucket_for(total_time)
+    faster_buckets = RankBucket.objects.filter(
+        difficulty=difficulty, bucket__lt=bucket).aggregate(total=models.Sum('wins'))['total'] or 0
+
+    start, _end = bucket_range(bucket)
+    faster_in_bucket = wins(difficulty).filter(total_time__gte=start).filter(
+        models.Q(total_time__lt=total_time) | models.Q(total_time=total_time, id__lt=entry_id)).count()
+    return faster_buckets + faster_in_bucket + 1
+
+
+def player_rank(difficulty, player_id):
+    """
+    Global rank of a player's fastest win, or None if they have no wins at this difficulty
+    """
+    best = wins(difficulty).filter(player_id=player_id).order_by('total_time', 'id').values(
+        'id', 'total_time').first()
+    if best is None:
+        return None
+    return rank_of(difficulty, best['total_time'], best['id'])
+
+
+def encode_cursor(total_time, entry_id, rank):
+    raw = f'{int(total_time.total_seconds() * 1_000_000)}:{entry_id}:{rank}'
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """
+    Returns (total_time, entry_id, rank) of the last row of the previous page
+    Raises ValueError for a malformed cursor
+    """
+    try:
+        micros, entry_id, rank = base64.urlsafe_b64decode(cursor.encode()).decode().split(':')
+        return timedelta(microseconds=int(micros)), int(entry_id), int(rank)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as error:
+        raise ValueError('Invalid cursor') from error
+
+
+def page(difficulty, cursor=None, limit=20):
+    """
+    Returns (rows, next_cursor) for one page of the global leaderboard
+    """
+    queryset = wins(difficulty)
+    rank = 0
+    if cursor:
+        total_time, entry_id, rank = decode_cursor(cursor)
+        queryset = queryset.filter(
+            models.Q(total_time__gt=total_time) | models.Q(total_time=total_time, id__gt=entry_id))
+
+    entries = list(queryset.order_by('total_time', 'id').values(
+        'id', 'total_time', 'created_at', 'player_id', 'player__player__username')[:limit + 1])
+
+    rows = []
+    for entry in entries[:limit]:
+        rank += 1
+        rows.append({
+            'rank': rank,
+            'player': entry['player_id'],
+            'username': entry['player__player__username'],
+            'total_time': entry['total_time'],
+            'created_at': entry['created_at'],
+        })
+
+    next_cursor = None
+    if len(entries) > limit:
+        last = entries[limit - 1]
+        next_cursor = encode_cursor(last['total_time'], last['id'], rank)
+    return rows, next_cursor
@@ -0,0 +1,130 @@
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+import csv
+import io
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+"""
+orjson-backed JSON renderer and parser
+Output matches rest_framework's JSONRenderer byte for byte: compact separators, UTF-8 text,
+and datetimes, durations and decimals go through DRF's own encoder. Floats are the exception,
+both print the shortest round-trip form but orjson writes exponents as 1e16 instead of 1e+16.
+Indented output (the browsable API), non-default UNICODE_JSON/COMPACT_JSON and environments
+without orjson fall back to the standard renderer and parser.
+The NDJSON and CSV renderers also stream rows for the admin export/ action, see ExportMixin.
+"""
+
+LINE_SEPARATOR = '\u2028'.encode()
+PARAGRAPH_SEPARATOR = '\u2029'.encode()
+
+
+class ORJSONRenderer(JSONRenderer):
+    if orjson is not None:
+        options = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (orjson is None or data is None or self.ensure_ascii or not self.compact
+                or self.get_indent(accepted_media_type, renderer_context or {}) is not None):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=JSONEncoder().default, option=self.options)
+        except TypeError:
+            # Integers past 64 bits, non-string keys and other values orjson won't encode
+            return super().render(data, accepted_media_type, renderer_context)
+        # Escaped like JSONRenderer does, they are valid JSON but not valid JavaScript
+        return ret.replace(LINE_SEPARATOR, b'\\u2028').replace(PARAGRAPH_SEPARATOR, b'\\u2029')
+
+
+class ORJSONParser(JSONParser):
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get('encoding', settings.DEFAULT_CHARSET)
+        if orjson is None or encoding.lower().replace('_', '-') not in ('utf-8', 'utf8'):
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f'JSON parse error - {exc}')
+
+
+class StreamingRenderer(BaseRenderer):
+    """
+    Base class - renders serialized rows as one document, or streams them in chunks
+    render() is used for error responses and small lists, stream() for exports
+    """
+    charset = 'utf-8'
+    rows_per_chunk = 500
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        rows = data if isinstance(data, list) else [data]
+        fieldnames = list(rows[0]) if rows else []
+        return b''.join(self.stream(fieldnames, rows))
+
+    def stream(self, fieldnames, rows):
+        """
+        Yields the encoded document, rows_per_chunk rows at a time
+        """
+        chunk = [self.header(fieldnames)]
+        for row in rows:
+            chunk.append(self.line(fieldnames, row))
+            if len(chunk) >= self.rows_per_chunk:
+                yield b''.join(chunk)
+                chunk = []
+        if chunk:
+            yield b''.join(chunk)
+
+    async def astream(self, fieldnames, rows):
+        """
+        stream() for an async iterable of rows, served under ASGI
+        """
+        chunk = [self.header(fieldnames)]
+        async for row in rows:
+            chunk.append(self.line(fieldnames, row))
+            if len(chunk) >= self.rows_per_chunk:
+                yield b''.join(chunk)
+                chunk = []
+        if chunk:
+            yield b''.join(chunk)
+
+    def header(self, fieldnames):
+        return b''
+
+    def line(self, fieldnames, row):
+        raise NotImplementedError
+
+
+class NDJSONRenderer(StreamingRenderer):
+    """
+    One JSON object per line
+    """
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    json_renderer = ORJSONRenderer()
+
+    def line(self, fieldnames, row):
+        return self.json_renderer.render(row) + b'\n'
+
+
+class CSVRenderer(StreamingRenderer):
+    """
+    Header row with the field names, then one row per object, None as an empty cell
+    """
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def header(self, fieldnames):
+        return self.line(fieldnames, dict(zip(fieldnames, fieldnames)))
+
+    def line(self, fieldnames, row):
+        buffer = io.StringIO()
+        csv.writer(buffer).writerow(['' if row.get(name) is None else row[name] for name in fieldnames])
+        return buffer.getvalue().encode()
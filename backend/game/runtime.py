@@ -0,0 +1,92 @@
+from django.conf import settings
+from django.core import checks
+from django.db import connections
+import os
+import logging
+
+from . import model_cache
+logger = logging.getLogger(__name__)
+
+"""
+Runtime self-check - reports the effective configuration a server runs with
+and warns about settings that cost time on every request in production.
+Logged by the gunicorn entry point once it is ready, printed by manage.py runtime_check,
+and registered as a deploy check for manage.py check --deploy.
+"""
+
+LOCMEM_CACHE = 'django.core.cache.backends.locmem.LocMemCache'
+DEBUG_TOOLBAR_MIDDLEWARE = 'debug_toolbar.middleware.DebugToolbarMiddleware'
+BROWSABLE_RENDERER = 'rest_framework.renderers.BrowsableAPIRenderer'
+IN_MEMORY_CHANNEL_LAYER = 'game.events.InMemoryChannelLayer'
+
+
+def runtime_config(workers=None, threads=None):
+    """
+    Effective settings that matter for request overhead, workers and threads are given by the server
+    threads - requests a worker runs at once: gunicorn threads, or worker_connections under ASGI
+    """
+    database = connections.databases['default']
+    config = {
+        'settings': os.getenv('DJANGO_SETTINGS_MODULE'),
+        'server_interface': getattr(settings, 'SERVER_INTERFACE', 'wsgi'),
+        'debug': settings.DEBUG,
+        'allowed_hosts': list(settings.ALLOWED_HOSTS),
+        'middleware': list(settings.MIDDLEWARE),
+        'renderers': list(settings.REST_FRAMEWORK.get('DEFAULT_RENDERER_CLASSES', ())),
+        'debug_toolbar': 'debug_toolbar' in settings.INSTALLED_APPS,
+        'database': database['ENGINE'].rsplit('.', 1)[-1],
+        'conn_max_age': database.get('CONN_MAX_AGE', 0),
+        'conn_health_checks': database.get('CONN_HEALTH_CHECKS', False),
+        'secret_source': settings.SECRET_SOURCE['BACKEND'],
+        'model_cache': settings.CACHES.get(model_cache.CACHE_ALIAS, {}).get('BACKEND'),
+        'game_events': settings.GAME_EVENTS['BACKEND'] if settings.GAME_EVENTS.get('ENABLED', True) else None,
+        'workers': workers,
+        'threads': threads,
+    }
+    if workers and threads:
+        config['max_db_connections'] = workers * threads
+    return config
+
+
+def problems(config):
+    """
+    Returns (id, message) for each setting that should not reach production
+    """
+    found = []
+    if config['debug']:
+        found.append(('game.W001', 'DEBUG is on, every SQL query is kept in memory and errors show tracebacks'))
+    if config['debug_toolbar'] or DEBUG_TOOLBAR_MIDDLEWARE in config['middleware']:
+        found.append(('game.W002', 'The debug toolbar is installed'))
+    if BROWSABLE_RENDERER in config['renderers']:
+        found.append(('game.W003', 'The browsable API renderer is enabled'))
+    if config['server_interface'] == 'asgi':
+        if config['conn_max_age'] != 0:
+            found.append(('game.W007', 'CONN_MAX_AGE is set under ASGI, where sync requests run in new threads '
+                                       'and leave their persistent connections behind'))
+    elif config['conn_max_age'] == 0:
+        found.append(('game.W004', 'CONN_MAX_AGE is 0, every request opens a new database connection'))
+    if config['conn_max_age'] != 0 and not config['conn_health_checks']:
+        found.append(('game.W005', 'Persistent connections are reused without CONN_HEALTH_CHECKS'))
+    if config['model_cache'] == LOCMEM_CACHE and (config['workers'] or 1) > 1:
+        found.append(('game.W006', 'The model cache is per process, workers would serve rows another worker changed'))
+    if config['game_events'] is None:
+        found.append(('game.W008', 'events/ is off and the game page polls instead, '
+                                   'set REDIS_URL to share game events between workers'))
+    elif config['game_events'] == IN_MEMORY_CHANNEL_LAYER and (config['workers'] or 1) > 1:
+        found.append(('game.W009', 'The in-memory channel layer only reaches events/ streams on the same worker'))
+    return found
+
+
+def log_report(workers=None, threads=None):
+    config = runtime_config(workers, threads)
+    logger.info('Runtime configuration: %s', ', '.join(f'{key}={value}' for key, value in config.items()
+                                                        if key != 'middleware'))
+    logger.info('Middleware: %s', ', '.join(config['middleware']))
+    for check_id, message in problems(config):
+        logger.warning('%s: %s', check_id, message)
+    return config
+
+
+@checks.register(checks.Tags.compatibility, deploy=True)
+def check_runtime(app_configs, **kwargs):
+    return [checks.Warning(message, id=check_id) for check_id, message in problems(runtime_config())]
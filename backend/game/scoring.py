@@ -0,0 +1,186 @@
+from collections import Counter
+from functools import lru_cache
+import numpy as np
+
+"""
+Feedback engine - scores guesses against secret numbers
+Codes are packed into integers, 3 bits per digit (base 8), first digit in the lowest bits.
+Digit counts are packed 4 bits per digit value so both sides of a comparison
+can be counted once and reused.
+"""
+
+BASE = 8
+DIGIT_BITS = 3
+DIGIT_MASK = 0b111
+COUNT_BITS = 4
+COUNT_MASK = 0b1111
+MIN_LENGTH = 4
+MAX_LENGTH = 6
+
+
+def is_code(code, length=None):
+    """
+    True if code is a string of digits 0-7 with a supported (or the given) length
+    """
+    if not isinstance(code, str):
+        return False
+    if length is None:
+        if not MIN_LENGTH <= len(code) <= MAX_LENGTH:
+            return False
+    elif len(code) != length:
+        return False
+    return all('0' <= digit < str(BASE) for digit in code)
+
+
+def encode(code):
+    """
+    Packs a code string such as '0427' into an integer
+    """
+    value = 0
+    for index, digit in enumerate(code):
+        value |= int(digit) << (DIGIT_BITS * index)
+    return value
+
+
+def decode(value, length):
+    """
+    Unpacks an integer back into a code string of the given length
+    """
+    return ''.join(str((value >> (DIGIT_BITS * index)) & DIGIT_MASK) for index in range(length))
+
+
+def digit_counts(value, length):
+    """
+    Returns how many times each digit value occurs in a packed code, packed 4 bits per digit value
+    """
+    counts = 0
+    for index in range(length):
+        counts += 1 << (COUNT_BITS * ((value >> (DIGIT_BITS * index)) & DIGIT_MASK))
+    return counts
+
+
+def count_positions(secret, guess, length):
+    """
+    Number of digits that are equal and in the same position
+    """
+    diff = secret ^ guess
+    return sum(1 for index in range(length) if not (diff >> (DIGIT_BITS * index)) & DIGIT_MASK)
+
+
+def count_numbers(secret_counts, guess_counts):
+    """
+    Number of digits the two codes share, regardless of position
+    """
+    total = 0
+    for digit in range(BASE):
+        shift = COUNT_BITS * digit
+        total += min((secret_counts >> shift) & COUNT_MASK, (guess_counts >> shift) & COUNT_MASK)
+    return total
+
+
+def score(secret, guess, length):
+    """
+    Scores a packed guess against a packed secret of the same length
+    Returns (correct_numbers, correct_positions)
+    """
+    correct_numbers = count_numbers(digit_counts(secret, length), digit_counts(guess, length))
+    return correct_numbers, count_positions(secret, guess, length)
+
+
+def score_codes(secret_number, guess):
+    """
+    Scores two code strings of the same length
+    Returns (correct_numbers, correct_positions)
+    """
+    return score(encode(secret_number), encode(guess), len(secret_number))
+
+
+def evaluate(secret_number, guess):
+    """
+    Scores any guess string against a secret number, as gamerounds/ does
+    Well-formed codes use the packed engine, anything else is compared digit by digit
+    Returns (correct_numbers, correct_positions)
+    """
+    if is_code(secret_number) and is_code(guess, len(secret_number)):
+        return score_codes(secret_number, guess)
+
+    correct_positions = sum(
+        1 for secret_digit, guess_digit in zip(secret_number, guess) if secret_digit == guess_digit)
+    correct_numbers = sum((Counter(secret_number) & Counter(guess)).values())
+    return correct_numbers, correct_positions
+
+
+class ScoringTables:
+    """
+    Precomputed digits and digit counts for every code of one length
+    Stored one row per position / digit value so each row is a contiguous vector over codes
+    digits - (length, 8**length) array, digits[index, code]
+    counts - (8, 8**length) array, counts[digit, code]
+    """
+
+    def __init__(self, length):
+        if not MIN_LENGTH <= length <= MAX_LENGTH:
+            raise ValueError(f'Code length must be between {MIN_LENGTH} and {MAX_LENGTH}')
+        self.length = length
+        self.size = BASE ** length
+        codes = np.arange(self.size, dtype=np.int32)
+        self.digits = np.empty((length, self.size), dtype=np.uint8)
+        for index in range(length):
+            self.digits[index] = (codes >> (DIGIT_BITS * index)) & DIGIT_MASK
+        self.counts = np.zeros((BASE, self.size), dtype=np.uint8)
+        for index in range(length):
+            self.counts[self.digits[index], codes] += 1
+
+    def score_many(self, guess, codes=None):
+        """
+        Scores one packed guess against many packed codes (all codes if None)
+        Returns (correct_numbers, correct_positions) as uint8 arrays
+        """
+        digits = self.digits if codes is None else self.digits[:, codes]
+        counts = self.counts if codes is None else self.counts[:, codes]
+        correct_positions = np.zeros(digits.shape[1], dtype=np.uint8)
+        for index in range(self.length):
+            correct_positions += digits[index] == self.digits[index, guess]
+        correct_numbers = np.zeros(digits.shape[1], dtype=np.uint8)
+        for digit in np.flatnonzero(self.counts[:, guess]):
+            correct_numbers += np.minimum(counts[digit], self.counts[digit, guess])
+        return correct_numbers, correct_positions
+
+    def feedback_many(self, guess, codes=None):
+        """
+        Like score_many, but combines each result into a single feedback id
+        feedback id = correct_numbers * (length + 1) + correct_positions
+        """
+        correct_numbers, correct_positions = self.score_many(guess, codes)
+        return correct_numbers * np.uint8(self.length + 1) + correct_positions
+
+    def feedback_matrix(self, guesses, codes):
+        """
+        Feedback ids for every pair of packed guesses and codes, as a (len(guesses), len(codes)) array
+        """
+        guess_digits = self.digits[:, guesses]
+        guess_counts = self.counts[:, guesses]
+        code_digits = self.digits[:, codes]
+        code_counts = self.counts[:, codes]
+        correct_positions = np.zeros((len(guesses), len(codes)), dtype=np.uint8)
+        for index in range(self.length):
+            correct_positions += guess_digits[index][:, None] == code_digits[index][None, :]
+        correct_numbers = np.zeros((len(guesses), len(codes)), dtype=np.uint8)
+        for digit in np.flatnonzero(guess_counts.any(axis=1)):
+            correct_numbers += np.minimum(guess_counts[digit][:, None], code_counts[digit][None, :])
+        return correct_numbers * np.uint8(self.length + 1) + correct_positions
+
+    def feedback_id(self, correct_numbers, correct_positions):
+        return correct_numbers * (self.length + 1) + correct_positions
+
+    @property
+    def feedback_size(self):
+        return (self.length + 1) ** 2
+
+
+@lru_cache(maxsize=None)
+def get_tables(length):
+    """
+    Returns the shared ScoringTables for a code length, built on first use
+    """
+    return ScoringTables(length)
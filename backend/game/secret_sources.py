@@ -0,0 +1,197 @@
+from collections import deque
+from django.conf import settings
+from django.utils.module_loading import import_string
+import random
+import secrets
+import threading
+import logging
+import requests
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+"""
+Secret number generation
+Secrets are drawn from a per-difficulty pool so creating a game never waits on the network.
+The pool is refilled in bulk batches in the background by the configured source.
+"""
+
+DIGIT_MAX = 7
+
+
+class SecretSource:
+    """
+    Base class for secret sources - returns a batch of secret numbers for a difficulty
+    remote - True if fetching a batch may block on the network
+    """
+    remote = False
+
+    def fetch(self, difficulty, count):
+        raise NotImplementedError
+
+
+class SystemRandomSource(SecretSource):
+    """
+    Generates secrets internally with the operating system CSPRNG
+    """
+
+    def fetch(self, difficulty, count):
+        return [''.join(str(secrets.randbelow(DIGIT_MAX + 1)) for _ in range(difficulty))
+                for _ in range(count)]
+
+
+class RandomOrgSource(SecretSource):
+    """
+    Fetches secrets from random.org, one request yields the whole batch
+    """
+    remote = True
+    url = 'https://www.random.org/integers/'
+
+    def __init__(self, timeout=5):
+        self.timeout = timeout
+
+    def fetch(self, difficulty, count):
+        params = {
+            'num': difficulty * count,
+            'min': 0,
+            'max': DIGIT_MAX,
+            'col': difficulty,
+            'base': 10,
+            'format': 'plain',
+            'rnd': 'new',
+        }
+        with metrics.outbound_http('random.org'):
+            response = requests.get(self.url, params=params, timeout=self.timeout)
+            response.raise_for_status()
+        return [''.join(line.split()) for line in response.text.splitlines() if line.strip()]
+
+
+class SeededRandomSource(SecretSource):
+    """
+    Reproducible secrets from a seeded generator, for simulations - not for real games
+    """
+
+    def __init__(self, seed=None):
+        self.rng = random.Random(seed)
+
+    def fetch(self, difficulty, count):
+        return [''.join(str(self.rng.randint(0, DIGIT_MAX)) for _ in range(difficulty))
+                for _ in range(count)]
+
+
+class StubSource(SecretSource):
+    """
+    Local source for tests - always returns the first `difficulty` digits of 123456
+    """
+
+    def fetch(self, difficulty, count):
+        return ['123456'[:difficulty]] * count
+
+
+class SecretPool:
+    """
+    Holds pre-generated secrets per difficulty
+    When a pool runs low it is refilled from `source` in a background thread,
+    and if a pool is empty the secret comes from `fallback` instead of waiting
+    """
+
+    def __init__(self, source, fallback=None, batch_size=200, low_watermark=20):
+        self.source = source
+        self.fallback = fallback or SystemRandomSource()
+        self.batch_size = batch_size
+        self.low_watermark = low_watermark
+        self._pools = {}
+        self._refilling = set()
+        self._lock = threading.Lock()
+
+    def get(self, difficulty):
+        # An empty pool with a local source is refilled here, once, then the fallback is used
+        refilled = False
+        while True:
+            with self._lock:
+                pool = self._pools.setdefault(difficulty, deque())
+                secret_number = pool.popleft() if pool else None
+                remaining = len(pool)
+            if secret_number is not None or refilled or self.source.remote:
+                break
+            self.refill(difficulty)
+            refilled = True
+
+        # Not again in the same request if the refill left the pool low
+        if remaining <= self.low_watermark and not refilled:
+            self.schedule_refill(difficulty)
+
+        if secret_number is None:
+            logger.debug('Secret pool empty for difficulty %s, using fallback', difficulty)
+            secret_number = self.fallback.fetch(difficulty, 1)[0]
+        return secret_number
+
+    def schedule_refill(self, difficulty):
+        """
+        Starts a background refill unless one is already running for this difficulty
+        """
+        with self._lock:
+            if difficulty in self._refilling:
+                return
+            self._refilling.add(difficulty)
+        if self.source.remote:
+            threading.Thread(target=self._refill_and_release, args=(difficulty,), daemon=True).start()
+        else:
+            self._refill_and_release(difficulty)
+
+    def refill(self, difficulty):
+        """
+        Fetches one batch from the source and adds the valid secrets to the pool
+        """
+        try:
+            batch = self.source.fetch(difficulty, self.batch_size)
+        except requests.exceptions.RequestException as error:
+            logger.warning('Secret source unavailable, pool not refilled: %s', error)
+            batch = []
+        if not batch and not self.source.remote:
+            batch = self.fallback.fetch(difficulty, self.batch_size)
+
+        batch = [secret_number for secret_number in batch if self.is_valid(secret_number, difficulty)]
+        with self._lock:
+            self._pools.setdefault(difficulty, deque()).extend(batch)
+        logger.debug('Secret pool refilled with %s secrets for difficulty %s', len(batch), difficulty)
+        return len(batch)
+
+    def size(self, difficulty):
+        with self._lock:
+            return len(self._pools.get(difficulty, ()))
+
+    def _refill_and_release(self, difficulty):
+        try:
+            self.refill(difficulty)
+        finally:
+            with self._lock:
+                self._refilling.discard(difficulty)
+
+    @staticmethod
+    def is_valid(secret_number, difficulty):
+        return (len(secret_number) == difficulty
+                and all(digit in '01234567' for digit in secret_number))
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_secret_pool():
+    """
+    Returns the process-wide SecretPool built from settings.SECRET_SOURCE
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                config = settings.SECRET_SOURCE
+                source_class = import_string(config['BACKEND'])
+                source = source_class(**config.get('OPTIONS', {}))
+                _pool = SecretPool(
+                    source,
+                    batch_size=config.get('BATCH_SIZE', 200),
+                    low_watermark=config.get('LOW_WATERMARK', 20))
+    return _pool
@@ -1,6 +1,14 @@
-from rest_framework import serializers
+from functools import lru_cache
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from .authentication import PlayerRefreshToken
 from .models import PlayerProfile, Game, Round, Leaderboard
 
+"""
+Serializers plus a fast read path for lists, see ValuesMapper
+"""
+
 
 class PlayerProfileSerializer(serializers.ModelSerializer):
     class Meta:
@@ -8,6 +16,20 @@ class PlayerProfileSerializer(serializers.ModelSerializer):
         fields = ['player', 'difficulty', 'current_game']
 
 
+class PlayerTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """
+    auth/jwt/create/ - tokens with the player's claims
+    """
+    token_class = PlayerRefreshToken
+
+
+class PlayerTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    auth/jwt/refresh/ - the new access token gets the player's current claims
+    """
+    token_class = PlayerRefreshToken
+
+
 class GameSerializer(serializers.ModelSerializer):
     class Meta:
         model = Game
@@ -26,3 +48,96 @@ class LeaderboardSerializer(serializers.ModelSerializer):
     class Meta:
         model = Leaderboard
         fields = ['id', 'result', 'total_time', 'difficulty', 'player', 'game']
+
+
+# Fields whose to_representation returns a values() column unchanged
+PASSTHROUGH_FIELDS = (
+    serializers.IntegerField,
+    serializers.CharField,
+    serializers.BooleanField,
+    serializers.ChoiceField,
+    serializers.PrimaryKeyRelatedField,
+)
+
+
+def datetime_mapper(field):
+    """
+    DateTimeField.to_representation with the timezone looked up once instead of per value
+    Only ISO 8601 output of aware datetimes is handled here, anything else goes to the field
+    """
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    field_timezone = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+    if output_format is None or output_format.lower() != ISO_8601 or field_timezone is None:
+        return field.to_representation
+
+    def convert(value):
+        if value.tzinfo is None:
+            return field.to_representation(value)
+        value = value.astimezone(field_timezone).isoformat()
+        return value[:-6] + 'Z' if value.endswith('+00:00') else value
+    return convert
+
+
+class ValuesMapper:
+    """
+    Fast read path - builds a ModelSerializer's list output from queryset.values() rows
+    The serializer's fields are resolved once: foreign keys read their _id column, plain values pass
+    through, datetimes use datetime_mapper and the rest (durations) the field's own to_representation,
+    so the output equals serializer.data without building model instances.
+    """
+
+    def __init__(self, serializer_class):
+        model = serializer_class.Meta.model
+        self.fields = []
+        for name, field in serializer_class().fields.items():
+            if field.write_only:
+                continue
+            column = field.source
+            if isinstance(field, serializers.PrimaryKeyRelatedField):
+                column = model._meta.get_field(field.source).attname
+            self.fields.append((name, column, field))
+        self.columns = [column for _, column, _ in self.fields]
+
+    def compile(self):
+        """
+        Returns (key, column, convert) for each field, convert is None for passthrough fields
+        Compiled per call since datetimes depend on the active timezone
+        """
+        mappers = []
+        for name, column, field in self.fields:
+            if isinstance(field, PASSTHROUGH_FIELDS):
+                convert = None
+            elif isinstance(field, serializers.DateTimeField):
+                convert = datetime_mapper(field)
+            else:
+                convert = field.to_representation
+            mappers.append((name, column, convert))
+        return mappers
+
+    def values(self, queryset):
+        return queryset.values(*self.columns)
+
+    def rows(self, rows):
+        mappers = self.compile()
+        return [
+            {name: row[column] if convert is None or row[column] is None else convert(row[column])
+             for name, column, convert in mappers}
+            for row in rows
+        ]
+
+    def iter_rows(self, rows):
+        """
+        rows() for any iterable of rows, mapped one at a time
+        """
+        mappers = self.compile()
+        for row in rows:
+            yield {name: row[column] if convert is None or row[column] is None else convert(row[column])
+                   for name, column, convert in mappers}
+
+    def data(self, queryset):
+        return self.rows(self.values(queryset))
+
+
+@lru_cache(maxsize=None)
+def values_mapper(serializer_class):
+    return ValuesMapper(serializer_class)
@@ -1,9 +1,11 @@
-from django.db.models.signals import post_save
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 from django.conf import settings
 import logging
 
-from game.models import PlayerProfile
+from game import metrics, model_cache, rankings
+from game.models import Game, Leaderboard, PlayerProfile, PlayerStats
 
 logger = logging.getLogger(__name__)
 
@@ -15,3 +17,82 @@ def create_player_profile(sender, instance, created, **kwargs):
     if created:
         logger.debug('User created with ID: %s', instance.id)
         PlayerProfile.objects.create(player=instance)
+
+
+@receiver(post_save, sender=PlayerProfile)
+@receiver(post_delete, sender=PlayerProfile)
+def invalidate_player_profile(sender, instance, **kwargs):
+    """
+    Drops the cached PlayerProfile when it changes, and marks tokens with other claims as stale
+    """
+    model_cache.invalidate_profile(instance.player_id)
+    if kwargs['signal'] is post_save:
+        model_cache.set_claims_marker(instance)
+
+
+@receiver(post_save, sender=Game)
+@receiver(post_delete, sender=Game)
+def invalidate_game(sender, instance, **kwargs):
+    """
+    Drops the cached Game when it changes
+    """
+    model_cache.invalidate_game(instance.id)
+
+
+@receiver(pre_save, sender=Leaderboard)
+def remember_leaderboard_result(sender, instance, **kwargs):
+    """
+    Reads the stored values of an edited Leaderboard result, so post_save can update the stats
+    and rank bucket it was counted in
+    """
+    instance._stored_result = None
+    if not instance._state.adding:
+        instance._stored_result = Leaderboard.objects.filter(pk=instance.pk).values(
+            'player_id', 'difficulty', 'result', 'total_time').first()
+
+
+@receiver(post_save, sender=Leaderboard)
+def add_leaderboard_result(sender, instance, created, **kwargs):
+    """
+    Adds a new Leaderboard result to the player's materialized stats and the global rank buckets
+    Edits to existing results refresh the stats, of the previous player and difficulty too if they changed,
+    and move a win between rank buckets like a delete followed by a create
+    """
+    if created:
+        PlayerStats.record_result(
+            instance.player_id, instance.difficulty, instance.result, instance.total_time)
+        if instance.result == Leaderboard.RESULT_WIN:
+            rankings.add_win(instance.difficulty, instance.total_time)
+        return
+
+    PlayerStats.refresh(instance.player_id, instance.difficulty)
+    stored = getattr(instance, '_stored_result', None)
+    if stored is None:
+        return
+    if (stored['player_id'], stored['difficulty']) != (instance.player_id, instance.difficulty):
+        PlayerStats.refresh(stored['player_id'], stored['difficulty'])
+    if (stored['result'], stored['difficulty'], stored['total_time']) != (
+            instance.result, instance.difficulty, instance.total_time):
+        if stored['result'] == Leaderboard.RESULT_WIN:
+            rankings.add_win(stored['difficulty'], stored['total_time'], count=-1)
+        if instance.result == Leaderboard.RESULT_WIN:
+            rankings.add_win(instance.difficulty, instance.total_time)
+
+
+@receiver(post_delete, sender=Leaderboard)
+def remove_leaderboard_result(sender, instance, **kwargs):
+    """
+    Recomputes the player's stats when a Leaderboard result is removed
+    """
+    PlayerStats.refresh(instance.player_id, instance.difficulty)
+    if instance.result == Leaderboard.RESULT_WIN:
+        rankings.add_win(instance.difficulty, instance.total_time, count=-1)
+
+
+@receiver(connection_created)
+def install_query_metrics(sender, connection, **kwargs):
+    """
+    Times every SQL query on new database connections, see metrics.record_query
+    """
+    if metrics.record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(metrics.record_query)
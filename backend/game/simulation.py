@@ -0,0 +1,97 @@
+from collections import Counter
+from django.utils.module_loading import import_string
+import random
+import time
+
+from . import scoring, solver
+
+"""
+Game simulation - plays whole games server-side with a guessing strategy
+Guesses are scored with scoring.evaluate, the same function gamerounds/ uses.
+A strategy is a callable (length, rounds, rng) -> guess, where rounds are the
+(guess, correct_numbers, correct_positions) played so far; the built-in ones are listed in
+STRATEGIES and any other can be given by dotted path. play_games is the unit of work
+sent to each process of the simulate command's pool, it doesn't touch the database.
+"""
+
+MAX_ROUNDS = 10
+
+
+def entropy_strategy(length, rounds, rng):
+    return solver.suggest(length, rounds, solver.STRATEGY_ENTROPY)[0]
+
+
+def minimax_strategy(length, rounds, rng):
+    return solver.suggest(length, rounds, solver.STRATEGY_MINIMAX)[0]
+
+
+def random_strategy(length, rounds, rng):
+    """
+    Any code that still fits every round, a baseline for the solver strategies
+    """
+    candidates = solver.candidates_for_rounds(length, rounds)
+    return scoring.decode(int(candidates[rng.randrange(len(candidates))]), length)
+
+
+STRATEGIES = {
+    'entropy': 'game.simulation.entropy_strategy',
+    'minimax': 'game.simulation.minimax_strategy',
+    'random': 'game.simulation.random_strategy',
+}
+
+
+def get_strategy(name):
+    """
+    Built-in strategy by name, or any callable by dotted path
+    """
+    return import_string(STRATEGIES.get(name, name))
+
+
+def play_game(secret_number, strategy, rng, max_rounds=MAX_ROUNDS):
+    """
+    Plays one game to a win or max_rounds
+    Returns (rounds, result) with result 'W' or 'L'
+    """
+    length = len(secret_number)
+    rounds = []
+    while len(rounds) < max_rounds:
+        guess = strategy(length, rounds, rng)
+        correct_numbers, correct_positions = scoring.evaluate(secret_number, guess)
+        rounds.append((guess, correct_numbers, correct_positions))
+        if correct_positions == length:
+            return rounds, 'W'
+    return rounds, 'L'
+
+
+def play_games(task):
+    """
+    Plays a chunk of games, task - (strategy name, secret numbers, seed, max_rounds)
+    Returns one (secret_number, rounds, result, seconds) per game
+    """
+    strategy_name, secret_numbers, seed, max_rounds = task
+    strategy = get_strategy(strategy_name)
+    rng = random.Random(seed)
+    games = []
+    for secret_number in secret_numbers:
+        start = time.perf_counter()
+        rounds, result = play_game(secret_number, strategy, rng, max_rounds)
+        games.append((secret_number, rounds, result, time.perf_counter() - start))
+    return games
+
+
+def summarize(games, wall_time):
+    """
+    Statistics of played games: win rate, rounds to win and their distribution, throughput
+    """
+    wins = [len(rounds) for _, rounds, result, _ in games if result == 'W']
+    seconds = [elapsed for *_, elapsed in games]
+    return {
+        'games': len(games),
+        'wins': len(wins),
+        'win_rate': round(len(wins) / len(games), 4) if games else 0,
+        'mean_rounds_to_win': round(sum(wins) / len(wins), 3) if wins else None,
+        'max_rounds_to_win': max(wins, default=None),
+        'rounds_to_win': dict(sorted(Counter(wins).items())),
+        'games_per_second': round(len(games) / wall_time, 1) if wall_time else None,
+        'mean_ms_per_game': round(sum(seconds) / len(seconds) * 1000, 3) if seconds else None,
+    }
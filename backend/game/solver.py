@@ -0,0 +1,165 @@
+from functools import lru_cache
+import numpy as np
+
+from . import scoring
+
+"""
+Solver - suggests the next guess from the set of codes still consistent with a game's rounds
+Each possible guess is rated by how it partitions the candidates by feedback,
+using NumPy feedback matrices so a whole batch of guesses is scored at once.
+"""
+
+STRATEGY_ENTROPY = 'entropy'
+STRATEGY_MINIMAX = 'minimax'
+STRATEGIES = (STRATEGY_ENTROPY, STRATEGY_MINIMAX)
+
+# Upper bound on guess x candidate pairs scored for one hint
+WORK_BUDGET = 500_000
+# Guess x candidate pairs per feedback matrix, bounds peak memory
+BATCH_PAIRS = 1 << 18
+
+
+def consistent(tables, candidates, guess, correct_numbers, correct_positions):
+    """
+    Keeps the candidates that would have given this feedback for this guess
+    candidates - packed codes, or None for every code of this length
+    """
+    feedback = tables.feedback_many(guess, candidates)
+    matches = feedback == tables.feedback_id(correct_numbers, correct_positions)
+    if candidates is None:
+        return np.flatnonzero(matches).astype(np.int32)
+    return candidates[matches]
+
+
+def candidates_for_rounds(length, rounds):
+    """
+    Returns the packed codes consistent with every (guess, correct_numbers, correct_positions)
+    Guesses that are not valid codes for this length carry no usable information and are skipped
+    """
+    tables = scoring.get_tables(length)
+    candidates = None
+    for guess, correct_numbers, correct_positions in rounds:
+        if not scoring.is_code(guess, length):
+            continue
+        candidates = consistent(
+            tables, candidates, scoring.encode(guess), correct_numbers, correct_positions)
+    if candidates is None:
+        return np.arange(tables.size, dtype=np.int32)
+    return candidates
+
+
+def partition_sizes(tables, guesses, candidates):
+    """
+    For each guess, counts how many candidates fall into each feedback class
+    Returns a (len(guesses), feedback_size) array
+    """
+    feedback_size = tables.feedback_size
+    sizes = np.empty((len(guesses), feedback_size), dtype=np.int64)
+    batch_size = max(1, BATCH_PAIRS // len(candidates))
+
+    for start in range(0, len(guesses), batch_size):
+        batch = guesses[start:start + batch_size]
+        feedback = tables.feedback_matrix(batch, candidates).astype(np.int64)
+        feedback += np.arange(len(batch))[:, None] * feedback_size
+        sizes[start:start + len(batch)] = np.bincount(
+            feedback.ravel(), minlength=len(batch) * feedback_size
+        ).reshape(len(batch), feedback_size)
+    return sizes
+
+
+def rate(sizes, strategy):
+    """
+    Rates each guess from its partition sizes, higher is better
+    entropy - expected information gained from the feedback
+    minimax - negative size of the largest remaining partition
+    """
+    if strategy == STRATEGY_MINIMAX:
+        return -sizes.max(axis=1).astype(np.float64)
+    total = sizes.sum(axis=1, keepdims=True)
+    probabilities = sizes / total
+    with np.errstate(divide='ignore', invalid='ignore'):
+        terms = np.where(sizes > 0, probabilities * np.log2(probabilities), 0.0)
+    return -terms.sum(axis=1)
+
+
+def best_guess(tables, candidates, guesses, strategy=STRATEGY_ENTROPY):
+    """
+    Picks the best of `guesses` against `candidates`
+    Ties go to guesses that are themselves candidates, since they can win outright
+    """
+    ratings = rate(partition_sizes(tables, guesses, candidates), strategy)
+    is_candidate = np.isin(guesses, candidates)
+    best = np.lexsort((is_candidate, ratings))[-1]
+    return int(guesses[best])
+
+
+def first_guess_patterns(length):
+    """
+    Before any feedback every code is equivalent to one that uses digits in first-seen order
+    (0, 1, 2...) with repeats grouped together, so only those patterns need to be rated
+    """
+    patterns = []
+
+    def build(prefix, remaining, largest):
+        if remaining == 0:
+            digits = []
+            for digit, size in enumerate(prefix):
+                digits.extend([digit] * size)
+            patterns.append(scoring.encode(''.join(map(str, digits))))
+            return
+        for size in range(min(remaining, largest), 0, -1):
+            if len(prefix) < scoring.BASE:
+                build(prefix + [size], remaining - size, size)
+
+    build([], length, length)
+    return np.array(patterns, dtype=np.int32)
+
+
+@lru_cache(maxsize=None)
+def first_guess(length, strategy=STRATEGY_ENTROPY):
+    """
+    Best opening guess for a code length, computed once per process
+    """
+    tables = scoring.get_tables(length)
+    candidates = np.arange(tables.size, dtype=np.int32)
+    return best_guess(tables, candidates, first_guess_patterns(length), strategy)
+
+
+def suggest(length, rounds, strategy=STRATEGY_ENTROPY):
+    """
+    Suggests the next guess for a game from its (guess, correct_numbers, correct_positions) rounds
+    Returns (guess, remaining) where guess is a code string, or None if no code fits the rounds
+    """
+    usable_rounds = [r for r in rounds if scoring.is_code(r[0], length)]
+    if not usable_rounds:
+        return suggest_from_candidates(length, None, strategy)
+    return suggest_from_candidates(length, candidates_for_rounds(length, usable_rounds), strategy)
+
+
+def suggest_from_candidates(length, candidates, strategy=STRATEGY_ENTROPY):
+    """
+    Suggests the next guess given the packed codes still possible
+    candidates - None before any feedback, which uses the memoized opening guess
+    Returns (guess, remaining)
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError(f'Unknown strategy: {strategy}')
+
+    tables = scoring.get_tables(length)
+    if candidates is None or len(candidates) == tables.size:
+        return scoring.decode(first_guess(length, strategy), length), tables.size
+
+    if len(candidates) <= 2:
+        guess = int(candidates[0]) if len(candidates) else None
+    else:
+        guess_count = max(1, min(len(candidates), WORK_BUDGET // len(candidates)))
+        if guess_count < len(candidates):
+            # Evenly spaced sample, so the same rounds always give the same hint
+            guesses = candidates[np.linspace(0, len(candidates) - 1, guess_count).astype(np.int64)]
+        else:
+            guesses = candidates
+        guess = best_guess(tables, candidates, guesses, strategy)
+
+    if guess is None:
+        return None, 0
+    return scoring.decode(guess, length), len(candidates)
@@ -2,15 +2,50 @@ from time import timezone
 from django.urls import reverse
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.core.cache import cache
+from django.db import connection, connections
+from django.db.models import Q
+from django.test import AsyncClient
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone as django_timezone
 
+from asgiref.sync import async_to_sync, sync_to_async
 from rest_framework.test import APIClient
-from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
 from rest_framework import status
-
-from game.models import Game, Leaderboard, PlayerProfile, Round
+from rest_framework.exceptions import ErrorDetail, ParseError
+from rest_framework.renderers import JSONRenderer
+
+from game.authentication import PlayerRefreshToken
+from game import archive, candidate_sets, daily, events, metrics, model_cache, rankings, runtime, scoring, simulation, solver
+from game.mixins import PlayerDataMixin
+from game.renderers import NDJSONRenderer, ORJSONParser, ORJSONRenderer
+from game.serializers import (GameSerializer, LeaderboardSerializer, PlayerProfileSerializer, RoundSerializer,
+                              values_mapper)
+from game.views import RoundsView, RoundViewSet
+from game.secret_sources import SecretPool, SecretSource, SeededRandomSource, StubSource, SystemRandomSource
+from game.models import ArchivedGame, DailyChallenge, Game, Leaderboard, PlayerProfile, PlayerStats, RankBucket, Round
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import csv
 import datetime
+import decimal
+import io
+import itertools
+import json
+import os
+import prometheus_client
+import random
+import statistics
+import subprocess
+import sys
+import numpy as np
 import pytest
+import requests
+import threading
+import time
 
 # Create your tests here.
 
@@ -24,6 +59,12 @@ game, round, leaderboard with mock data
 """
 
 
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+    model_cache.get_cache().clear()
+
+
 @pytest.fixture
 def user(db):
     user = User.objects.create_user(
@@ -69,6 +110,8 @@ def superuser_client(api_client, superuser):
 def game(db, player_profile):
     new_game = Game.objects.create(
         id=1, player=player_profile, secret_number='1234', game_round=0, total_time=datetime.timedelta(seconds=0))
+    player_profile.current_game = new_game
+    player_profile.save()
     return new_game
 
 
@@ -138,6 +181,26 @@ class TestPlayerProfileViewSet:
         assert response.status_code == status.HTTP_400_BAD_REQUEST
 
 
+@pytest.mark.django_db
+class TestPlayerDataMixin:
+    def test_get_player_data(self, user, game, rf):
+        request = rf.get('/')
+        request.user = user
+        player_data = PlayerDataMixin().get_player_data(request)
+
+        assert player_data == {
+            'player': user.id, 'difficulty': 4, 'current_game': game.id}
+
+    def test_get_player_data_loads_profile_once(self, user, game, rf, django_assert_num_queries):
+        request = rf.get('/')
+        request.user = user
+        mixin = PlayerDataMixin()
+
+        with django_assert_num_queries(1):
+            mixin.get_player_data(request)
+            mixin.get_player_data(request)
+
+
 @pytest.mark.django_db
 class TestDifficultyConfigView:
     def test_get_difficulty(self, player_profile, user_client):
@@ -187,6 +250,112 @@ class TestNewGameView:
         assert response.status_code == status.HTTP_401_UNAUTHORIZED
 
 
+class FailingRemoteSource(SecretSource):
+    remote = True
+
+    def fetch(self, difficulty, count):
+        raise requests.exceptions.ConnectionError('random.org unreachable')
+
+
+class TestSecretPool:
+    @pytest.mark.parametrize('difficulty', [4, 5, 6])
+    def test_get_secret_from_stub_source(self, difficulty):
+        pool = SecretPool(StubSource(), batch_size=5, low_watermark=1)
+        secret_number = pool.get(difficulty)
+
+        assert secret_number == '123456'[:difficulty]
+        assert pool.size(difficulty) >= 1
+
+    def test_refill_in_batches(self):
+        pool = SecretPool(StubSource(), batch_size=50, low_watermark=0)
+        added = pool.refill(4)
+
+        assert added == 50
+        assert pool.size(4) == 50
+
+    def test_fallback_when_remote_source_fails(self):
+        pool = SecretPool(FailingRemoteSource(), batch_size=5, low_watermark=0)
+        secret_number = pool.get(5)
+
+        assert len(secret_number) == 5
+        assert SecretPool.is_valid(secret_number, 5) == True
+
+    def test_fallback_when_local_source_is_invalid(self):
+        class InvalidSource(SecretSource):
+            def fetch(self, difficulty, count):
+                return ['9' * difficulty] * count
+
+        pool = SecretPool(InvalidSource(), batch_size=5, low_watermark=0)
+        secret_number = pool.get(4)
+
+        assert SecretPool.is_valid(secret_number, 4) == True
+        assert pool.size(4) == 0
+
+    def test_system_random_source(self):
+        batch = SystemRandomSource().fetch(6, 100)
+
+        assert len(batch) == 100
+        assert all(SecretPool.is_valid(secret_number, 6) for secret_number in batch)
+
+
+def legacy_evaluate_guesses(secret_number_list, guess_list):
+    """
+    Original RoundsView.evaluate_guesses, kept as the reference for the scoring engine
+    """
+    correct_numbers = 0
+    correct_positions = 0
+
+    for index, num in enumerate(guess_list):
+        if secret_number_list[index] == num:
+            correct_numbers += 1
+            correct_positions += 1
+            guess_list[index] = 'x'
+            secret_number_list[index] = 'x'
+
+    for index, num in enumerate(guess_list):
+        if num == 'x':
+            continue
+        if num in secret_number_list:
+            correct_numbers += 1
+            new_index = secret_number_list.index(num)
+            secret_number_list[new_index] = 'x'
+
+    return correct_numbers, correct_positions
+
+
+class TestScoring:
+    def test_encode_decode(self):
+        assert scoring.decode(scoring.encode('0427'), 4) == '0427'
+        assert scoring.decode(scoring.encode('765432'), 6) == '765432'
+
+    @pytest.mark.parametrize('length', [4, 5, 6])
+    def test_score_matches_legacy(self, length):
+        rng = random.Random(length)
+        for _ in range(2000):
+            secret_number = ''.join(rng.choice('01234567') for _ in range(length))
+            guess = ''.join(rng.choice('01234567') for _ in range(length))
+
+            assert scoring.score_codes(secret_number, guess) == legacy_evaluate_guesses(
+                list(secret_number), list(guess))
+
+    def test_score_many_matches_scalar(self):
+        tables = scoring.get_tables(4)
+        guess = scoring.encode('1123')
+        correct_numbers, correct_positions = tables.score_many(guess)
+
+        assert len(correct_numbers) == 8 ** 4
+        for code in range(0, 8 ** 4, 37):
+            assert (correct_numbers[code], correct_positions[code]) == scoring.score(code, guess, 4)
+
+    def test_score_many_subset(self):
+        tables = scoring.get_tables(5)
+        codes = np.array([scoring.encode('12345'), scoring.encode('54321')])
+        correct_numbers, correct_positions = tables.score_many(scoring.encode('12345'), codes)
+
+        assert list(correct_numbers) == [5, 5]
+        assert list(correct_positions) == [5, 1]
+
+
 @pytest.mark.django_db
 class TestRoundsView:
     def test_get_rounds(self, base_round, user_client):
@@ -232,6 +401,7 @@ class TestRoundsView:
         assert response.data['guess'] == '1234'
         assert response.data['correct_numbers'] == 4
         assert response.data['correct_positions'] == 4
+        assert response.data['possibilities_remaining'] == 1
 
         # Test game data was updated
         assert initial_game_round == post_game_round - 1
@@ -242,6 +412,52 @@ class TestRoundsView:
         # Test updated game data type
         assert isinstance(game.total_time, datetime.timedelta) == True
 
+    def test_post_rounds_possibilities_remaining(self, game, user_client):
+        url = reverse('game-rounds')
+        first = user_client.post(url, {"guess": '1111'}, format='json')
+        second = user_client.post(url, {"guess": '5670'}, format='json')
+
+        expected_first = len(solver.candidates_for_rounds(4, [('1111', 1, 1)]))
+        expected_second = len(solver.candidates_for_rounds(4, [('1111', 1, 1), ('5670', 0, 0)]))
+        assert first.data['possibilities_remaining'] == expected_first
+        assert second.data['possibilities_remaining'] == expected_second
+
+    def test_post_rounds_rebuilds_evicted_candidates(self, game, base_round, user_client):
+        url = reverse('game-rounds')
+        game.game_round = 1
+        game.save()
+
+        response = user_client.post(url, {"guess": '5670'}, format='json')
+
+        expected = len(solver.candidates_for_rounds(4, [('1111', 1, 1), ('5670', 0, 0)]))
+        assert response.data['possibilities_remaining'] == expected
+        assert len(candidate_sets.load(game.id, 4, 2)) == expected
+
+    def test_post_rounds_after_win(self, game, user_client):
+        url = reverse('game-rounds')
+        user_client.post(url, {"guess": '1234'}, format='json')
+
+        response = user_client.post(url, {"guess": '4321'}, format='json')
+        game.refresh_from_db()
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert game.result == 'W'
+        assert game.game_round == 1
+
+    def test_post_rounds_loss_after_ten_rounds(self, game, user_client):
+        url = reverse('game-rounds')
+        guesses = ['0000', '1111', '2222', '3333', '4444', '5555', '6666', '7777', '0011', '2233']
+        for guess in guesses:
+            response = user_client.post(url, {"guess": guess}, format='json')
+            assert response.status_code == status.HTTP_201_CREATED
+
+        eleventh = user_client.post(url, {"guess": '4455'}, format='json')
+        game.refresh_from_db()
+
+        assert eleventh.status_code == status.HTTP_400_BAD_REQUEST
+        assert game.result == 'L'
+        assert Leaderboard.objects.get(game=game).result == 'L'
+
     def test_post_rounds_unauthorized(self, api_client):
         url = reverse('game-rounds')
         response = api_client.post(url)
@@ -267,6 +483,15 @@ class TestRoundsView:
 
         assert response.status_code == status.HTTP_400_BAD_REQUEST
 
+    @pytest.mark.parametrize('guess', ['', '123', '12a4', '1289', '１２３４'])
+    def test_post_rounds_invalid_guess(self, game, user_client, guess):
+        response = user_client.post(reverse('game-rounds'), {'guess': guess}, format='json')
+        game.refresh_from_db()
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert game.game_round == 0
+        assert not Round.objects.exists()
+
     def test_post_rounds_duplicate_guess(self, game, base_round, user_client):
         url = reverse('game-rounds')
         post_data = {
@@ -278,6 +503,122 @@ class TestRoundsView:
         assert response.status_code == status.HTTP_400_BAD_REQUEST
 
 
+@pytest.mark.django_db
+class TestRoundsBatchView:
+    def test_batch_matches_single_guesses(self, game, user_client):
+        guesses = ['1111', '5670', '1243']
+        response = user_client.post(reverse('game-rounds-batch'), {'guesses': guesses}, format='json')
+
+        assert response.status_code == status.HTTP_201_CREATED
+        assert response.data['result'] is None
+        assert response.data['unplayed'] == 0
+        assert [round_data['guess'] for round_data in response.data['rounds']] == guesses
+        assert [round_data['possibilities_remaining'] for round_data in response.data['rounds']] == [
+            len(solver.candidates_for_rounds(4, [('1111', 1, 1), ('5670', 0, 0), ('1243', 4, 2)][:count]))
+            for count in (1, 2, 3)]
+
+        game.refresh_from_db()
+        assert game.game_round == 3
+        assert user_client.get(reverse('game-rounds')).json() == [
+            {key: value for key, value in round_data.items() if key != 'possibilities_remaining'}
+            for round_data in response.json()['rounds']]
+
+    def test_batch_stops_at_win(self, game, user_client):
+        response = user_client.post(
+            reverse('game-rounds-batch'), {'guesses': ['5670', '1234', '4321']}, format='json')
+        game.refresh_from_db()
+
+        assert response.data['result'] == 'W'
+        assert response.data['unplayed'] == 1
+        assert game.game_round == 2
+        assert Leaderboard.objects.get(game=game).result == 'W'
+        assert PlayerStats.objects.get(player_id=game.player_id, difficulty=4).wins == 1
+        assert user_client.post(reverse('game-rounds'), {'guess': '4321'}, format='json').status_code == 400
+
+    def test_batch_stops_at_last_round(self, game, user_client):
+        user_client.post(reverse('game-rounds-batch'), {'guesses': ['0000', '1111', '2222', '3333']}, format='json')
+        guesses = ['4444', '5555', '6666', '7777', '0011', '2233', '4455']
+
+        response = user_client.post(reverse('game-rounds-batch'), {'guesses': guesses}, format='json')
+
+        assert response.data['result'] == 'L'
+        assert response.data['unplayed'] == 1
+        assert len(response.data['rounds']) == 6
+        assert Leaderboard.objects.get(game=game).result == 'L'
+
+    def test_batch_continues_single_guesses(self, game, base_round, user_client):
+        Game.objects.filter(pk=game.id).update(game_round=1)
+        model_cache.invalidate_game(game.id)
+
+        response = user_client.post(reverse('game-rounds-batch'), {'guesses': ['5670']}, format='json')
+
+        expected = len(solver.candidates_for_rounds(4, [('1111', 1, 1), ('5670', 0, 0)]))
+        assert response.data['rounds'][0]['possibilities_remaining'] == expected
+
+    @pytest.mark.parametrize('guesses, index', [
+        (['1111', 1234], 1), (['1111', '1234567'], 1), (['1111', '2222', '1111'], 2),
+        (['1111', ''], 1), (['123', '1111'], 0), (['1111', '2222', '12x4'], 2), (['8888'], 0)])
+    def test_batch_rejects_bad_guesses(self, game, user_client, guesses, index):
+        response = user_client.post(reverse('game-rounds-batch'), {'guesses': guesses}, format='json')
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.data['index'] == index
+        assert not Round.objects.exists()
+
+    @pytest.mark.parametrize('guesses', [None, [], '1234', ['0000'] * 11])
+    def test_batch_rejects_bad_lists(self, game, user_client, guesses):
+        response = user_client.post(reverse('game-rounds-batch'), {'guesses': guesses}, format='json')
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_batch_duplicate_of_earlier_round(self, game, base_round, user_client):
+        response = user_client.post(reverse('game-rounds-batch'), {'guesses': ['5670', '1111']}, format='json')
+        game.refresh_from_db()
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert game.game_round == 0
+        assert Round.objects.count() == 1
+
+    def test_batch_without_game(self, player_profile, user_client):
+        response = user_client.post(reverse('game-rounds-batch'), {'guesses': ['1234']}, format='json')
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.django_db(transaction=True)
+class TestConcurrentRounds:
+    def test_parallel_guesses(self, user, game):
+        url = reverse('game-rounds')
+        token = str(RefreshToken.for_user(user).access_token)
+        guesses = [f'{a}{b}{c}{d}' for a, b, c, d in itertools.product('0567', repeat=4)][:40]
+        barrier = threading.Barrier(8)
+
+        def submit(batch):
+            client = APIClient()
+            client.credentials(HTTP_AUTHORIZATION=f'JWT {token}')
+            codes = []
+            try:
+                barrier.wait()
+                for guess in batch:
+                    codes.append(client.post(url, {"guess": guess}, format='json').status_code)
+            finally:
+                connections.close_all()
+            return codes
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(submit, [guesses[i::8] for i in range(8)]))
+
+        codes = [code for batch in results for code in batch]
+        game.refresh_from_db()
+
+        assert set(codes) <= {201, 400, 409}
+        assert codes.count(201) == 10
+        assert game.game_round == 10
+        assert Round.objects.filter(game=game).count() == 10
+        assert Leaderboard.objects.filter(game=game).count() == 1
+        assert game.result == 'L'
+
+
 @pytest.mark.django_db
 class TestLeaderboardTotalsView:
     def test_get_totals(self, leaderboard, user_client):
@@ -290,6 +631,369 @@ class TestLeaderboardTotalsView:
         assert response.data['fastest_time'] == datetime.timedelta(
             minutes=1, seconds=30)
 
+    def test_get_totals_no_results(self, game, user_client):
+        url = reverse('leaderboard')
+
+        response = user_client.get(url)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['wins'] == 0
+        assert response.data['fastest_time'] == None
+
+
+@pytest.mark.django_db
+class TestGlobalLeaderboardView:
+    @pytest.fixture
+    def wins(self, player_profile, superuser):
+        other_profile = PlayerProfile.objects.get(player=superuser)
+        seconds = [50, 20, 20, 90, 35, 70, 7200 * 4]
+        entries = []
+        for index, total in enumerate(seconds):
+            profile = player_profile if index % 2 else other_profile
+            game = Game.objects.create(player=profile, secret_number='1234')
+            entries.append(Leaderboard.objects.create(
+                result='W', total_time=datetime.timedelta(seconds=total, milliseconds=index),
+                difficulty=4, player=profile, game=game))
+        return entries
+
+    def test_pages_follow_total_time_order(self, wins, user_client):
+        url = reverse('global-leaderboard')
+        first = user_client.get(url, {'difficulty': 4, 'limit': 3})
+        second = user_client.get(url, {'difficulty': 4, 'limit': 3, 'cursor': first.data['next']})
+        third = user_client.get(url, {'difficulty': 4, 'limit': 3, 'cursor': second.data['next']})
+
+        results = first.data['results'] + second.data['results'] + third.data['results']
+        expected = sorted(wins, key=lambda entry: (entry.total_time, entry.id))
+        assert [row['total_time'] for row in results] == [entry.total_time for entry in expected]
+        assert [row['rank'] for row in results] == list(range(1, len(wins) + 1))
+        assert third.data['next'] == None
+
+    def test_my_rank(self, wins, player_profile, user_client):
+        url = reverse('global-leaderboard')
+        response = user_client.get(url, {'difficulty': 4})
+
+        ordered = sorted(wins, key=lambda entry: (entry.total_time, entry.id))
+        expected = next(index for index, entry in enumerate(ordered, 1) if entry.player_id == player_profile.id)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['my_rank'] == expected
+
+    def test_rank_matches_count_after_rebuild(self, wins):
+        RankBucket.objects.all().delete()
+        call_command('rebuild_rank_buckets', stdout=io.StringIO())
+
+        for entry in wins:
+            faster = Leaderboard.objects.filter(result='W', difficulty=4).filter(
+                Q(total_time__lt=entry.total_time) | Q(total_time=entry.total_time, id__lt=entry.id)).count()
+            assert rankings.rank_of(4, entry.total_time, entry.id) == faster + 1
+
+    def test_edits_move_rank_buckets(self, wins, superuser_client):
+        def buckets():
+            return set(RankBucket.objects.filter(wins__gt=0).values_list('difficulty', 'bucket', 'wins'))
+
+        superuser_client.patch(reverse('leaderboard-detail', args=[wins[0].id]), {'total_time': '00:00:10'}, format='json')
+        superuser_client.patch(reverse('leaderboard-detail', args=[wins[1].id]), {'result': 'L'}, format='json')
+        superuser_client.patch(reverse('leaderboard-detail', args=[wins[2].id]), {'difficulty': 5}, format='json')
+        updated = buckets()
+
+        RankBucket.objects.all().delete()
+        call_command('rebuild_rank_buckets', stdout=io.StringIO())
+        assert updated == buckets()
+        assert (4, 10, 1) in updated and (5, 20, 1) in updated
+
+    def test_no_wins(self, game, user_client):
+        url = reverse('global-leaderboard')
+        response = user_client.get(url, {'difficulty': 6})
+
+        assert response.data['results'] == []
+        assert response.data['my_rank'] == None
+
+    def test_invalid_cursor(self, game, user_client):
+        url = reverse('global-leaderboard')
+        response = user_client.get(url, {'cursor': 'not-a-cursor'})
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.django_db
+class TestDailyChallenge:
+    @pytest.fixture
+    def other_client(self, superuser):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'JWT {RefreshToken.for_user(superuser).access_token}')
+        return client
+
+    def finish(self, game, seconds, result='W'):
+        return Leaderboard.objects.create(
+            result=result, total_time=datetime.timedelta(seconds=seconds), difficulty=4,
+            player=game.player, game=game)
+
+    def test_players_share_the_days_secret(self, player_profile, user_client, other_client):
+        url = reverse('new-game')
+        first = user_client.post(url, {'daily': True}, format='json')
+        second = other_client.post(url, {'daily': True}, format='json')
+
+        challenge = DailyChallenge.objects.get(date=daily.today(), difficulty=4)
+        games = Game.objects.filter(challenge=challenge)
+        assert first.status_code == second.status_code == status.HTTP_201_CREATED
+        assert games.count() == 2
+        assert {game.secret_number for game in games} == {challenge.secret_number}
+        player_profile.refresh_from_db()
+        assert player_profile.current_game.challenge == challenge
+
+    def test_challenge_is_played_once(self, player_profile, user_client):
+        url = reverse('new-game')
+        user_client.post(url, {'daily': True}, format='json')
+        response = user_client.post(url, {'daily': True}, format='json')
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert Game.objects.filter(player=player_profile, challenge__isnull=False).count() == 1
+        assert user_client.post(url, format='json').status_code == status.HTTP_201_CREATED
+
+    def test_async_new_game(self, player_profile, user_client, async_user_client):
+        url = reverse('async-new-game')
+        first = async_user_client.post(url, {'daily': True})
+        second = async_user_client.post(url, {'daily': True})
+
+        challenge = DailyChallenge.objects.get(date=daily.today(), difficulty=4)
+        player_profile.refresh_from_db()
+        assert first.status_code == status.HTTP_201_CREATED
+        assert second.status_code == status.HTTP_400_BAD_REQUEST
+        assert player_profile.current_game.challenge == challenge
+        assert player_profile.current_game.secret_number == challenge.secret_number
+        assert user_client.post(reverse('new-game'), {'daily': True}, format='json').status_code == 400
+
+    def test_create_daily_challenges(self, db):
+        call_command('create_daily_challenges', '--days', '2', stdout=io.StringIO())
+        secrets = dict(DailyChallenge.objects.values_list('id', 'secret_number'))
+        call_command('create_daily_challenges', '--days', '3', stdout=io.StringIO())
+
+        assert DailyChallenge.objects.count() == 9
+        assert DailyChallenge.objects.filter(date=daily.today() + datetime.timedelta(days=2)).count() == 3
+        assert dict(DailyChallenge.objects.filter(id__in=secrets).values_list('id', 'secret_number')) == secrets
+
+    def test_leaderboard(self, player_profile, superuser, user_client):
+        challenge = daily.get_challenge(daily.today(), 4)
+        other_profile = PlayerProfile.objects.get(player=superuser)
+        mine = Game.objects.create(player=player_profile, secret_number='1234', challenge=challenge, game_round=5)
+        theirs = Game.objects.create(player=other_profile, secret_number='1234', challenge=challenge, game_round=3)
+        self.finish(mine, 40)
+        self.finish(theirs, 25)
+        self.finish(Game.objects.create(player=player_profile, secret_number='1234'), 5)
+
+        response = user_client.get(reverse('daily-leaderboard'))
+
+        assert response.status_code == status.HTTP_200_OK
+        assert [(row['username'], row['rounds']) for row in response.data['results']] == [
+            ('superuser', 3), ('user', 5)]
+        assert (response.data['players'], response.data['wins']) == (2, 2)
+        assert response.data['my_result']['rank'] == 2
+        assert response.data['my_result']['total_time'] == datetime.timedelta(seconds=40)
+
+    def test_leaderboard_is_served_from_snapshot(self, game, user_client):
+        url = reverse('daily-leaderboard')
+        user_client.get(url)
+        challenge = daily.get_challenge(daily.today(), 4)
+        self.finish(Game.objects.create(player=game.player, secret_number='1234', challenge=challenge), 30)
+
+        with CaptureQueriesContext(connection) as context:
+            response = user_client.get(url)
+
+        assert response.data['results'] == []
+        assert response.data['my_result']['rank'] == None
+        # Only the player's own result is read from Leaderboard
+        assert len([query for query in context.captured_queries if 'game_leaderboard' in query['sql']]) == 1
+
+    def test_expired_snapshot_is_rebuilt(self, game, user_client, settings):
+        settings.DAILY_CHALLENGE = {'SNAPSHOT_SECONDS': 0}
+        url = reverse('daily-leaderboard')
+        user_client.get(url)
+        challenge = daily.get_challenge(daily.today(), 4)
+        self.finish(Game.objects.create(player=game.player, secret_number='1234', challenge=challenge), 30)
+
+        response = user_client.get(url)
+
+        assert [row['player'] for row in response.data['results']] == [game.player_id]
+
+    def test_stale_snapshot_while_rebuilding(self, game, settings):
+        settings.DAILY_CHALLENGE = {'SNAPSHOT_SECONDS': 0}
+        today = daily.today()
+        daily.leaderboard(today, 4)
+        daily.get_cache().add(daily.LOCK_KEY.format(date=today, difficulty=4), True)
+        stale = metrics.snapshot_requests.value('daily_leaderboard', 'stale')
+
+        with CaptureQueriesContext(connection) as context:
+            snapshot = daily.leaderboard(today, 4)
+
+        assert snapshot['results'] == []
+        assert context.captured_queries == []
+        assert metrics.snapshot_requests.value('daily_leaderboard', 'stale') == stale + 1
+
+    def test_invalid_date(self, game, user_client):
+        url = reverse('daily-leaderboard')
+        tomorrow = daily.today() + datetime.timedelta(days=1)
+
+        assert user_client.get(url, {'date': 'today'}).status_code == status.HTTP_400_BAD_REQUEST
+        assert user_client.get(url, {'date': tomorrow.isoformat()}).status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.django_db
+class TestPlayerStats:
+    def test_stats_follow_leaderboard(self, player_profile, game):
+        second_game = Game.objects.create(player=player_profile, secret_number='4321')
+        third_game = Game.objects.create(player=player_profile, secret_number='5555')
+        Leaderboard.objects.create(
+            result='W', total_time=datetime.timedelta(seconds=90), difficulty=4, player=player_profile, game=game)
+        faster = Leaderboard.objects.create(
+            result='W', total_time=datetime.timedelta(seconds=40), difficulty=4, player=player_profile, game=second_game)
+        Leaderboard.objects.create(
+            result='L', total_time=datetime.timedelta(seconds=20), difficulty=4, player=player_profile, game=third_game)
+
+        stats = PlayerStats.objects.get(player=player_profile, difficulty=4)
+        assert (stats.wins, stats.losses) == (2, 1)
+        assert stats.fastest_time == datetime.timedelta(seconds=40)
+
+        faster.delete()
+        stats.refresh_from_db()
+        assert (stats.wins, stats.losses) == (1, 1)
+        assert stats.fastest_time == datetime.timedelta(seconds=90)
+
+    def test_edit_moves_stats(self, leaderboard, superuser, superuser_client):
+        other_profile = PlayerProfile.objects.get(player=superuser)
+        url = reverse('leaderboard-detail', args=[leaderboard.id])
+
+        response = superuser_client.patch(url, {'player': other_profile.player_id, 'difficulty': 5}, format='json')
+
+        assert response.status_code == status.HTTP_200_OK
+        assert not PlayerStats.objects.filter(player=leaderboard.player, difficulty=4).exists()
+        stats = PlayerStats.objects.get(player=other_profile, difficulty=5)
+        assert (stats.wins, stats.fastest_time) == (1, leaderboard.total_time)
+
+    def test_rebuild_player_stats_command(self, leaderboard):
+        PlayerStats.objects.all().delete()
+
+        call_command('rebuild_player_stats', stdout=io.StringIO())
+
+        stats = PlayerStats.objects.get(player=leaderboard.player, difficulty=4)
+        assert stats.wins == 1
+        assert stats.fastest_time == leaderboard.total_time
+
+
+class TestSolver:
+    def test_candidates_for_rounds(self):
+        candidates = solver.candidates_for_rounds(4, [('1111', 1, 1), ('1234', 4, 4)])
+
+        assert [scoring.decode(code, 4) for code in candidates] == ['1234']
+
+    @pytest.mark.parametrize('strategy', solver.STRATEGIES)
+    def test_suggest_is_consistent(self, strategy):
+        rounds = [('0123', 2, 1), ('4567', 2, 0)]
+        guess, remaining = solver.suggest(4, rounds, strategy)
+        candidates = solver.candidates_for_rounds(4, rounds)
+
+        assert remaining == len(candidates)
+        for previous_guess, correct_numbers, correct_positions in rounds:
+            assert scoring.score_codes(guess, previous_guess) == (correct_numbers, correct_positions)
+
+    @pytest.mark.parametrize('length', [4, 5, 6])
+    def test_solver_wins_within_ten_rounds(self, length):
+        rng = random.Random(length)
+        secret_number = ''.join(rng.choice('01234567') for _ in range(length))
+        rounds = []
+        while len(rounds) < 10:
+            guess, _remaining = solver.suggest(length, rounds)
+            correct_numbers, correct_positions = scoring.score_codes(secret_number, guess)
+            rounds.append((guess, correct_numbers, correct_positions))
+            if correct_positions == length:
+                break
+
+        assert rounds[-1][0] == secret_number
+
+
+@pytest.mark.django_db
+class TestGameStateView:
+    def test_get_state(self, base_round, leaderboard, user_client):
+        url = reverse('game-state')
+        response = user_client.get(url)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['difficulty'] == 4
+        assert response.data['current_game'] == 1
+        assert isinstance(response.data['start_time'], datetime.datetime) == True
+        assert [round_data['guess'] for round_data in response.data['rounds']] == ['1111']
+        assert response.data['leaderboard']['wins'] == 1
+        assert response.data['leaderboard']['fastest_time'] == datetime.timedelta(
+            minutes=1, seconds=30)
+
+    def test_get_state_no_game(self, player_profile, user_client):
+        url = reverse('game-state')
+        response = user_client.get(url)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['current_game'] == None
+        assert response.data['rounds'] == []
+        assert response.data['leaderboard']['wins'] == 0
+
+
+@pytest.mark.django_db
+class TestConditionalGet:
+    @pytest.mark.parametrize('url_name', ['game-rounds', 'start-time', 'leaderboard', 'game-state'])
+    def test_not_modified(self, url_name, base_round, user_client, django_assert_max_num_queries):
+        url = reverse(url_name)
+        response = user_client.get(url)
+        etag = response['ETag']
+
+        with django_assert_max_num_queries(2):
+            cached = user_client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert cached.status_code == status.HTTP_304_NOT_MODIFIED
+        assert cached['ETag'] == etag
+
+    def test_etag_changes_after_round(self, game, user_client):
+        url = reverse('game-rounds')
+        etag = user_client.get(url)['ETag']
+
+        user_client.post(url, {"guess": '5670'}, format='json')
+        response = user_client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response['ETag'] != etag
+        assert len(response.data) == 1
+
+    def test_etag_changes_after_resume(self, game, user_client):
+        url = reverse('start-time')
+        etag = user_client.get(url)['ETag']
+
+        user_client.patch(reverse('resume-game'))
+        response = user_client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response['ETag'] != etag
+
+
+@pytest.mark.django_db
+class TestHintView:
+    def test_get_hint(self, base_round, user_client):
+        url = reverse('hint')
+        response = user_client.get(url)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.data['guess']) == 4
+        assert scoring.score_codes(response.data['guess'], '1111') == (1, 1)
+        assert response.data['remaining'] > 0
+
+    def test_get_hint_invalid_strategy(self, game, user_client):
+        url = reverse('hint')
+        response = user_client.get(url, {'strategy': 'random'})
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_get_hint_no_game(self, player_profile, user_client):
+        url = reverse('hint')
+        response = user_client.get(url)
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
 
 @pytest.mark.django_db
 class TestStartTimeView:
@@ -315,6 +1019,22 @@ class TestResumeGameView:
         assert response.status_code == status.HTTP_200_OK
         assert (new_time > old_time) == True
 
+    def test_resume_keeps_concurrent_round(self, game, user_client):
+        user_client.get(reverse('start-time'))
+        Game.objects.filter(pk=game.id).update(game_round=3, version=5)
+
+        user_client.patch(reverse('resume-game'))
+        game.refresh_from_db()
+
+        assert (game.game_round, game.version) == (3, 6)
+
+    def test_resume_finished_game(self, finished_game, user_client):
+        response = user_client.patch(reverse('resume-game'))
+        game = Game.objects.get(pk=finished_game.id)
+
+        assert response.data == {'status': 'finished', 'start_time': finished_game.start_time}
+        assert game.version == finished_game.version
+
     def test_patch_resume_game_bad_token(self, game, user_client):
         url = reverse('resume-game')
         user_client.credentials(HTTP_AUTHORIZATION=f'JWT {'bad token'}')
@@ -322,6 +1042,229 @@ class TestResumeGameView:
 
         assert response.status_code == status.HTTP_401_UNAUTHORIZED
 
+class AsyncUserClient:
+    """
+    Sends AsyncClient requests from sync tests with the user's token
+    AsyncClient only sends headers given per request, so the token is added to each call
+    """
+    def __init__(self, user):
+        self.client = AsyncClient()
+        self.headers = {'Authorization': f'JWT {RefreshToken.for_user(user).access_token}'}
+
+    def get(self, url, data=None, headers=None):
+        return async_to_sync(self.client.get)(url, data, headers={**self.headers, **(headers or {})})
+
+    def post(self, url, data=None, content_type='application/json'):
+        return async_to_sync(self.client.post)(url, data, content_type=content_type, headers=self.headers)
+
+
+@pytest.fixture
+def async_user_client(user):
+    return AsyncUserClient(user)
+
+
+@pytest.mark.django_db
+class TestAsyncViews:
+    @pytest.mark.parametrize('url_name', ['game-rounds', 'start-time', 'leaderboard', 'game-state', 'get-difficulty'])
+    def test_get_matches_sync_view(self, url_name, base_round, leaderboard, user_client, async_user_client):
+        sync_response = user_client.get(reverse(url_name))
+        response = async_user_client.get(reverse(f'async-{url_name}'))
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.content == sync_response.content
+        assert response.get('ETag') == sync_response.get('ETag')
+
+    def test_get_not_modified(self, base_round, async_user_client):
+        url = reverse('async-game-rounds')
+        etag = async_user_client.get(url)['ETag']
+        response = async_user_client.get(url, headers={'If-None-Match': etag})
+
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+        assert response.content == b''
+
+    def test_post_new_game(self, player_profile, async_user_client):
+        response = async_user_client.post(reverse('async-new-game'))
+        player_profile.refresh_from_db()
+
+        assert response.status_code == status.HTTP_201_CREATED
+        assert player_profile.current_game.secret_number == '1234'
+
+    def test_post_rounds(self, game, async_user_client):
+        url = reverse('async-game-rounds')
+        response = async_user_client.post(url, {'guess': '1243'})
+        duplicate = async_user_client.post(url, {'guess': '1243'})
+        game.refresh_from_db()
+
+        assert response.status_code == status.HTTP_201_CREATED
+        assert response.json()['correct_numbers'] == 4
+        assert response.json()['correct_positions'] == 2
+        assert duplicate.status_code == status.HTTP_400_BAD_REQUEST
+        assert game.game_round == 1
+
+    def test_post_rounds_bad_json(self, game, async_user_client):
+        response = async_user_client.post(reverse('async-game-rounds'), '{guess')
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_get_rounds_no_game(self, player_profile, async_user_client):
+        response = async_user_client.get(reverse('async-game-rounds'))
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    @pytest.mark.parametrize('headers', [{}, {'Authorization': 'JWT bad token'}])
+    def test_unauthenticated(self, headers, game, user):
+        response = async_to_sync(AsyncClient().get)(reverse('async-game-state'), headers=headers)
+
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+        assert 'detail' in response.json()
+
+
+def parse_event(chunk):
+    """
+    Returns (event type, data) from one Server-Sent Events message
+    """
+    fields = dict(line.split(': ', 1) for line in chunk.decode().strip().split('\n'))
+    return fields['event'], json.loads(fields['data'])
+
+
+@pytest.mark.django_db
+class TestGameEvents:
+    def stream_events(self, user, count, action=None, cookie_token=False):
+        """
+        Opens events/, runs `action` in a sync thread after the first event, and returns `count` events
+        """
+        async def scenario():
+            client = AsyncClient()
+            token = str(RefreshToken.for_user(user).access_token)
+            headers = {'Authorization': f'JWT {token}'}
+            if cookie_token:
+                client.cookies['AccessToken'] = token
+                headers = {}
+            response = await client.get(reverse('game-events'), headers=headers)
+            assert response.status_code == status.HTTP_200_OK
+            assert response['Content-Type'] == 'text/event-stream'
+
+            stream = aiter(response.streaming_content)
+            received = [parse_event(await anext(stream))]
+            if action is not None:
+                await sync_to_async(action)()
+            while len(received) < count:
+                received.append(parse_event(await asyncio.wait_for(anext(stream), 5)))
+            await stream.aclose()
+            return received
+
+        return async_to_sync(scenario)()
+
+    def test_clock_on_connect(self, game, user):
+        [(event_type, data)] = self.stream_events(user, 1)
+
+        assert event_type == events.EVENT_CLOCK
+        assert data['game'] == game.id
+        assert 'server_time' in data and 'start_time' in data
+        assert events.get_channel_layer().subscriber_count(events.player_group(user.id)) == 0
+
+    def test_round_and_game_over(self, game, user, user_client):
+        url = reverse('game-rounds')
+        received = self.stream_events(
+            user, 3, lambda: user_client.post(url, {"guess": '1234'}, format='json'))
+
+        assert [event_type for event_type, _data in received] == [
+            events.EVENT_CLOCK, events.EVENT_ROUND, events.EVENT_GAME_OVER]
+        assert received[1][1]['guess'] == '1234'
+        assert received[1][1]['correct_positions'] == 4
+        assert received[2][1]['result'] == Leaderboard.RESULT_WIN
+
+    def test_resume_sends_clock(self, game, user, user_client):
+        received = self.stream_events(user, 2, lambda: user_client.patch(reverse('resume-game')))
+        game.refresh_from_db()
+
+        assert received[1][0] == events.EVENT_CLOCK
+        assert datetime.datetime.fromisoformat(received[1][1]['start_time']) == game.start_time
+
+    def test_new_game(self, player_profile, user, user_client):
+        received = self.stream_events(user, 2, lambda: user_client.post(reverse('new-game')))
+
+        assert received[1][0] == events.EVENT_NEW_GAME
+        assert received[1][1]['difficulty'] == 4
+
+    def test_keepalive_clock(self, game, user, settings):
+        settings.GAME_EVENTS = {**settings.GAME_EVENTS, 'KEEPALIVE': 0.01}
+        received = self.stream_events(user, 2)
+
+        assert received[1][0] == events.EVENT_CLOCK
+        assert 'start_time' not in received[1][1]
+
+    def test_cookie_token(self, game, user):
+        [(event_type, _data)] = self.stream_events(user, 1, cookie_token=True)
+
+        assert event_type == events.EVENT_CLOCK
+
+    def test_unauthenticated(self, game):
+        response = async_to_sync(AsyncClient().get)(reverse('game-events'))
+
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_publish_from_thread(self):
+        async def scenario():
+            layer = events.InMemoryChannelLayer(capacity=1)
+            subscription = layer.subscribe('player:1')
+            await asyncio.to_thread(layer.publish, 'player:1', {'event': 'round'})
+            await asyncio.to_thread(layer.publish, 'player:1', {'event': 'dropped'})
+            event = await asyncio.wait_for(subscription.get(), 1)
+            subscription.close()
+            return event, subscription.dropped, layer.subscriber_count('player:1')
+
+        assert async_to_sync(scenario)() == ({'event': 'round'}, 1, 0)
+
+    def test_redis_layer(self, monkeypatch):
+        class RecordingClient:
+            def __init__(self):
+                self.messages = []
+
+            def publish(self, channel, data):
+                self.messages.append({'type': 'pmessage', 'channel': channel.encode(), 'data': data})
+                return 1
+
+        layer = events.RedisChannelLayer('redis://localhost:6379/0', prefix='test')
+        layer.client = RecordingClient()
+        monkeypatch.setattr(layer, 'start_listener', lambda: None)
+        start_time = datetime.datetime(2024, 1, 1, 12, tzinfo=datetime.timezone.utc)
+
+        async def scenario():
+            subscription = layer.subscribe('player:1')
+            other = layer.subscribe('player:2')
+            await asyncio.to_thread(layer.publish, 'player:1', {'event': 'clock', 'data': {'start_time': start_time}})
+            # What the listener thread receives from Redis
+            for message in layer.client.messages:
+                await asyncio.to_thread(layer.handle_message, message)
+            event = await asyncio.wait_for(subscription.get(), 1)
+            subscription.close()
+            other.close()
+            return event, other.queue.qsize()
+
+        event, other_queued = async_to_sync(scenario)()
+        assert layer.client.messages[0]['channel'] == b'test:player:1'
+        assert event == {'event': 'clock', 'data': {'start_time': '2024-01-01T12:00:00Z'}}
+        assert other_queued == 0
+
+    def test_wsgi(self, game, user_client):
+        response = user_client.get(reverse('game-events'))
+
+        assert response.status_code == status.HTTP_204_NO_CONTENT
+        assert not response.streaming
+
+    def test_disabled(self, game, user, user_client, settings, monkeypatch):
+        settings.GAME_EVENTS = {**settings.GAME_EVENTS, 'ENABLED': False}
+        token = str(RefreshToken.for_user(user).access_token)
+        response = async_to_sync(AsyncClient().get)(reverse('game-events'), headers={'Authorization': f'JWT {token}'})
+        assert response.status_code == status.HTTP_204_NO_CONTENT
+
+        published = []
+        monkeypatch.setattr(events.get_channel_layer(), 'publish', lambda group, event: published.append(event))
+        user_client.post(reverse('game-rounds'), {"guess": '1234'}, format='json')
+        assert published == []
+
+
 @pytest.mark.django_db
 class TestGameViewSet:
     def test_get_game_list_with_superuser(self, superuser, superuser_client):
@@ -329,7 +1272,7 @@ class TestGameViewSet:
 
         response = superuser_client.get(url)
         assert response.status_code == status.HTTP_200_OK
-        assert isinstance(response.data, list) == True
+        assert isinstance(response.data['results'], list) == True
 
     def test_get_game_list_with_user(self, user, user_client):
         url = reverse('game-list')
@@ -345,7 +1288,7 @@ class TestRoundViewSet:
 
         response = superuser_client.get(url)
         assert response.status_code == status.HTTP_200_OK
-        assert isinstance(response.data, list) == True
+        assert isinstance(response.data['results'], list) == True
 
     def test_get_round_list_with_user(self, user, user_client):
         url = reverse('round-list')
@@ -361,10 +1304,908 @@ class TestLeaderboardViewSet:
 
         response = superuser_client.get(url)
         assert response.status_code == status.HTTP_200_OK
-        assert isinstance(response.data, list) == True
+        assert isinstance(response.data['results'], list) == True
 
     def test_get_leaderboard_list_with_user(self, user, user_client):
         url = reverse('leaderboard-list')
 
         response = user_client.get(url)
         assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+@pytest.fixture
+def many_rounds(game):
+    Round.objects.bulk_create(
+        Round(game=game, guess=f'{index:04d}', correct_numbers=1, correct_positions=0) for index in range(25))
+    return RoundSerializer(Round.objects.order_by('id'), many=True).data
+
+
+def streamed(response):
+    return b''.join(response.streaming_content).decode()
+
+
+@pytest.mark.django_db
+class TestAdminPaginationAndExport:
+    def test_cursor_pagination_walks_every_row(self, many_rounds, superuser_client):
+        url = f'{reverse("round-list")}?limit=10'
+        results = []
+        while url:
+            response = superuser_client.get(url)
+            assert len(response.data['results']) <= 10
+            results.extend(response.data['results'])
+            url = response.data['next']
+
+        assert results == many_rounds
+
+    def test_export_ndjson(self, many_rounds, superuser_client, monkeypatch):
+        monkeypatch.setattr(RoundViewSet, 'export_chunk_size', 10)
+        with CaptureQueriesContext(connection) as context:
+            response = superuser_client.get(reverse('round-export'))
+            lines = streamed(response).splitlines()
+
+        assert response['Content-Type'] == 'application/x-ndjson; charset=utf-8'
+        assert [json.loads(line) for line in lines] == many_rounds
+        assert len([query for query in context.captured_queries if 'FROM "game_round"' in query['sql']]) == 3
+
+    def test_export_asgi(self, many_rounds, superuser, monkeypatch):
+        monkeypatch.setattr(RoundViewSet, 'export_chunk_size', 10)
+        monkeypatch.setattr(NDJSONRenderer, 'rows_per_chunk', 5)
+        chunks = []
+        export_chunk = RoundViewSet.export_chunk
+        monkeypatch.setattr(RoundViewSet, 'export_chunk',
+                            lambda self, queryset, last_pk: chunks.append(last_pk) or export_chunk(self, queryset, last_pk))
+        token = str(RefreshToken.for_user(superuser).access_token)
+
+        async def scenario():
+            response = await AsyncClient().get(reverse('round-export'), headers={'Authorization': f'JWT {token}'})
+            assert response.is_async
+            parts = []
+            async for part in response.streaming_content:
+                parts.append(part)
+                if len(parts) == 1:
+                    # Only the first chunk has been read when the first part is sent
+                    first_part_chunks = len(chunks)
+            return b''.join(parts).decode(), first_part_chunks
+
+        content, first_part_chunks = async_to_sync(scenario)()
+        assert [json.loads(line) for line in content.splitlines()] == many_rounds
+        assert first_part_chunks == 1
+        assert len(chunks) == 3
+
+    def test_export_csv(self, many_rounds, superuser_client):
+        response = superuser_client.get(reverse('round-export'), {'format': 'csv'})
+        rows = list(csv.DictReader(io.StringIO(streamed(response))))
+
+        assert response['Content-Disposition'] == 'attachment; filename="round.csv"'
+        assert len(rows) == 25
+        assert rows[0] == {key: str(value) for key, value in many_rounds[0].items()}
+
+    def test_export_csv_empty_cells(self, player_profile, superuser_client):
+        Game.objects.create(player=player_profile, secret_number='1234')
+        response = superuser_client.get(reverse('game-export'), HTTP_ACCEPT='text/csv')
+        header, row = streamed(response).splitlines()
+
+        assert header == 'id,player,secret_number,game_round,start_time,total_time'
+        assert row.split(',')[-1] == ''
+
+    def test_export_with_user(self, game, user_client):
+        assert user_client.get(reverse('game-export')).status_code == status.HTTP_403_FORBIDDEN
+
+
+"""
+Query budgets - the most SQL queries each endpoint may run
+Raise a budget only together with the change that needs the extra query.
+Every SELECT is also EXPLAINed, and gameplay endpoints fail on a full scan of a hot table.
+Set QUERY_PLANS_DIR to save the captured queries and plans as JSON, one file per endpoint.
+"""
+
+HOT_TABLES = ['game_round', 'game_leaderboard']
+
+# (method, url name, data, max queries, client fixture, check plans)
+QUERY_BUDGETS = [
+    ('get', 'get-difficulty', None, 2, 'user_client', True),
+    ('patch', 'get-difficulty', {'difficulty': 5}, 3, 'user_client', True),
+    ('post', 'new-game', None, 5, 'user_client', True),
+    ('get', 'game-rounds', None, 3, 'user_client', True),
+    ('post', 'game-rounds', {'guess': '5670'}, 6, 'user_client', True),
+    ('post', 'game-rounds-batch', {'guesses': ['5670', '5671']}, 6, 'user_client', True),
+    ('get', 'leaderboard', None, 3, 'user_client', True),
+    ('get', 'global-leaderboard', None, 6, 'user_client', True),
+    ('get', 'daily-leaderboard', None, 6, 'user_client', True),
+    ('get', 'hint', None, 2, 'user_client', True),
+    ('get', 'start-time', None, 2, 'user_client', True),
+    ('patch', 'resume-game', None, 4, 'user_client', True),
+    ('get', 'game-state', None, 4, 'user_client', True),
+    ('get', 'playerprofile-me', None, 2, 'user_client', True),
+    ('get', 'playerprofile-list', None, 2, 'superuser_client', False),
+    ('get', 'game-list', None, 2, 'superuser_client', False),
+    ('get', 'round-list', None, 2, 'superuser_client', False),
+    ('get', 'leaderboard-list', None, 2, 'superuser_client', False),
+]
+
+
+def explain(sql):
+    prefix = 'EXPLAIN QUERY PLAN ' if connection.vendor == 'sqlite' else 'EXPLAIN '
+    with connection.cursor() as cursor:
+        cursor.execute(prefix + sql)
+        columns = [column[0] for column in cursor.description]
+        return [dict(zip(columns, [str(value) for value in row])) for row in cursor.fetchall()]
+
+
+def full_scans(plan):
+    """
+    Hot tables that the plan reads without an index
+    """
+    scans = []
+    for row in plan:
+        if connection.vendor == 'sqlite':
+            words = row.get('detail', '').split()
+            if len(words) >= 2 and words[0] == 'SCAN' and words[1] in HOT_TABLES and 'INDEX' not in words:
+                scans.append(words[1])
+        elif row.get('table') in HOT_TABLES and row.get('type') == 'ALL':
+            scans.append(row['table'])
+    return scans
+
+
+def tables_queried(context):
+    return {table for query in context.captured_queries
+            for table in ('game_playerprofile', 'game_game') if f'FROM "{table}"' in query['sql']}
+
+
+@pytest.mark.django_db
+class TestModelCache:
+    def test_steady_state_requests_skip_profile_and_game(self, base_round, user_client):
+        user_client.get(reverse('game-state'))
+        with CaptureQueriesContext(connection) as context:
+            response = user_client.get(reverse('game-state'))
+            user_client.get(reverse('game-rounds'))
+            user_client.get(reverse('get-difficulty'))
+
+        assert response.status_code == status.HTTP_200_OK
+        assert tables_queried(context) == set()
+
+    def test_cold_cache_is_one_query(self, game, user, django_assert_num_queries):
+        with django_assert_num_queries(1):
+            profile = model_cache.get_profile(user.id, with_game=True)
+
+        assert profile.current_game == game
+        assert model_cache.get_game(game.id) == game
+
+    def test_round_updates_cached_game(self, game, user_client):
+        user_client.get(reverse('game-state'))
+        user_client.post(reverse('game-rounds'), {'guess': '5670'}, format='json')
+
+        response = user_client.get(reverse('game-state'))
+        assert response.data['game_round'] == 1
+        assert len(response.data['rounds']) == 1
+
+    def test_save_invalidates(self, game, player_profile, user):
+        model_cache.get_profile(user.id, with_game=True)
+
+        player_profile.difficulty = 6
+        player_profile.save()
+        game.secret_number = '765432'
+        game.save()
+
+        assert model_cache.get_profile(user.id).difficulty == 6
+        assert model_cache.get_game(game.id).secret_number == '765432'
+
+    def test_new_game_replaces_current_game(self, game, user_client):
+        user_client.get(reverse('game-state'))
+        user_client.post(reverse('new-game'))
+
+        assert user_client.get(reverse('game-state')).data['current_game'] != game.id
+
+    def test_delete_invalidates(self, player_profile, user):
+        model_cache.get_profile(user.id)
+        player_profile.delete()
+
+        with pytest.raises(PlayerProfile.DoesNotExist):
+            model_cache.get_profile(user.id)
+
+    def test_hit_and_miss_counters(self, game, user):
+        hits = metrics.model_cache_requests.value('player_profile', 'hit')
+        misses = metrics.model_cache_requests.value('player_profile', 'miss')
+
+        model_cache.get_profile(user.id)
+        model_cache.get_profile(user.id)
+
+        assert metrics.model_cache_requests.value('player_profile', 'miss') == misses + 1
+        assert metrics.model_cache_requests.value('player_profile', 'hit') == hits + 1
+
+    def test_async_views_use_cache(self, base_round, user_client, async_user_client):
+        user_client.get(reverse('game-state'))
+        with CaptureQueriesContext(connection) as context:
+            response = async_user_client.get(reverse('async-game-state'))
+
+        assert response.status_code == status.HTTP_200_OK
+        assert tables_queried(context) == set()
+
+
+@pytest.fixture
+def claims_client(game, user):
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'JWT {PlayerRefreshToken.for_user(user).access_token}')
+    return client
+
+
+def users_queried(context):
+    return [query['sql'] for query in context.captured_queries if 'FROM "core_user"' in query['sql']]
+
+
+@pytest.mark.django_db
+class TestPlayerClaims:
+    def test_login_token_has_claims(self, game, user, api_client):
+        response = api_client.post(
+            '/auth/jwt/create/', {'username': 'user', 'password': 'testpassword123'}, format='json')
+
+        access = AccessToken(response.data['access'])
+        assert (access['player'], access['difficulty'], access['current_game']) == (user.id, 4, game.id)
+
+    def test_reads_skip_user_query(self, base_round, claims_client):
+        claims_client.get(reverse('game-state'))
+        with CaptureQueriesContext(connection) as context:
+            response = claims_client.get(reverse('get-difficulty'))
+
+        assert response.data == 4
+        assert len(context.captured_queries) == 0
+
+    def test_state_skips_user_and_profile(self, base_round, claims_client, user_client):
+        expected = user_client.get(reverse('game-state')).data
+        with CaptureQueriesContext(connection) as context:
+            response = claims_client.get(reverse('game-state'))
+
+        assert response.data == expected
+        assert users_queried(context) == []
+        assert tables_queried(context) == set()
+
+    def test_writes_load_user(self, game, claims_client):
+        with CaptureQueriesContext(connection) as context:
+            response = claims_client.post(reverse('game-rounds'), {'guess': '5670'}, format='json')
+
+        assert response.status_code == status.HTTP_201_CREATED
+        assert len(users_queried(context)) == 1
+
+    def test_difficulty_change_sends_new_token(self, game, claims_client):
+        response = claims_client.patch(reverse('get-difficulty'), {'difficulty': 6}, format='json')
+
+        assert AccessToken(response['X-Access-Token'])['difficulty'] == 6
+
+    def test_stale_claims_fall_back_to_database(self, game, claims_client):
+        claims_client.patch(reverse('get-difficulty'), {'difficulty': 6}, format='json')
+        with CaptureQueriesContext(connection) as context:
+            response = claims_client.get(reverse('get-difficulty'))
+
+        assert response.data == 6
+        assert len(users_queried(context)) == 1
+
+    def test_missing_marker_is_reloaded(self, game, player_profile, claims_client):
+        PlayerProfile.objects.filter(pk=player_profile.pk).update(difficulty=6)
+        model_cache.get_cache().clear()
+        with CaptureQueriesContext(connection) as context:
+            response = claims_client.get(reverse('get-difficulty'))
+
+        assert response.data == 6
+        assert len(users_queried(context)) == 1
+        assert model_cache.get_claims_marker(player_profile.player_id) == {'difficulty': 6, 'current_game': game.id}
+
+    def test_reloaded_marker_trusts_current_claims(self, game, player_profile, claims_client):
+        model_cache.get_cache().clear()
+        claims_client.get(reverse('get-difficulty'))
+        with CaptureQueriesContext(connection) as context:
+            response = claims_client.get(reverse('get-difficulty'))
+
+        assert response.data == 4
+        assert len(context.captured_queries) == 0
+
+    def test_new_game_sends_new_token(self, game, claims_client):
+        response = claims_client.post(reverse('new-game'))
+        claims_client.credentials(HTTP_AUTHORIZATION=f'JWT {response["X-Access-Token"]}')
+
+        state = claims_client.get(reverse('game-state'))
+        assert state.data['current_game'] == AccessToken(response['X-Access-Token'])['current_game'] != game.id
+
+    def test_async_new_game_sends_new_token(self, game, async_user_client):
+        response = async_user_client.post(reverse('async-new-game'))
+
+        assert AccessToken(response['X-Access-Token'])['current_game'] != game.id
+
+    def test_refresh_has_current_claims(self, game, player_profile, user, api_client):
+        refresh = PlayerRefreshToken.for_user(user)
+        player_profile.difficulty = 5
+        player_profile.save()
+
+        response = api_client.post('/auth/jwt/refresh/', {'refresh': str(refresh)}, format='json')
+        assert AccessToken(response.data['access'])['difficulty'] == 5
+
+    def test_claims_ignored_without_shared_cache(self, game, claims_client, settings):
+        settings.CACHES = {**settings.CACHES, 'models': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+        with CaptureQueriesContext(connection) as context:
+            response = claims_client.get(reverse('get-difficulty'))
+
+        assert response.data == 4
+        assert len(users_queried(context)) == 1
+
+    def test_admin_views_load_user(self, game, superuser, api_client):
+        token = PlayerRefreshToken.for_user(superuser).access_token
+        api_client.credentials(HTTP_AUTHORIZATION=f'JWT {token}')
+
+        assert api_client.get(reverse('game-list')).status_code == status.HTTP_200_OK
+
+
+@pytest.fixture
+def finished_game(game):
+    for guess, correct_numbers, correct_positions in [('5670', 0, 0), ('12ab', 2, 2), ('1234', 4, 4)]:
+        Round.objects.create(
+            game=game, guess=guess, correct_numbers=correct_numbers, correct_positions=correct_positions)
+    Game.objects.filter(pk=game.id).update(
+        result=Leaderboard.RESULT_WIN, start_time=django_timezone.now() - datetime.timedelta(days=60))
+    game.refresh_from_db()
+    return game
+
+
+@pytest.mark.django_db
+class TestArchive:
+    def test_encoding_round_trip(self, finished_game):
+        rows = list(archive.live_rounds(finished_game.id))
+        data = archive.encode_rounds(rows)
+
+        assert archive.decode_rounds(finished_game.id, data) == rows
+        assert len(data) < 20 * len(rows)
+
+    def test_encoding_keeps_odd_lengths_and_zeros(self):
+        timestamp = django_timezone.now()
+        rows = [{'id': 7, 'game_id': 1, 'guess': guess, 'correct_numbers': 0, 'correct_positions': 0,
+                 'timestamp': timestamp} for guess in ['00000', '', '1.5', 'éé']]
+
+        assert archive.decode_rounds(1, archive.encode_rounds(rows)) == rows
+
+    def test_archived_rounds_read_the_same(self, finished_game, user_client, async_user_client):
+        urls = [reverse(name) for name in ('game-rounds', 'game-state', 'async-game-rounds', 'async-game-state')]
+        before = [user_client.get(url).json() for url in urls[:2]] + [async_user_client.get(url).json() for url in urls[2:]]
+
+        archive.archive_games([finished_game.id])
+        model_cache.get_cache().clear()
+
+        after = [user_client.get(url).json() for url in urls[:2]] + [async_user_client.get(url).json() for url in urls[2:]]
+        assert not Round.objects.filter(game=finished_game).exists()
+        assert after == before
+        assert len(after[0]) == 3
+
+    def test_archived_game_rebuilds_candidates(self, finished_game, user_client):
+        Game.objects.filter(pk=finished_game.id).update(game_round=3)
+        archive.archive_games([finished_game.id])
+
+        response = user_client.get(reverse('hint'))
+
+        assert response.data == {'guess': '1234', 'remaining': 1}
+
+    def test_command_archives_old_finished_games(self, finished_game, player_profile):
+        active = Game.objects.create(player=player_profile, secret_number='4321',
+                                     start_time=django_timezone.now() - datetime.timedelta(days=60))
+        Round.objects.create(game=active, guess='1111', correct_numbers=1, correct_positions=1)
+        out = io.StringIO()
+
+        call_command('archive_games', '--batch-size', '1', stdout=out)
+
+        assert ArchivedGame.objects.get().game_id == finished_game.id
+        assert ArchivedGame.objects.get().round_count == 3
+        assert list(Round.objects.values_list('game_id', flat=True)) == [active.id]
+        assert 'Archived 1 games, 3 rounds' in out.getvalue()
+
+    def test_command_is_resumable(self, finished_game):
+        call_command('archive_games', stdout=io.StringIO())
+        out = io.StringIO()
+        call_command('archive_games', stdout=out)
+
+        assert ArchivedGame.objects.count() == 1
+        assert 'Archived 0 games' in out.getvalue()
+        assert len(archive.round_rows(finished_game)) == 3
+
+    def test_command_skips_recent_games(self, finished_game):
+        call_command('archive_games', '--older-than', '90', stdout=io.StringIO())
+
+        assert not ArchivedGame.objects.exists()
+
+
+class TestFastSerialization:
+    @pytest.mark.parametrize('serializer_class', [
+        RoundSerializer, GameSerializer, LeaderboardSerializer, PlayerProfileSerializer])
+    def test_values_match_serializer(self, base_round, leaderboard, serializer_class):
+        queryset = serializer_class.Meta.model.objects.order_by('pk')
+
+        assert values_mapper(serializer_class).data(queryset) == serializer_class(queryset, many=True).data
+
+    def test_values_follow_active_timezone(self, base_round):
+        queryset = Round.objects.all()
+        with django_timezone.override('America/New_York'):
+            assert values_mapper(RoundSerializer).data(queryset) == RoundSerializer(queryset, many=True).data
+
+    def test_values_keep_nulls(self, game):
+        Game.objects.filter(pk=game.pk).update(total_time=None)
+        queryset = Game.objects.filter(pk=game.pk)
+
+        assert values_mapper(GameSerializer).data(queryset)[0]['total_time'] is None
+        assert values_mapper(GameSerializer).data(queryset) == GameSerializer(queryset, many=True).data
+
+    @pytest.mark.parametrize('url_name', [
+        'playerprofile-list', 'game-list', 'round-list', 'leaderboard-list'])
+    def test_admin_lists(self, base_round, leaderboard, superuser_client, url_name):
+        response = superuser_client.get(reverse(url_name))
+        viewset = response.renderer_context['view']
+        queryset = viewset.filter_queryset(viewset.get_queryset())
+
+        data = viewset.get_serializer_class()(queryset, many=True).data
+        if viewset.paginator is not None:
+            data = {'next': None, 'previous': None, 'results': data}
+
+        assert response.status_code == 200
+        assert response.content == JSONRenderer().render(data)
+
+    def test_renderer_matches_json_renderer(self):
+        timestamp = datetime.datetime(2025, 1, 2, 3, 4, 5, 678, tzinfo=datetime.timezone.utc)
+        data = {
+            'timestamp': timestamp,
+            'naive': timestamp.replace(tzinfo=None),
+            'date': timestamp.date(),
+            'total_time': datetime.timedelta(minutes=1, microseconds=5),
+            'amount': decimal.Decimal('1.50'),
+            'count': np.int64(3),
+            'text': 'Zürich \u2028 \u2029 "quoted" </script>',
+            'error': ErrorDetail('Invalid', code='invalid'),
+            'big': 2 ** 70,
+            'nested': [None, True, {'id': 1}],
+        }
+
+        assert ORJSONRenderer().render(data) == JSONRenderer().render(data)
+        assert ORJSONRenderer().render(None) == b''
+        assert ORJSONRenderer().render(data, 'application/json; indent=2') == \
+            JSONRenderer().render(data, 'application/json; indent=2')
+
+    def test_rounds_response_unchanged(self, base_round, user_client):
+        response = user_client.get(reverse('game-rounds'))
+        rounds = RoundSerializer(Round.objects.filter(game_id=base_round.game_id).order_by('timestamp'), many=True)
+
+        assert response.content == JSONRenderer().render(rounds.data)
+
+    def test_parser(self):
+        assert ORJSONParser().parse(io.BytesIO('{"guess": "1234", "name": "Zoë"}'.encode())) == \
+            {'guess': '1234', 'name': 'Zoë'}
+        with pytest.raises(ParseError):
+            ORJSONParser().parse(io.BytesIO(b'{"guess": '))
+        with pytest.raises(ParseError):
+            ORJSONParser().parse(io.BytesIO(b'{"guess": NaN}'))
+
+
+class TestMetrics:
+    def test_request_metrics(self, base_round, user_client):
+        requests_before = metrics.http_requests.value('game-state', 'GET', '200')
+        queries_before = metrics.db_queries_per_request.count('game-state')
+        sizes_before = metrics.http_response_size.count('game-state')
+
+        response = user_client.get(reverse('game-state'))
+
+        assert response.status_code == 200
+        assert metrics.http_requests.value('game-state', 'GET', '200') == requests_before + 1
+        count, total = metrics.db_queries_per_request.count('game-state')
+        assert count == queries_before[0] + 1
+        assert total > queries_before[1]
+        assert metrics.http_response_size.count('game-state')[1] == sizes_before[1] + len(response.content)
+
+    def test_unmatched_requests(self, api_client):
+        before = metrics.http_requests.value('unmatched', 'GET', '404')
+        api_client.get('/no-such-page/')
+        assert metrics.http_requests.value('unmatched', 'GET', '404') == before + 1
+
+    def test_metrics_endpoint(self, base_round, user_client):
+        user_client.get(reverse('game-state'))
+        response = user_client.get(reverse('metrics'), REMOTE_ADDR='127.0.0.1')
+
+        assert response.status_code == 200
+        assert response['Content-Type'].startswith('text/plain; version=0.0.4')
+        body = response.content.decode()
+        assert '# TYPE http_requests_total counter' in body
+        assert 'http_requests_total{method="GET",status="200",view="game-state"}' in body
+        assert 'http_request_duration_seconds_bucket{le="+Inf",method="GET",view="game-state"}' in body
+        assert 'db_queries_per_request_count{view="game-state"}' in body
+
+    def test_metrics_endpoint_hidden_from_other_addresses(self, api_client):
+        response = api_client.get(reverse('metrics'), REMOTE_ADDR='10.1.2.3')
+        assert response.status_code == 404
+
+    def test_histogram_buckets_are_cumulative(self):
+        registry = prometheus_client.CollectorRegistry()
+        histogram = metrics.Histogram('test_seconds', 'Test histogram', ('name',), buckets=(1, 2), registry=registry)
+        for value in (0.5, 1, 1.5, 3):
+            histogram.observe(value, 'a"b')
+
+        buckets = [registry.get_sample_value('test_seconds_bucket', {'name': 'a"b', 'le': le})
+                   for le in ('1.0', '2.0', '+Inf')]
+        assert buckets == [2, 3, 4]
+        assert histogram.count('a"b') == (4, 6.0)
+
+    def test_workers_are_added_up(self, tmp_path, monkeypatch):
+        record = ("from game import metrics; "
+                  "metrics.http_requests.inc('game-state', 'GET', '200', amount=2); "
+                  "metrics.db_query_duration.observe(0.01)")
+        for _ in range(2):
+            subprocess.run([sys.executable, '-c', record], check=True, cwd=settings.BASE_DIR,
+                           env={**os.environ, 'PROMETHEUS_MULTIPROC_DIR': str(tmp_path)})
+
+        monkeypatch.setenv('PROMETHEUS_MULTIPROC_DIR', str(tmp_path))
+        registry = metrics.collecting_registry()
+        labels = {'view': 'game-state', 'method': 'GET', 'status': '200'}
+        assert registry.get_sample_value('http_requests_total', labels) == 4
+        assert registry.get_sample_value('db_query_duration_seconds_count', {}) == 2
+
+    def test_outbound_http(self):
+        ok_before = metrics.outbound_http_duration.count('test-target', 'ok')[0]
+        error_before = metrics.outbound_http_duration.count('test-target', 'error')[0]
+
+        with metrics.outbound_http('test-target'):
+            pass
+        with pytest.raises(requests.ConnectionError):
+            with metrics.outbound_http('test-target'):
+                raise requests.ConnectionError
+
+        assert metrics.outbound_http_duration.count('test-target', 'ok')[0] == ok_before + 1
+        assert metrics.outbound_http_duration.count('test-target', 'error')[0] == error_before + 1
+
+
+class TestRuntimeCheck:
+    def test_production_config(self, settings, monkeypatch):
+        settings.DEBUG = False
+        settings.MIDDLEWARE = [middleware for middleware in settings.MIDDLEWARE
+                               if middleware != runtime.DEBUG_TOOLBAR_MIDDLEWARE]
+        settings.REST_FRAMEWORK = {**settings.REST_FRAMEWORK,
+                                   'DEFAULT_RENDERER_CLASSES': ('game.renderers.ORJSONRenderer',)}
+        monkeypatch.setitem(connections.databases['default'], 'CONN_MAX_AGE', 600)
+        monkeypatch.setitem(connections.databases['default'], 'CONN_HEALTH_CHECKS', True)
+
+        settings.CACHES = {**settings.CACHES, 'models': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+        settings.GAME_EVENTS = {**settings.GAME_EVENTS, 'BACKEND': 'game.events.RedisChannelLayer'}
+        config = runtime.runtime_config(workers=3, threads=4)
+
+        assert config['max_db_connections'] == 12
+        # The debug toolbar app stays installed in the test settings
+        assert runtime.problems({**config, 'debug_toolbar': False}) == []
+
+    def test_development_config(self, settings):
+        settings.DEBUG = True
+        found = dict(runtime.problems(runtime.runtime_config()))
+
+        assert {'game.W001', 'game.W002', 'game.W003', 'game.W004'} <= set(found)
+
+    def test_process_local_model_cache(self):
+        assert 'game.W006' not in dict(runtime.problems(runtime.runtime_config(workers=1, threads=4)))
+        assert 'game.W006' in dict(runtime.problems(runtime.runtime_config(workers=3, threads=4)))
+
+    def test_game_events_between_workers(self, settings):
+        assert 'game.W009' not in dict(runtime.problems(runtime.runtime_config(workers=1, threads=4)))
+        assert 'game.W009' in dict(runtime.problems(runtime.runtime_config(workers=3, threads=4)))
+
+        settings.GAME_EVENTS = {**settings.GAME_EVENTS, 'ENABLED': False}
+        found = dict(runtime.problems(runtime.runtime_config(workers=3, threads=4)))
+        assert 'game.W008' in found and 'game.W009' not in found
+
+    def test_asgi_closes_connections(self, settings, monkeypatch):
+        settings.SERVER_INTERFACE = 'asgi'
+        monkeypatch.setitem(connections.databases['default'], 'CONN_MAX_AGE', 0)
+        found = dict(runtime.problems(runtime.runtime_config()))
+        assert 'game.W004' not in found and 'game.W007' not in found
+
+        monkeypatch.setitem(connections.databases['default'], 'CONN_MAX_AGE', 600)
+        assert 'game.W007' in dict(runtime.problems(runtime.runtime_config()))
+
+    def test_connections_without_health_checks(self, monkeypatch):
+        monkeypatch.setitem(connections.databases['default'], 'CONN_MAX_AGE', None)
+        monkeypatch.setitem(connections.databases['default'], 'CONN_HEALTH_CHECKS', False)
+        found = dict(runtime.problems(runtime.runtime_config()))
+
+        assert 'game.W004' not in found
+        assert 'game.W005' in found
+
+    def test_runtime_check_command(self):
+        out = io.StringIO()
+        call_command('runtime_check', '--workers', '2', '--threads', '8', stdout=out)
+        assert 'max_db_connections: 16' in out.getvalue()
+        assert 'game.W003' in out.getvalue()
+
+        with pytest.raises(CommandError):
+            call_command('runtime_check', '--strict', stdout=io.StringIO())
+
+
+def first_guess_strategy(length, rounds, rng):
+    return ['00000000', '11223344', '1234'][len(rounds) % 3][:length]
+
+
+@pytest.mark.django_db
+class TestSimulation:
+    def test_play_game_scores_like_gamerounds(self):
+        rounds, result = simulation.play_game('1234', first_guess_strategy, random.Random(0), max_rounds=3)
+
+        assert result == 'W'
+        assert rounds == [(guess, *RoundsView().evaluate_guesses(secret_number='1234', guess=guess))
+                          for guess in ['0000', '1122', '1234']]
+
+    def test_play_game_loss(self):
+        rounds, result = simulation.play_game('7777', first_guess_strategy, random.Random(0), max_rounds=4)
+
+        assert result == 'L'
+        assert len(rounds) == 4
+
+    @pytest.mark.parametrize('strategy', ['entropy', 'minimax', 'random'])
+    def test_strategies_win(self, strategy):
+        secret_numbers = SeededRandomSource(1).fetch(4, 5)
+        games = simulation.play_games((strategy, secret_numbers, 1, 10))
+
+        assert [game[0] for game in games] == secret_numbers
+        assert all(result == 'W' for _, _, result, _ in games)
+
+    def test_simulate_command(self, tmp_path):
+        out = io.StringIO()
+        output = tmp_path / 'simulation.json'
+        call_command('simulate', '--games', '20', '--strategy', 'random', 'game.tests.first_guess_strategy',
+                     '--workers', '0', '--seed', '3', '--output', str(output), stdout=out)
+
+        runs = json.loads(output.read_text())['runs']
+        assert [(run['strategy'], run['games']) for run in runs] == [
+            ('random', 20), ('game.tests.first_guess_strategy', 20)]
+        assert runs[0]['win_rate'] == 1
+        assert sum(runs[0]['rounds_to_win'].values()) == 20
+        assert 'random difficulty 4: 20 games' in out.getvalue()
+
+    def test_process_pool_matches_inline(self, tmp_path):
+        reports = []
+        for workers in ('0', '2'):
+            output = tmp_path / f'simulation-{workers}.json'
+            call_command('simulate', '--games', '12', '--strategy', 'random', '--chunk-size', '5',
+                         '--workers', workers, '--seed', '5', '--output', str(output), stdout=io.StringIO())
+            reports.append(json.loads(output.read_text())['runs'][0])
+
+        assert reports[0]['rounds_to_win'] == reports[1]['rounds_to_win']
+
+    def test_persist(self, user):
+        call_command('simulate', '--games', '5', '--strategy', 'random', '--workers', '0',
+                     '--persist', 'user', stdout=io.StringIO())
+
+        games = Game.objects.filter(player_id=user.id)
+        assert games.count() == 5
+        assert Round.objects.filter(game__in=games).count() == sum(game.game_round for game in games)
+        assert PlayerStats.objects.get(player_id=user.id, difficulty=4).wins == 5
+
+    def test_unknown_strategy(self):
+        with pytest.raises(CommandError):
+            call_command('simulate', '--strategy', 'clairvoyant', stdout=io.StringIO())
+
+
+@pytest.mark.django_db(transaction=True)
+class TestLoadTest:
+    def test_loadtest_command(self, tmp_path):
+        output = tmp_path / 'results.json'
+        call_command('loadtest', players=2, concurrency=2, guesses=3,
+                     output=str(output), stdout=io.StringIO())
+
+        results = json.loads(output.read_text())
+        endpoints = results['endpoints']
+        assert endpoints['POST game/gamerounds/']['count'] >= 2
+        assert all(row['errors'] == 0 for row in endpoints.values())
+        assert endpoints['GET game/state/']['queries_per_request'] == 4
+        assert {'p50_ms', 'p95_ms', 'p99_ms', 'requests_per_second'} <= set(endpoints['GET game/hint/'])
+        assert not User.objects.filter(username__startswith='loadtest-').exists()
+
+    def test_loadtest_baseline_regression(self, tmp_path):
+        baseline = tmp_path / 'baseline.json'
+        call_command('loadtest', players=1, concurrency=1, guesses=1,
+                     output=str(baseline), stdout=io.StringIO())
+        results = json.loads(baseline.read_text())
+        for row in results['endpoints'].values():
+            row['p95_ms'] = 0.001
+        baseline.write_text(json.dumps(results))
+
+        with pytest.raises(CommandError):
+            call_command('loadtest', players=1, concurrency=1, guesses=1, baseline=str(baseline),
+                         max_regression=0.5, stdout=io.StringIO())
+
+
+@pytest.mark.django_db
+class TestQueryBudgets:
+    @pytest.mark.parametrize('method, url_name, data, budget, client_fixture, check_plans', QUERY_BUDGETS)
+    def test_query_budget(self, request, base_round, leaderboard, method, url_name, data, budget,
+                          client_fixture, check_plans):
+        client = request.getfixturevalue(client_fixture)
+        with CaptureQueriesContext(connection) as context:
+            response = getattr(client, method)(reverse(url_name), data, format='json')
+
+        assert response.status_code < 400
+        queries = [query['sql'] for query in context.captured_queries]
+        plans = [{'sql': sql, 'plan': explain(sql)} for sql in queries if sql.startswith('SELECT')]
+
+        plans_dir = os.environ.get('QUERY_PLANS_DIR')
+        if plans_dir:
+            os.makedirs(plans_dir, exist_ok=True)
+            with open(os.path.join(plans_dir, f'{method}-{url_name}.json'), 'w') as plans_file:
+                json.dump({'queries': len(queries), 'plans': plans}, plans_file, indent=2)
+
+        assert len(queries) <= budget, '\n'.join(queries)
+        if check_plans:
+            for entry in plans:
+                assert full_scans(entry['plan']) == [], entry['sql']
+
+
+"""
+Microbenchmarks for the hot paths, each with a regression threshold
+Wall-clock timings depend on the machine, so they only run with BENCHMARKS=1. Otherwise each
+benchmarked call runs once for its result and query count checks.
+Thresholds are the median microseconds per call, set several times above the measured time
+so they only trip on real regressions. Set BENCHMARK_OUTPUT to a file to save the timings as JSON.
+"""
+
+BENCHMARKS = os.environ.get('BENCHMARKS') == '1'
+
+BENCHMARK_THRESHOLDS = {
+    'evaluate_guesses-4': 100,
+    'evaluate_guesses-5': 100,
+    'evaluate_guesses-6': 100,
+    'evaluate_guesses-malformed': 100,
+    'secret-generate-batch': 20000,
+    'secret-pool-get': 20,
+    'round-serializer-10': 5000,
+    'round-serializer-1000': 150000,
+    'leaderboard-serializer-1000': 150000,
+    'round-list-serializer-10000': 2000000,
+    'round-list-values-10000': 500000,
+    'player-data-cached': 10,
+    'player-data-query': 10000,
+}
+
+
+@pytest.fixture(scope='session')
+def benchmark_results():
+    results = {}
+    yield results
+    output = os.environ.get('BENCHMARK_OUTPUT')
+    if output and results:
+        with open(output, 'w') as output_file:
+            json.dump(results, output_file, indent=2, sort_keys=True)
+
+
+@pytest.fixture
+def benchmark(benchmark_results):
+    """
+    Times func(*args) and checks the median against BENCHMARK_THRESHOLDS[name], with BENCHMARKS=1
+    Calls are looped until a round takes at least 10ms, and the median of 7 rounds is used
+    per_call - how many operations one call performs, so results are per operation
+    """
+    def run(name, func, *args, per_call=1):
+        if not BENCHMARKS:
+            return func(*args)
+        func(*args)
+        loops = 1
+        while True:
+            start = time.perf_counter()
+            for _ in range(loops):
+                func(*args)
+            if time.perf_counter() - start >= 0.01:
+                break
+            loops *= 2
+
+        rounds = []
+        for _ in range(7):
+            start = time.perf_counter()
+            for _ in range(loops):
+                func(*args)
+            rounds.append((time.perf_counter() - start) / (loops * per_call) * 1e6)
+
+        median = statistics.median(rounds)
+        benchmark_results[name] = {
+            'median_us': round(median, 3),
+            'min_us': round(min(rounds), 3),
+            'threshold_us': BENCHMARK_THRESHOLDS[name],
+        }
+        assert median <= BENCHMARK_THRESHOLDS[name], f'{name}: {median:.2f}us per call'
+        return func(*args)
+    return run
+
+
+def random_codes(rng, length, count):
+    return [''.join(rng.choice('01234567') for _ in range(length)) for _ in range(count)]
+
+
+class TestMicrobenchmarks:
+    @pytest.mark.parametrize('difficulty', [4, 5, 6])
+    def test_evaluate_guesses(self, benchmark, difficulty):
+        rng = random.Random(difficulty)
+        pairs = list(zip(random_codes(rng, difficulty, 100), random_codes(rng, difficulty, 100)))
+        evaluate_guesses = RoundsView().evaluate_guesses
+
+        def evaluate_all():
+            return [evaluate_guesses(secret_number, guess) for secret_number, guess in pairs]
+
+        results = benchmark(f'evaluate_guesses-{difficulty}', evaluate_all, per_call=len(pairs))
+        assert results == [legacy_evaluate_guesses(list(secret_number), list(guess))
+                           for secret_number, guess in pairs]
+
+    def test_evaluate_guesses_malformed(self, benchmark):
+        rng = random.Random(0)
+        pairs = [(secret_number, guess[:3] + '9')
+                 for secret_number, guess in zip(random_codes(rng, 4, 100), random_codes(rng, 4, 100))]
+        evaluate_guesses = RoundsView().evaluate_guesses
+
+        def evaluate_all():
+            return [evaluate_guesses(secret_number, guess) for secret_number, guess in pairs]
+
+        benchmark('evaluate_guesses-malformed', evaluate_all, per_call=len(pairs))
+
+    def test_secret_generate_batch(self, benchmark):
+        batch = benchmark('secret-generate-batch', SystemRandomSource().fetch, 6, 200)
+
+        assert len(batch) == 200
+        assert all(SecretPool.is_valid(secret_number, 6) for secret_number in batch)
+
+    def test_secret_pool_get(self, benchmark):
+        pool = SecretPool(StubSource(), batch_size=200, low_watermark=20)
+
+        assert benchmark('secret-pool-get', pool.get, 4) == '1234'
+
+    @pytest.mark.parametrize('count', [10, 1000])
+    def test_round_serializer(self, benchmark, count):
+        timestamp = datetime.datetime(2025, 1, 1, tzinfo=datetime.timezone.utc)
+        rounds = [Round(id=index, game_id=1, guess=f'{index % 4096:04o}', correct_numbers=2,
+                        correct_positions=1, timestamp=timestamp) for index in range(count)]
+
+        data = benchmark(f'round-serializer-{count}', lambda: RoundSerializer(rounds, many=True).data)
+        assert len(data) == count
+        assert data[0]['timestamp'] == '2025-01-01T00:00:00Z'
+
+    def test_leaderboard_serializer(self, benchmark):
+        entries = [Leaderboard(id=index, result='W', total_time=datetime.timedelta(seconds=index),
+                               difficulty=4, player_id=1, game_id=index) for index in range(1000)]
+
+        data = benchmark('leaderboard-serializer-1000', lambda: LeaderboardSerializer(entries, many=True).data)
+        assert len(data) == 1000
+
+    def test_round_list_fast_path(self, benchmark, benchmark_results, game):
+        Round.objects.bulk_create(
+            Round(game=game, guess=f'{index:06o}', correct_numbers=2, correct_positions=1) for index in range(10000))
+        queryset = Round.objects.filter(game=game).order_by('timestamp')
+        rounds = values_mapper(RoundSerializer)
+
+        def serializer_path():
+            return JSONRenderer().render(RoundSerializer(queryset.all(), many=True).data)
+
+        def values_path():
+            return ORJSONRenderer().render(rounds.data(queryset.all()))
+
+        expected = benchmark('round-list-serializer-10000', serializer_path)
+        assert benchmark('round-list-values-10000', values_path) == expected
+        if not BENCHMARKS:
+            return
+        speedup = (benchmark_results['round-list-serializer-10000']['median_us']
+                   / benchmark_results['round-list-values-10000']['median_us'])
+        benchmark_results['round-list-values-10000']['speedup'] = round(speedup, 2)
+        assert speedup > 2
+
+    def test_player_data_cached(self, benchmark, game, user):
+        request = type('Request', (), {'user': user})()
+        mixin = PlayerDataMixin()
+        mixin.get_player_profile(request)
+
+        with CaptureQueriesContext(connection) as context:
+            data = benchmark('player-data-cached', mixin.get_player_data, request)
+        assert data == {'player': user.id, 'difficulty': 4, 'current_game': game.id}
+        assert context.captured_queries == []
+
+    def test_player_data_query(self, benchmark, game, user):
+        mixin = PlayerDataMixin()
+        mixin.player_profile_related = ('current_game',)
+
+        def resolve():
+            # Measures the database read, not a model cache hit
+            model_cache.get_cache().clear()
+            return mixin.get_player_data(type('Request', (), {'user': user})())
+
+        assert benchmark('player-data-query', resolve)['current_game'] == game.id
+        with CaptureQueriesContext(connection) as context:
+            resolve()
+        assert len(context.captured_queries) == 1
@@ -1,6 +1,6 @@
 from rest_framework.routers import DefaultRouter
 from django.urls import path
-from . import views
+from . import async_views, views
 
 router = DefaultRouter()
 
@@ -13,8 +13,21 @@ router.register('leaderboards', views.LeaderboardViewSet)
 urlpatterns = router.urls + [
     path('newgame/', views.NewGameView.as_view(), name='new-game'),
     path('gamerounds/', views.RoundsView.as_view(), name='game-rounds'),
+    path('gamerounds/batch/', views.RoundsBatchView.as_view(), name='game-rounds-batch'),
     path('leaderboard/', views.LeaderboardTotalsView.as_view(), name='leaderboard'),
+    path('leaderboard/global/', views.GlobalLeaderboardView.as_view(), name='global-leaderboard'),
+    path('leaderboard/daily/', views.DailyLeaderboardView.as_view(), name='daily-leaderboard'),
     path('difficulty/', views.DifficultyConfigView.as_view(), name='get-difficulty'),
     path('starttime/', views.StartTimeView.as_view(), name='start-time'),
     path('resumegame/', views.ResumeGameView.as_view(), name='resume-game'),
+    path('hint/', views.HintView.as_view(), name='hint'),
+    path('state/', views.GameStateView.as_view(), name='game-state'),
+    # Async variants for ASGI deployments, same request and response formats
+    path('async/newgame/', async_views.AsyncNewGameView.as_view(), name='async-new-game'),
+    path('async/gamerounds/', async_views.AsyncRoundsView.as_view(), name='async-game-rounds'),
+    path('async/leaderboard/', async_views.AsyncLeaderboardTotalsView.as_view(), name='async-leaderboard'),
+    path('async/difficulty/', async_views.AsyncDifficultyConfigView.as_view(), name='async-get-difficulty'),
+    path('async/starttime/', async_views.AsyncStartTimeView.as_view(), name='async-start-time'),
+    path('async/state/', async_views.AsyncGameStateView.as_view(), name='async-game-state'),
+    path('events/', async_views.GameEventsView.as_view(), name='game-events'),
 ]
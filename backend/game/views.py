@@ -1,4 +1,4 @@
-from django.conf import settings
+from django.db.models import F
 from django.utils import timezone as django_timezone
 from datetime import datetime, timezone
 from urllib.parse import unquote
@@ -10,13 +10,15 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework import status
 
-from .mixins import PlayerDataMixin
+from .mixins import ExportMixin, GameVersionMixin, PlayerDataMixin, RoundPlayMixin, ValuesListMixin
+from .pagination import IdCursorPagination
 from .permissions import IsSuperUser
-from .models import Game, Leaderboard, PlayerProfile, Round
-from .serializers import GameSerializer, LeaderboardSerializer, PlayerProfileSerializer, RoundSerializer
-import requests
+from .secret_sources import get_secret_pool
+from . import archive, candidate_sets, daily, events, model_cache, rankings, solver
+from .models import Game, Leaderboard, PlayerProfile, PlayerStats, Round
+from .serializers import (GameSerializer, LeaderboardSerializer, PlayerProfileSerializer, RoundSerializer,
+                          values_mapper)
 import logging
-import random
 logger = logging.getLogger(__name__)
 
 # Create your views here.
@@ -26,7 +28,7 @@ BaseURL for all endpoints: http://localhost:8000/game/
 """
 
 
-class PlayerProfileViewSet(ModelViewSet):
+class PlayerProfileViewSet(ValuesListMixin, ModelViewSet):
     """
     Endpoint: playerprofiles/
     Retrieves list of all Players, requires IsSuperUser permission
@@ -71,31 +73,35 @@ class DifficultyConfigView(PlayerDataMixin, APIView):
         return Response(difficulty, status=status.HTTP_200_OK)
 
     def patch(self, request):
-        player_data = self.get_player_data(request)
-
         difficulty = int(request.data.get('difficulty'))
 
-        player = PlayerProfile.objects.get(player=player_data.get('player'))
+        player = self.get_player_profile(request)
 
         player.difficulty = difficulty
         player.save()
         logger.debug('Difficulty changed to: %s', difficulty)
-        return Response(difficulty, status=status.HTTP_200_OK)
+        return Response(difficulty, status=status.HTTP_200_OK,
+                        headers=self.access_token_headers(request, player))
 
 
 class NewGameView(PlayerDataMixin, APIView):
     """
     Endpoint: newgame/
     Handles POST request - creates Game entry using external API data
+    With {"daily": true} the Game plays today's DailyChallenge for Player's difficulty, once per Player
     Updates Player's current_game id
     """
     permission_classes = [IsAuthenticated]
 
     def post(self, request):
-        try:
-            player_data = self.get_player_data(request)
-            difficulty = int(player_data.get('difficulty'))
+        player_data = self.get_player_data(request)
+        difficulty = int(player_data.get('difficulty'))
 
+        if request.data.get('daily') is True:
+            game = daily.new_game(player_data['player'], difficulty)
+            if game is None:
+                return Response({'error': 'Daily challenge already played'}, status=status.HTTP_400_BAD_REQUEST)
+        else:
             new_game_data = {
                 "player": player_data['player'],
                 "secret_number": self.generate_random_number(difficulty),
@@ -105,47 +111,34 @@ class NewGameView(PlayerDataMixin, APIView):
             serializer = GameSerializer(data=new_game_data)
             serializer.is_valid(raise_exception=True)
             game = serializer.save()
-            logger.debug('New game created with difficulty: %s', difficulty)
+        logger.debug('New game created with difficulty: %s', difficulty)
 
-            player = PlayerProfile.objects.get(
-                player=player_data['player']
-            )
-            player.current_game = game
-            player.save()
-            logger.debug('current_game updated to %s for: %s',
-                         str(game), str(player))
+        player = self.get_player_profile(request)
+        player.current_game = game
+        player.save()
+        logger.debug('current_game updated to %s for: %s',
+                     str(game), str(player))
+        events.publish(player.player_id, events.EVENT_NEW_GAME, events.game_data(game, difficulty))
 
-            return Response({}, status=status.HTTP_201_CREATED)
-        except requests.exceptions.RequestException as error:
-            return Response({'error': f'Error with external API: {str(error)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        return Response({}, status=status.HTTP_201_CREATED, headers=self.access_token_headers(request, player))
 
     def generate_random_number(self, difficulty):
         """
-        Helper function - uses external API to generate random number
-        * If external API is unavailable, generates random number internally
+        Helper function - draws a secret number from the pre-generated pool
+        * The pool is refilled from the external API in the background,
+          and falls back to the internal generator when it runs dry
         """
-        if not settings.TESTING:
-            url = f'https://www.random.org/integers/?num={
-                difficulty}&min=0&max=7&col=1&base=10&format=plain&rnd=new'
-            response = requests.get(url)
-            if response.status_code != 200:
-                logger.debug('response %s', response.text)
-                logger.warning('External random API is down, switching to internal number generator')
-                return ''.join(str(random.randint(0, 7)) for _ in range(difficulty))
-
-            secret_number = str(''.join(response.text.splitlines()))
-            return secret_number
-        else:
-            return '1234'
+        return get_secret_pool().get(difficulty)
 
 
-class RoundsView(PlayerDataMixin, APIView):
+class RoundsView(GameVersionMixin, PlayerDataMixin, RoundPlayMixin, APIView):
     """
     Endpoint: gamerounds/
-    Handles GET request - retrieves Player's round-data from current game
+    Handles GET request - retrieves Player's round-data from current game, supports If-None-Match
     Handles POST request - creates Round entry using Player's guess
     """
     permission_classes = [IsAuthenticated]
+    player_profile_related = ('current_game',)
 
     def get(self, request):
         player_data = self.get_player_data(request)
@@ -155,157 +148,249 @@ class RoundsView(PlayerDataMixin, APIView):
         if game_id is None:
             return Response({'error': 'Game not found'}, status=status.HTTP_404_NOT_FOUND)
 
-        round_data = Round.objects.filter(
-            game_id=game_id).order_by('timestamp')
-        serializer = RoundSerializer(round_data, many=True)
+        player = self.get_player_profile(request)
+        etag = self.get_game_etag(player)
+        if self.is_not_modified(request, etag):
+            return self.not_modified_response(etag)
+
+        round_data = values_mapper(RoundSerializer).rows(archive.round_rows(player.current_game))
 
-        logger.debug(f'Completed rounds: {len(serializer.data)}')
+        logger.debug(f'Completed rounds: {len(round_data)}')
 
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        return Response(round_data, status=status.HTTP_200_OK, headers=self.etag_headers(etag))
 
     def post(self, request):
         """
         Two entries may be created from this:
         1. A Round entry
-        2. If the Player guesses correctly, a Leaderboard entry is created
+        2. If the Player guesses correctly, or uses the last round, a Leaderboard entry is created
+        The response also includes how many secret numbers still fit every round so far
         """
         player_data = self.get_player_data(request)
-        game_id = player_data.get('current_game')
-        game = Game.objects.get(pk=game_id)
+        game = self.get_player_profile(request).current_game
+
+        if game is None:
+            return Response({'error': 'Game not found'}, status=status.HTTP_404_NOT_FOUND)
 
-        secret_number = game.secret_number
-        secret_number_list = [x for x in secret_number]
+        response_data, response_status = self.play_round(game, player_data, request.data.get('guess'))
+        return Response(response_data, status=response_status)
 
-        guess = request.data.get('guess')
-        logger.debug('Guess made: %s', guess)
 
-        guess_list = [x for x in guess]
-        if len(guess_list) > 6:
-            return Response({'error': 'Guess length too long'}, status=status.HTTP_400_BAD_REQUEST)
+class RoundsBatchView(PlayerDataMixin, RoundPlayMixin, APIView):
+    """
+    Endpoint: gamerounds/batch/
+    Handles POST request - plays an ordered list of guesses in Player's current game, for bots and replays
+    Body: {"guesses": ["1234", "5670", ...]}, at most 10, validated before any is played
+    Guesses are scored and recorded in one transaction, stopping at a win or the last round,
+    with the same Leaderboard rules as gamerounds/
+    Returns each played round as gamerounds/ POST would, the game result and how many guesses went unplayed
+    """
+    permission_classes = [IsAuthenticated]
+    player_profile_related = ('current_game',)
 
-        correct_numbers, correct_positions = self.evaluate_guesses(
-            secret_number_list=secret_number_list, guess_list=guess_list)
+    def post(self, request):
+        player_data = self.get_player_data(request)
+        game = self.get_player_profile(request).current_game
 
-        round_data = {
-            "game": game_id,
-            "guess": guess,
-            "correct_numbers": correct_numbers,
-            "correct_positions": correct_positions
-        }
+        if game is None:
+            return Response({'error': 'Game not found'}, status=status.HTTP_404_NOT_FOUND)
 
-        serializer = RoundSerializer(data=round_data)
-        if serializer.is_valid():
-            serializer.save()
-        else:
-            return Response({'error': 'Wrong data type'}, status=status.HTTP_400_BAD_REQUEST)
+        response_data, response_status = self.play_rounds(game, player_data, request.data.get('guesses'))
+        return Response(response_data, status=response_status)
 
-        current_time = django_timezone.now()
-        total_time = current_time - game.start_time
 
-        game.game_round += 1
-        game.total_time = total_time
-        game.save()
+class LeaderboardTotalsView(GameVersionMixin, PlayerDataMixin, APIView):
+    """
+    Endpoint: leaderboard/
+    Handles GET request - retrieves Player's win and fastest time stats, supports If-None-Match
+    """
+    permission_classes = [IsAuthenticated]
+    player_profile_related = ('current_game',)
+
+    def get(self, request):
+        player_data = self.get_player_data(request)
 
         player = player_data.get('player')
         difficulty = player_data.get('difficulty')
 
-        if correct_positions == difficulty:
-            self.update_leaderboard(
-                game=game, result='W', player=player, difficulty=difficulty)
-        elif game.game_round >= 10:
-            self.update_leaderboard(
-                game=game, result='L', player=player, difficulty=difficulty)
+        game_id = player_data.get('current_game')
 
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+        if game_id is None:
+            return Response({'error': 'Game not found'}, status=status.HTTP_404_NOT_FOUND)
 
-    def evaluate_guesses(self, secret_number_list, guess_list):
-        """
-        Helper function - compares Player's guess with secret_number
-        """
-        correct_numbers = 0
-        correct_positions = 0
-
-        for index, num in enumerate(guess_list):
-            if secret_number_list[index] == num:
-                correct_numbers += 1
-                correct_positions += 1
-                guess_list[index] = 'x'
-                secret_number_list[index] = 'x'
-
-        for index, num in enumerate(guess_list):
-            if num == 'x':
-                continue
-            if num in secret_number_list:
-                correct_numbers += 1
-                new_index = secret_number_list.index(num)
-                secret_number_list[new_index] = 'x'
-
-        return correct_numbers, correct_positions
-
-    def update_leaderboard(self, game, result, player, difficulty):
-        """
-        Helper function - Creates new Leaderboard entry when player wins
-        """
-        leaderboard_data = {
-            "result": result,
-            "total_time": game.total_time,
-            "difficulty": difficulty,
-            "player": player,
-            "game": game.id
+        player_profile = self.get_player_profile(request)
+        etag = self.get_game_etag(player_profile)
+        if self.is_not_modified(request, etag):
+            return self.not_modified_response(etag)
+
+        stats = PlayerStats.objects.filter(player_id=player, difficulty=difficulty).first()
+
+        win_total = stats.wins if stats else 0
+        fastest_time = stats.fastest_time if stats else None
+
+        current_game_time = player_profile.current_game.total_time
+
+        rankings = {
+            "wins": win_total,
+            "fastest_time": fastest_time,
+            "current_game_time": current_game_time,
         }
+        return Response(rankings, status=status.HTTP_200_OK, headers=self.etag_headers(etag))
+
+
+class GlobalLeaderboardView(PlayerDataMixin, APIView):
+    """
+    Endpoint: leaderboard/global/
+    Handles GET request - retrieves the fastest wins across all Players, fastest first
+    Query params: difficulty (defaults to Player's setting), cursor, limit
+    """
+    permission_classes = [IsAuthenticated]
+    default_limit = 20
+    max_limit = 100
+
+    def get(self, request):
+        player_data = self.get_player_data(request)
+
+        try:
+            difficulty = int(request.query_params.get('difficulty', player_data.get('difficulty')))
+            limit = min(int(request.query_params.get('limit', self.default_limit)), self.max_limit)
+        except ValueError:
+            return Response({'error': 'Wrong data type'}, status=status.HTTP_400_BAD_REQUEST)
+        if difficulty not in (4, 5, 6) or limit < 1:
+            return Response({'error': 'Invalid difficulty or limit'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            results, next_cursor = rankings.page(
+                difficulty, request.query_params.get('cursor'), limit)
+        except ValueError:
+            return Response({'error': 'Invalid cursor'}, status=status.HTTP_400_BAD_REQUEST)
 
-        serializer = LeaderboardSerializer(data=leaderboard_data)
-        serializer.is_valid(raise_exception=True)
-        serializer.save()
-        logger.debug('Leaderboard win added for player id: %s', player)
+        leaderboard = {
+            "difficulty": difficulty,
+            "results": results,
+            "next": next_cursor,
+            "my_rank": rankings.player_rank(difficulty, player_data.get('player')),
+        }
+        return Response(leaderboard, status=status.HTTP_200_OK)
 
 
-class LeaderboardTotalsView(PlayerDataMixin, APIView):
+class DailyLeaderboardView(PlayerDataMixin, APIView):
     """
-    Endpoint: leaderboard/
-    Handles GET request - retrieves Player's win and fastest time stats
+    Endpoint: leaderboard/daily/
+    Handles GET request - retrieves the fastest wins of a day's challenge and Player's own result
+    Query params: difficulty (defaults to Player's setting), date (YYYY-MM-DD, defaults to today)
+    The list is a snapshot shared by all Players, rebuilt at most once a minute
     """
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
         player_data = self.get_player_data(request)
 
-        player = player_data.get('player')
-        difficulty = player_data.get('difficulty')
+        try:
+            difficulty = int(request.query_params.get('difficulty', player_data.get('difficulty')))
+            date = (datetime.strptime(request.query_params['date'], '%Y-%m-%d').date()
+                    if 'date' in request.query_params else daily.today())
+        except ValueError:
+            return Response({'error': 'Wrong data type'}, status=status.HTTP_400_BAD_REQUEST)
+        if difficulty not in (4, 5, 6) or date > daily.today():
+            return Response({'error': 'Invalid difficulty or date'}, status=status.HTTP_400_BAD_REQUEST)
 
-        win_total = Leaderboard.objects.filter(
-            player_id=player, result='W', difficulty=difficulty).count()
-        fastest_game = Leaderboard.objects.filter(
-            player_id=player, result='W', difficulty=difficulty).order_by('total_time').first()
+        snapshot = daily.leaderboard(date, difficulty)
+        leaderboard = {
+            **snapshot,
+            "my_result": daily.player_result(date, difficulty, player_data.get('player'), snapshot),
+        }
+        return Response(leaderboard, status=status.HTTP_200_OK)
 
-        if not fastest_game:
-            fastest_time = None
-        else:
-            fastest_time = fastest_game.total_time
+
+class GameStateView(GameVersionMixin, PlayerDataMixin, APIView):
+    """
+    Endpoint: state/
+    Handles GET request - retrieves everything the game page needs in one response:
+    difficulty, current game start time and rounds, and Player's leaderboard totals
+    Supports If-None-Match while Player has a current game
+    """
+    permission_classes = [IsAuthenticated]
+    player_profile_related = ('current_game',)
+
+    def get(self, request):
+        player = self.get_player_profile(request)
+        game = player.current_game
+
+        headers = {}
+        if game is not None:
+            etag = self.get_game_etag(player)
+            if self.is_not_modified(request, etag):
+                return self.not_modified_response(etag)
+            headers = self.etag_headers(etag)
+
+        stats = PlayerStats.objects.filter(
+            player_id=player.player_id, difficulty=player.difficulty).first()
+
+        rounds = []
+        if game is not None:
+            rounds = values_mapper(RoundSerializer).rows(archive.round_rows(game))
+
+        return Response(self.game_state(player, stats, rounds), status=status.HTTP_200_OK, headers=headers)
+
+    @staticmethod
+    def game_state(player, stats, rounds):
+        """
+        Helper function - builds the state/ response, shared with the async view
+        rounds - RoundSerializer data of the current game's rounds
+        """
+        game = player.current_game
+        return {
+            "difficulty": player.difficulty,
+            "current_game": game.id if game else None,
+            "start_time": game.start_time if game else None,
+            "game_round": game.game_round if game else 0,
+            "rounds": rounds,
+            "leaderboard": {
+                "wins": stats.wins if stats else 0,
+                "fastest_time": stats.fastest_time if stats else None,
+                "current_game_time": game.total_time if game else None,
+            },
+        }
+
+
+class HintView(PlayerDataMixin, APIView):
+    """
+    Endpoint: hint/
+    Handles GET request - suggests the next guess for Player's current game
+    Optional query param: strategy=entropy|minimax
+    """
+    permission_classes = [IsAuthenticated]
+    player_profile_related = ('current_game',)
+
+    def get(self, request):
+        player_data = self.get_player_data(request)
 
         game_id = player_data.get('current_game')
 
         if game_id is None:
             return Response({'error': 'Game not found'}, status=status.HTTP_404_NOT_FOUND)
 
-        current_game = Game.objects.get(pk=game_id)
+        strategy = request.query_params.get('strategy', solver.STRATEGY_ENTROPY)
+        if strategy not in solver.STRATEGIES:
+            return Response({'error': 'Unknown strategy'}, status=status.HTTP_400_BAD_REQUEST)
 
-        current_game_time = current_game.total_time
+        game = self.get_player_profile(request).current_game
+        candidates = candidate_sets.get_candidates(game)
 
-        rankings = {
-            "wins": win_total,
-            "fastest_time": fastest_time,
-            "current_game_time": current_game_time,
-        }
-        return Response(rankings, status=status.HTTP_200_OK)
+        guess, remaining = solver.suggest_from_candidates(len(game.secret_number), candidates, strategy)
+        logger.debug('Hint for %s: %s (%s possibilities)', str(game), guess, remaining)
 
+        return Response({'guess': guess, 'remaining': remaining}, status=status.HTTP_200_OK)
 
-class StartTimeView(PlayerDataMixin, APIView):
+
+class StartTimeView(GameVersionMixin, PlayerDataMixin, APIView):
     """
     Endpoint: starttime/
-    Handles GET request - Retrieves the time Player started the current Game
+    Handles GET request - Retrieves the time Player started the current Game, supports If-None-Match
     """
     permission_classes = [IsAuthenticated]
+    player_profile_related = ('current_game',)
 
     def get(self, request):
         player_data = self.get_player_data(request)
@@ -315,10 +400,13 @@ class StartTimeView(PlayerDataMixin, APIView):
         if game_id is None:
             return Response({'error': 'Game not found'}, status=status.HTTP_404_NOT_FOUND)
 
-        game = Game.objects.filter(pk=game_id).first()
+        player = self.get_player_profile(request)
+        etag = self.get_game_etag(player)
+        if self.is_not_modified(request, etag):
+            return self.not_modified_response(etag)
 
-        start_time = game.start_time
-        return Response({'start_time': start_time}, status=status.HTTP_200_OK)
+        start_time = player.current_game.start_time
+        return Response({'start_time': start_time}, status=status.HTTP_200_OK, headers=self.etag_headers(etag))
 
 
 class ResumeGameView(PlayerDataMixin, APIView):
@@ -327,6 +415,8 @@ class ResumeGameView(PlayerDataMixin, APIView):
     Handles PATCH request:
     When Player logs out or closes tab, a cookie is saved with the current time
     Once Player returns, that saved time is used to offset and correct the timer
+    * The start time is moved with a conditional update, like a round, so a concurrent round
+      is never overwritten and finished games keep their time
     """
     permission_classes = [IsAuthenticated]
 
@@ -334,7 +424,6 @@ class ResumeGameView(PlayerDataMixin, APIView):
         player_data = self.get_player_data(request)
 
         game_id = player_data.get('current_game')
-        game = Game.objects.filter(pk=game_id).first()
 
         if game_id is None:
             return Response({'error': 'Game not found'}, status=status.HTTP_404_NOT_FOUND)
@@ -344,39 +433,55 @@ class ResumeGameView(PlayerDataMixin, APIView):
         pause_time = datetime.fromisoformat(
             pause_time_str.replace('Z', '+00:00')).astimezone(timezone.utc)
         pause_duration = resume_time - pause_time
-        game.start_time += pause_duration
-        game.save()
-        return Response({'status': 'resumed'}, status=status.HTTP_200_OK)
-
-
-class GameViewSet(ModelViewSet):
+        resumed = Game.objects.filter(pk=game_id, result__isnull=True).update(
+            start_time=F('start_time') + pause_duration,
+            version=F('version') + 1
+        )
+        if resumed:
+            # A queryset update sends no post_save
+            model_cache.invalidate_game(game_id)
+
+        game = Game.objects.only('id', 'start_time').get(pk=game_id)
+        if not resumed:
+            return Response({'status': 'finished', 'start_time': game.start_time}, status=status.HTTP_200_OK)
+        events.publish(player_data.get('player'), events.EVENT_CLOCK, events.clock_data(game))
+        return Response({'status': 'resumed', 'start_time': game.start_time}, status=status.HTTP_200_OK)
+
+
+class GameViewSet(ExportMixin, ValuesListMixin, ModelViewSet):
     """
     Endpoint: games/
     SuperUser only view - work with Game data
-    Handles LIST, GET, POST, PATCH, DELETE
+    Handles LIST (cursor paginated), GET, POST, PATCH, DELETE
+    export/ streams every row as NDJSON, or CSV with ?format=csv
     """
     permission_classes = [IsSuperUser]
     queryset = Game.objects.all()
     serializer_class = GameSerializer
+    pagination_class = IdCursorPagination
 
 
-class RoundViewSet(ModelViewSet):
+class RoundViewSet(ExportMixin, ValuesListMixin, ModelViewSet):
     """
     Endpoint: rounds/
     SuperUser only view - work with Round data
-    Handles LIST, GET, POST, PATCH, DELETE
+    Handles LIST (cursor paginated), GET, POST, PATCH, DELETE
+    export/ streams every row as NDJSON, or CSV with ?format=csv
     """
     permission_classes = [IsSuperUser]
     queryset = Round.objects.all()
     serializer_class = RoundSerializer
+    pagination_class = IdCursorPagination
 
 
-class LeaderboardViewSet(ModelViewSet):
+class LeaderboardViewSet(ExportMixin, ValuesListMixin, ModelViewSet):
     """
     Endpoint: leaderboards/
     SuperUser only view - work with Leaderboard data
-    Handles LIST, GET, POST, PATCH, DELETE
+    Handles LIST (cursor paginated), GET, POST, PATCH, DELETE
+    export/ streams every row as NDJSON, or CSV with ?format=csv
     """
     permission_classes = [IsSuperUser]
     queryset = Leaderboard.objects.all()
     serializer_class = LeaderboardSerializer
+    pagination_class = IdCursorPagination
@@ -0,0 +1,61 @@
+"""
+Gunicorn configuration - the production server entry point
+Usage: gunicorn -c mastermind/gunicorn.conf.py
+Pre-fork model: the app is loaded once in the master and forked into WEB_CONCURRENCY workers.
+SERVER_INTERFACE picks what the workers serve:
+* wsgi (default) - the API on mastermind.wsgi, each worker serving GUNICORN_THREADS requests at a time.
+  Requests mostly wait on MySQL, so threads let a worker keep several going without the memory of
+  another process, and each thread reuses its database connection between requests.
+* asgi - game/async/ and the long-lived events/ streams on mastermind.asgi with Uvicorn workers,
+  which wait on the event loop instead of holding a thread. GUNICORN_CONNECTIONS caps the requests
+  a worker handles at once, open streams included.
+Production runs one server of each, with the proxy routing game/async/ and game/events/ to the asgi one.
+"""
+import multiprocessing
+import os
+import shutil
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mastermind.settings_production')
+# Read by the production settings too, so connection reuse matches the server
+interface = os.environ.setdefault('SERVER_INTERFACE', 'wsgi')
+
+# Workers write their metrics to files here and /metrics/ adds them up, see game/metrics.py
+# Set before the app (and prometheus_client) is loaded, emptied so counters start from zero
+metrics_dir = os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', f'/tmp/mastermind-metrics-{interface}')
+shutil.rmtree(metrics_dir, ignore_errors=True)
+os.makedirs(metrics_dir)
+
+if interface == 'asgi':
+    wsgi_app = 'mastermind.asgi:application'
+    bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8001')
+    # One event loop per core keeps every core busy
+    workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+    worker_class = 'uvicorn_worker.UvicornWorker'
+    worker_connections = int(os.getenv('GUNICORN_CONNECTIONS', 50))
+else:
+    wsgi_app = 'mastermind.wsgi:application'
+    bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+    workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+    worker_class = 'gthread'
+    threads = int(os.getenv('GUNICORN_THREADS', 4))
+preload_app = True
+
+# Restart workers now and then so a slow leak can't grow forever, jittered so they don't restart together
+max_requests = 1000
+max_requests_jitter = 100
+timeout = 30
+graceful_timeout = 30
+keepalive = 5
+
+accesslog = '-'
+
+
+def when_ready(server):
+    from game import runtime
+    threads = server.cfg.worker_connections if interface == 'asgi' else server.cfg.threads
+    runtime.log_report(workers=server.cfg.workers, threads=threads)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -55,6 +55,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'game.middleware.MetricsMiddleware',
     'debug_toolbar.middleware.DebugToolbarMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -167,11 +168,11 @@ AUTH_USER_MODEL = 'core.User'
 
 REST_FRAMEWORK = {
     'DEFAULT_RENDERER_CLASSES': (
-        'rest_framework.renderers.JSONRenderer',
+        'game.renderers.ORJSONRenderer',
         'rest_framework.renderers.BrowsableAPIRenderer',
     ),
     'DEFAULT_PARSER_CLASSES': (
-        'rest_framework.parsers.JSONParser',
+        'game.renderers.ORJSONParser',
     ),
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework_simplejwt.authentication.JWTAuthentication',
@@ -181,7 +182,57 @@ REST_FRAMEWORK = {
 SIMPLE_JWT = {
     'AUTH_HEADER_TYPES': ('JWT',),
     'ACCESS_TOKEN_LIFETIME': timedelta(days=1),
-    'REFRESH_TOKEN_LIFETIME': timedelta(days=7)
+    'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
+    # Tokens carry the player's claims, see game/authentication.py
+    'TOKEN_OBTAIN_SERIALIZER': 'game.serializers.PlayerTokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'game.serializers.PlayerTokenRefreshSerializer',
+}
+
+# 'models' holds PlayerProfile and Game rows, see game/model_cache.py
+# locmem is per process, use a shared backend (e.g. Redis) when running several workers
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'models': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'models',
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+}
+
+# Secret numbers are drawn from a per-difficulty pool that is refilled in bulk in the background
+SECRET_SOURCE = {
+    'BACKEND': 'game.secret_sources.RandomOrgSource',
+    'OPTIONS': {
+        'timeout': 5,
+    },
+    'BATCH_SIZE': 200,
+    'LOW_WATERMARK': 20,
+}
+
+# Daily challenge leaderboards are rebuilt at most every SNAPSHOT_SECONDS and served from CACHE
+# SIZE - wins listed, LOCK_SECONDS - how long one rebuild may hold the lock, see game/daily.py
+DAILY_CHALLENGE = {
+    'CACHE': 'default',
+    'SNAPSHOT_SECONDS': 60,
+    'LOCK_SECONDS': 30,
+    'SIZE': 100,
+}
+
+# Channel layer for the events/ stream, the in-memory layer only reaches streams in the same process
+# and RedisChannelLayer (OPTIONS url) reaches every worker's. ENABLED - off turns events/ into a 204
+# KEEPALIVE - seconds between clock events on an idle stream
+GAME_EVENTS = {
+    'ENABLED': True,
+    'BACKEND': 'game.events.InMemoryChannelLayer',
+    'OPTIONS': {
+        'capacity': 100,
+    },
+    'KEEPALIVE': 15,
 }
 
 LOGGING = {
@@ -220,6 +271,13 @@ CORS_ALLOWED_ORIGINS = [
 
 CORS_ALLOW_CREDENTIALS = True
 
+CORS_EXPOSE_HEADERS = ['ETag', 'X-Access-Token']
+
 INTERNAL_IPS = [
     '127.0.0.1',
 ]
+
+# Addresses allowed to read /metrics/, add the Prometheus server's address. None serves everyone.
+METRICS_ALLOWED_IPS = [
+    '127.0.0.1',
+]
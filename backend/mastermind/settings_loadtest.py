@@ -0,0 +1,29 @@
+"""
+Settings for load testing with: python manage.py loadtest --settings=mastermind.settings_loadtest
+SQLite stands in for MySQL and secret numbers come from the local stub source,
+so a run needs no database server or network access.
+"""
+from .settings import *
+
+DEBUG = False
+
+ALLOWED_HOSTS = ['localhost', '127.0.0.1']
+
+SECRET_KEY = SECRET_KEY or 'loadtest-only-secret-key-not-for-production-use'
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.getenv('LOADTEST_DATABASE', BASE_DIR / 'loadtest.sqlite3'),
+        'OPTIONS': {
+            # Concurrent players queue for SQLite's write lock instead of failing
+            'timeout': 30,
+        },
+    }
+}
+
+SECRET_SOURCE = {
+    'BACKEND': 'game.secret_sources.StubSource',
+}
+
+LOGGING['loggers']['game']['level'] = 'WARNING'
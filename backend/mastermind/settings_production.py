@@ -0,0 +1,62 @@
+"""
+Production settings, used by the gunicorn entry point: gunicorn -c mastermind/gunicorn.conf.py
+Debug mode, the debug toolbar and the browsable API are removed. Under WSGI, database connections
+are kept open between requests with a health check before reuse.
+ALLOWED_HOSTS is a comma separated environment variable, SECRET_KEY must be set.
+"""
+from django.core.exceptions import ImproperlyConfigured
+
+from .settings import *
+
+DEBUG = False
+
+if not SECRET_KEY:
+    raise ImproperlyConfigured('SECRET_KEY must be set in production')
+
+ALLOWED_HOSTS = [host.strip() for host in os.getenv('ALLOWED_HOSTS', 'localhost').split(',') if host.strip()]
+
+INSTALLED_APPS = [app for app in INSTALLED_APPS if app != 'debug_toolbar']
+
+MIDDLEWARE = [middleware for middleware in MIDDLEWARE
+              if middleware != 'debug_toolbar.middleware.DebugToolbarMiddleware']
+
+TEMPLATES[0]['OPTIONS']['context_processors'] = [
+    processor for processor in TEMPLATES[0]['OPTIONS']['context_processors']
+    if processor != 'django.template.context_processors.debug'
+]
+
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,
+    'DEFAULT_RENDERER_CLASSES': (
+        'game.renderers.ORJSONRenderer',
+    ),
+}
+
+# Set by the gunicorn entry point. Each gthread thread keeps its own connection under WSGI,
+# under ASGI each sync request runs in a new thread and can't reuse one, so they are closed.
+# MySQL needs max_connections above workers * threads of both servers
+SERVER_INTERFACE = os.getenv('SERVER_INTERFACE', 'wsgi')
+DATABASES['default']['CONN_MAX_AGE'] = int(os.getenv('CONN_MAX_AGE', 600 if SERVER_INTERFACE == 'wsgi' else 0))
+DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+
+# Workers can't invalidate each other's locmem entries, so the model cache is shared through Redis or off
+if os.getenv('REDIS_URL'):
+    CACHES['models'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.getenv('REDIS_URL'),
+        'KEY_PREFIX': 'models',
+        'TIMEOUT': 300,
+    }
+    # Shared snapshot and rebuild lock, so the daily leaderboard is built once for all workers
+    DAILY_CHALLENGE['CACHE'] = 'models'
+    # Events published by the WSGI workers reach the streams on the ASGI server
+    GAME_EVENTS['BACKEND'] = 'game.events.RedisChannelLayer'
+    GAME_EVENTS['OPTIONS'] = {**GAME_EVENTS['OPTIONS'], 'url': os.getenv('REDIS_URL')}
+else:
+    CACHES['models'] = {
+        'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+    }
+    # The in-memory channel layer can't reach another worker's streams, the game page polls instead
+    GAME_EVENTS['ENABLED'] = False
+
+LOGGING['loggers']['game']['level'] = 'INFO'
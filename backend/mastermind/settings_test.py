@@ -20,4 +20,10 @@ DATABASES['default'] = {
     'PASSWORD': 'newpassword',
     'HOST': 'localhost',
     'PORT': '3306',
-}
\ No newline at end of file
+}
+
+SECRET_SOURCE = {
+    'BACKEND': 'game.secret_sources.StubSource',
+    'BATCH_SIZE': 10,
+    'LOW_WATERMARK': 2,
+}
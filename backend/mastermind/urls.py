@@ -19,6 +19,7 @@ from django.urls.conf import include
 from django.conf import settings
 from django.conf.urls.static import static
 from django.contrib import admin
+from game.metrics import metrics_view
 
 
 urlpatterns = [
@@ -26,6 +27,7 @@ urlpatterns = [
     path('game/', include('game.urls')),
     path('auth/', include('djoser.urls')),
     path('auth/', include('djoser.urls.jwt')),
+    path('metrics/', metrics_view, name='metrics'),
 ]
 
 if settings.DEBUG:
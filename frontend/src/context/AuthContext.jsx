@@ -166,6 +166,23 @@ export const AuthProvider = ({ children }) => {
     }, [hasChecked, fetchAuthenticatedPlayer]);
 
 
+    useEffect(() => {
+        /*
+        Utility function
+        Stores the new access token sent after changing difficulty or starting a game,
+        its claims tell the backend the Player's current settings
+        */
+        const interceptorId = API.interceptors.response.use((response) => {
+            const newAccessToken = response.headers['x-access-token'];
+            if (newAccessToken) {
+                setCookie('AccessToken', newAccessToken, { path: '/' });
+            }
+            return response;
+        });
+        return () => API.interceptors.response.eject(interceptorId);
+    }, [setCookie]);
+
+
     useEffect(() => {
         /*
         Utility function
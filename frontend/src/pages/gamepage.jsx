@@ -5,6 +5,9 @@ import { Instructions } from "../gameinstructions";
 import { createDisabledButtons, convertSeconds } from "../utility/utility";
 import { useCallback, useEffect, useState, useRef } from "react";
 
+// How often the game state is refetched when the events stream isn't available
+const POLL_MILLISECONDS = 5000;
+
 const GamePage = () => {
     const [cookies, setCookie, removeCookie] = useCookies(['AccessToken', 'Player', 'PauseTime']);
     const [difficulty, setDifficulty] = useState('');
@@ -24,6 +27,7 @@ const GamePage = () => {
     const player = cookies.Player;
     const { logout } = useAuth();
     const intervalRef = useRef(null);
+    const clockOffsetRef = useRef(0);
 
     const newGame = async () => {
         /*
@@ -44,10 +48,7 @@ const GamePage = () => {
             if (newGameResponse.status === 201) {
                 setErrorMessage('');
                 setGuess('')
-                await fetchRoundData();
-                await fetchDifficulty();
-                await fetchStartTime();
-                await fetchLeaderboard();
+                await fetchGameState();
                 setIsLoading(false);
             };
         } catch (error) {
@@ -152,7 +153,7 @@ const GamePage = () => {
             });
             if (submitGuessResponse.status === 201) {
                 setGuess([]);
-                fetchRoundData();
+                applyRound(submitGuessResponse.data);
             };
         } catch (error) {
             console.log(error, 'Unable to fetch profile info')
@@ -245,58 +246,67 @@ const GamePage = () => {
     }, [cookies.AccessToken])
 
 
-    const fetchRoundData = useCallback(async () => {
+    const applyRound = useCallback((roundData) => {
         /*
-        Fetch previous guesses from the current game
-        Includes the number of correct numbers and correct positions
+        Adds a round from the guess response or the events stream, whichever arrives first
         */
-        try {
-            const roundDataResponse = await API.get(`game/gamerounds/`, {
-                headers: {
-                    Authorization: `JWT ${cookies.AccessToken}`,
-                },
-            });
-            if (roundDataResponse.status === 200) {
-                const data = roundDataResponse.data;
-                setGameRounds(data);
-                setNoGame(false);
+        setGameRounds((rounds) => rounds.some((round) => round.id === roundData.id) ? rounds : [...rounds, roundData]);
+        setNoGame(false);
+    }, []);
 
-                if (data.length === 0) return;
 
-                const lastRound = data[data.length - 1];
-                if (lastRound.correct_positions === difficulty) {
-                    setIsWinner(true);
-                    fetchLeaderboard();
-                } else if (data.length === 10) {
-                    setIsLoser(true);
-                    fetchLeaderboard();
-                }
-            }
-        } catch (error) {
-            if (error.status === 404) {
-                setNoGame(true);
-                console.log(error, 'Unable to fetch round data');
-                return;
-            }
+    useEffect(() => {
+        /*
+        Win/lose state follows the last round
+        */
+        if (gameRounds.length === 0) return;
+        const lastRound = gameRounds[gameRounds.length - 1];
+        if (lastRound.correct_positions === lastRound.guess.length) {
+            setIsWinner(true);
+        } else if (gameRounds.length === 10) {
+            setIsLoser(true);
+        }
+    }, [gameRounds]);
 
+
+    useEffect(() => {
+        /*
+        Refresh win totals and the final time once the game ends
+        */
+        if (isWinner || isLoser) {
+            fetchLeaderboard();
         }
-    }, [cookies.AccessToken, difficulty, fetchLeaderboard]);
+    }, [isWinner, isLoser, fetchLeaderboard]);
 
 
-    const fetchDifficulty = useCallback(async () => {
+    const fetchGameState = useCallback(async () => {
+        /*
+        Fetch the whole game page state in one request:
+        difficulty, start time, previous rounds and total player wins information
+        */
         try {
-            const playerInfoResponse = await API.get(`game/difficulty/`, {
+            const gameStateResponse = await API.get(`game/state/`, {
                 headers: {
                     Authorization: `JWT ${cookies.AccessToken}`,
                 },
             });
-            if (playerInfoResponse.status === 200) {
-                const data = playerInfoResponse.data;
-                setDifficulty(data);
-            };
+            if (gameStateResponse.status === 200) {
+                const data = gameStateResponse.data;
+                setDifficulty(data.difficulty);
+                setLeaderboard({ wins: data.leaderboard.wins, fastest_time: convertSeconds(data.leaderboard.fastest_time) })
+                setElapsedTime(convertSeconds(data.leaderboard.current_game_time))
+
+                if (data.current_game === null) {
+                    setNoGame(true);
+                    return;
+                }
+                setNoGame(false);
+                setStartTime(new Date(data.start_time));
+                setGameRounds(data.rounds);
+            }
         } catch (error) {
-            console.log(error, 'Unable to fetch profile info')
-        };
+            console.log(error, 'Unable to fetch game state')
+        }
     }, [cookies.AccessToken]);
 
 
@@ -304,35 +314,54 @@ const GamePage = () => {
         /*
         INITIALIZE GAME STATUS
         */
-        fetchRoundData();
-        fetchDifficulty();
-        fetchLeaderboard();
-    }, [cookies.AccessToken, fetchDifficulty, fetchRoundData, fetchLeaderboard]);
+        fetchGameState();
+    }, [fetchGameState]);
 
 
     /* TIMER AREA */
 
-    const fetchStartTime = useCallback(async () => {
-        try {
-            const startTimeResponse = await API.get(`game/starttime/`, {
-                headers: {
-                    Authorization: `JWT ${cookies.AccessToken}`,
-                },
-            });
-            if (startTimeResponse.status === 200) {
-                const data = startTimeResponse.data;
-                const startTime = new Date(data.start_time);
-                setStartTime(startTime);
+    useEffect(() => {
+        /*
+        Server-pushed game events replace refetching after every change:
+        round - a round played here or in another tab
+        new_game - a game started in another tab
+        clock - server time (to correct this device's clock) and the game's start time after a resume
+        Without a stream (204, or a server that can't hold one open) the page polls the game state instead
+        */
+        const eventSource = new EventSource(`${API.defaults.baseURL}/game/events/`, { withCredentials: true });
+        let pollInterval = null;
+
+        eventSource.onerror = () => {
+            // CLOSED means EventSource gave up, otherwise it is already reconnecting
+            if (eventSource.readyState === EventSource.CLOSED && pollInterval === null) {
+                pollInterval = setInterval(fetchGameState, POLL_MILLISECONDS);
             }
-        } catch (error) {
-            console.log(error, 'Unable to fetch start time')
-        }
-    }, [cookies.AccessToken]);
+        };
 
+        eventSource.addEventListener('round', (event) => {
+            applyRound(JSON.parse(event.data));
+        });
+        eventSource.addEventListener('new_game', (event) => {
+            const data = JSON.parse(event.data);
+            setIsWinner(false);
+            setIsLoser(false);
+            setNoGame(false);
+            setGameRounds([]);
+            setStartTime(new Date(data.start_time));
+        });
+        eventSource.addEventListener('clock', (event) => {
+            const data = JSON.parse(event.data);
+            clockOffsetRef.current = new Date(data.server_time) - new Date();
+            if (data.start_time) {
+                setStartTime(new Date(data.start_time));
+            }
+        });
 
-    useEffect(() => {
-        fetchStartTime();
-    }, [fetchStartTime]);
+        return () => {
+            eventSource.close();
+            clearInterval(pollInterval);
+        };
+    }, [cookies.AccessToken, applyRound, fetchGameState]);
 
 
     useEffect(() => {
@@ -342,7 +371,7 @@ const GamePage = () => {
         */
         if (startTime && !isWinner && !isLoser) {
             intervalRef.current = setInterval(() => {
-                const currentTime = new Date();
+                const currentTime = new Date(Date.now() + clockOffsetRef.current);
                 const elapsed = Math.floor((currentTime - startTime) / 1000);
                 const convertedTime = convertSeconds(elapsed)
                 setElapsedTime(convertedTime);
@@ -369,16 +398,15 @@ const GamePage = () => {
                     });
                     if (resumeGameResponse.status === 200) {
                         removeCookie('PauseTime')
+                        setStartTime(new Date(resumeGameResponse.data.start_time));
                     }
                 } catch (error) {
                     console.log(error, 'Unable to resume game')
                 }
             }
         };
-        handleResume().then(() => {
-            fetchStartTime();
-        });
-    }, [cookies.AccessToken, cookies.PauseTime, fetchStartTime, removeCookie]);
+        handleResume();
+    }, [cookies.AccessToken, cookies.PauseTime, removeCookie]);
     
 
     useEffect(() => {